@@ -1,95 +1,17 @@
 import os
-import threading
-import time
-from datetime import datetime, timedelta
 import click
 from flask import Flask, redirect, url_for, request, abort
 from config import Config
 from extensions import db, login_manager, migrate
-from models import User, Role, DataRefreshConfig, ConnectionProfile
+import sqlite_store
+from models import User, Role
+import refresh_scheduler
 from blueprints.auth.routes import bp as auth_bp
 from blueprints.main.routes import bp as main_bp
 from blueprints.admin.routes import bp as admin_bp
 from blueprints.reports import bp as reports_bp
 
 
-def _seconds_until(timestr: str) -> float:
-    """Return seconds until next occurrence of HH:MM (local time)."""
-    now = datetime.now()
-    try:
-        hh, mm = [int(x) for x in timestr.split(":")[:2]]
-    except Exception:
-        return 3600.0
-    target = now.replace(hour=hh, minute=mm, second=0, microsecond=0)
-    if target <= now:
-        target += timedelta(days=1)
-    return (target - now).total_seconds()
-
-
-def _data_refresh_loop(app: Flask):
-    while True:
-        try:
-            with app.app_context():
-                cfg = db.session.get(DataRefreshConfig, 1)
-                if not cfg:
-                    cfg = DataRefreshConfig(id=1)
-                    db.session.add(cfg)
-                    db.session.commit()
-                if not cfg.enabled:
-                    time.sleep(300)
-                    continue
-
-                schedule = cfg.run_time or "02:00"
-                wait_s = _seconds_until(schedule)
-                time.sleep(wait_s)
-
-                # re-fetch in case it was changed while sleeping
-                cfg = db.session.get(DataRefreshConfig, 1)
-                if not cfg or not cfg.enabled:
-                    continue
-                profile = db.session.get(ConnectionProfile, cfg.profile_id) if cfg.profile_id else None
-                if not profile:
-                    app.logger.warning("Data refresh: geen profiel geselecteerd, sla over")
-                    time.sleep(300)
-                    continue
-
-                from rgritten_sync import sync_rgritten
-
-                stats = sync_rgritten(
-                    profile_name=profile.name,
-                    chunk_size=max(1, cfg.chunk_size or 1000),
-                    min_ritdatum=cfg.min_ritdatum,
-                )
-                app.logger.info(
-                    "Data refresh ok (%s %s): +%s (through %s/%s)",
-                    profile.project,
-                    profile.name,
-                    stats.get("inserted"),
-                    stats.get("through_ritdatum"),
-                    stats.get("through_ritnummer"),
-                )
-        except Exception:
-            app.logger.exception("Data refresh failed")
-            time.sleep(60)
-
-
-def _start_data_refresh(app: Flask):
-    # Avoid double-start in dev reloader
-    if app.debug and os.environ.get("WERKZEUG_RUN_MAIN") != "true":
-        return
-    if app.config.get("_data_refresh_started"):
-        return
-    app.config["_data_refresh_started"] = True
-    t = threading.Thread(target=_data_refresh_loop, args=(app,), daemon=True)
-    t.start()
-    app.logger.info(
-        "Data refresh scheduler started: profile=%s time=%s chunk=%s",
-        "db-config",
-        "db-config",
-        "db-config",
-    )
-
-
 def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
@@ -97,6 +19,7 @@ def create_app():
     db.init_app(app)
     login_manager.init_app(app)
     migrate.init_app(app, db)
+    sqlite_store.init_app(app)
     login_manager.login_view = "auth.login"
 
     app.register_blueprint(auth_bp)
@@ -104,7 +27,7 @@ def create_app():
     app.register_blueprint(admin_bp)
     app.register_blueprint(reports_bp)
 
-    _start_data_refresh(app)
+    refresh_scheduler.start_in_web(app)
 
     @app.route("/init")
     def init():
@@ -140,59 +63,222 @@ def create_app():
             db.session.commit()
         return redirect(url_for("auth.login"))
 
+    def _echo_quarantined(quarantined):
+        if not quarantined:
+            return
+        click.echo(f"Quarantined {sum(quarantined.values())} non-convertible values:")
+        for col, n in sorted(quarantined.items(), key=lambda item: -item[1]):
+            click.echo(f"- {col}: {n}")
+
+    @app.cli.command("refresh-worker")
+    def refresh_worker_cli():
+        """Run the data refresh scheduler in the foreground (instead of in the web workers)."""
+        scheduler = refresh_scheduler.RefreshScheduler(app)
+        click.echo(f"Refresh worker {scheduler.owner}; Ctrl+C to stop")
+        try:
+            scheduler.run_forever()
+        except KeyboardInterrupt:
+            scheduler.stop.set()
+
     @app.cli.command("sync-rgritten")
     @click.option("--profile", default="Historie", show_default=True)
     @click.option("--chunk-size", default=1000, show_default=True, type=int)
     @click.option("--min-ritdatum", default=None, help="Filter ritdatum >= YYYY-MM-DD")
-    def sync_rgritten_cli(profile, chunk_size, min_ritdatum):
-        """Append-only sync from remote rpt.RGRitten into local SQLite."""
+    @click.option("--workers", default=1, show_default=True, type=int, help="Parallel date partitions")
+    @click.option("--commit-every", default=None, type=int, help="Rows per commit (default: chunk size)")
+    @click.option("--pipeline", is_flag=True, help="Overlap fetch, conversion and writes")
+    @click.option("--mode", type=click.Choice(["append", "upsert"]), default="append", show_default=True)
+    @click.option("--resync-days", default=0, show_default=True, type=int, help="Re-fetch the last N days")
+    @click.option("--bulk", type=click.Choice(["auto", "on", "off"]), default="auto", show_default=True, help="Defer index maintenance for large loads")
+    def sync_rgritten_cli(
+        profile, chunk_size, min_ritdatum, workers, commit_every, pipeline, mode, resync_days, bulk
+    ):
+        """Sync remote rpt.RGRitten into local SQLite (append or upsert)."""
         from rgritten_sync import sync_rgritten
 
         stats = sync_rgritten(
             profile_name=profile,
             chunk_size=chunk_size,
             min_ritdatum=min_ritdatum,
+            workers=workers,
+            commit_every=commit_every,
+            pipeline=pipeline,
+            mode=mode,
+            resync_days=resync_days,
+            bulk=bulk,
+        )
+        click.echo(
+            f"Synced {stats['inserted']} new, {stats['updated']} updated, "
+            f"{stats['unchanged']} unchanged rows "
+            f"(through {stats['through_ritdatum']} / ritnummer {stats['through_ritnummer']})"
+        )
+        click.echo(
+            f"Run {stats['run_id']}: {stats['seconds']}s, ~{stats['bytes'] / 1e6:.1f} MB; "
+            + ", ".join(f"{stage} {sec}s" for stage, sec in stats["timings"].items())
+        )
+        for part in stats.get("partitions", []):
+            click.echo(
+                f"- {part['start'] or '...'} -> {part['end'] or '...'}: "
+                f"{part['rows']} rows in {part['seconds']}s ({part['rows_per_s']} rows/s)"
+            )
+        for name, clock in stats.get("stages", {}).items():
+            click.echo(
+                f"- {name}: busy {clock['busy']}s, waiting for input {clock['wait_input']}s, "
+                f"blocked on output {clock['wait_output']}s"
+            )
+        if "bottleneck" in stats:
+            click.echo(f"Bottleneck: {stats['bottleneck']}")
+        if stats["bulk"]:
+            click.echo(
+                f"Bulk load: rebuilt {', '.join(stats['indexes_rebuilt']) or 'no indexes'} "
+                f"in {stats['index_seconds']}s"
+            )
+        _echo_quarantined(stats["quarantined"])
+
+    @app.cli.command("backfill-rgritten")
+    @click.option("--profile", default="Historie", show_default=True)
+    @click.option("--from", "date_from", required=True, help="First day, YYYY-MM-DD")
+    @click.option("--to", "date_to", required=True, help="Last day (inclusive), YYYY-MM-DD")
+    @click.option("--chunk-size", default=1000, show_default=True, type=int)
+    @click.option("--workers", default=4, show_default=True, type=int, help="Parallel day ranges")
+    @click.option("--mode", type=click.Choice(["append", "upsert"]), default="append", show_default=True)
+    @click.option("--bulk", type=click.Choice(["auto", "on", "off"]), default="auto", show_default=True, help="Defer index maintenance for large loads")
+    def backfill_rgritten_cli(profile, date_from, date_to, chunk_size, workers, mode, bulk):
+        """Fetch days missing or short in local rgritten; leaves the sync cursor alone."""
+        from rgritten_sync import backfill_rgritten
+
+        stats = backfill_rgritten(
+            date_from,
+            date_to,
+            profile_name=profile,
+            chunk_size=chunk_size,
+            workers=workers,
+            mode=mode,
+            bulk=bulk,
+        )
+        click.echo(
+            f"Checked {stats['days_checked']} days, {stats['gap_days']} with gaps: "
+            f"{stats['inserted']} new, {stats['updated']} updated rows"
+        )
+        for part in stats["ranges"]:
+            click.echo(
+                f"- {part['start']} -> {part['end']}: {part['missing']} missing, "
+                f"{part['fetched']} fetched in {part['seconds']}s"
+            )
+        if stats["local_surplus_days"]:
+            click.echo(f"{stats['local_surplus_days']} days have more rows locally than remote")
+        if stats["frozen_days"]:
+            click.echo(f"Skipped {stats['frozen_days']} days in frozen months")
+        if stats["bulk"]:
+            click.echo(f"Bulk load: rebuilt {', '.join(stats['indexes_rebuilt']) or 'no indexes'}")
+        _echo_quarantined(stats["quarantined"])
+
+    @app.cli.command("reconcile-rgritten")
+    @click.option("--profile", default="Historie", show_default=True)
+    @click.option("--from", "date_from", required=True, help="First day, YYYY-MM-DD")
+    @click.option("--to", "date_to", required=True, help="Last day (inclusive), YYYY-MM-DD")
+    @click.option("--chunk-size", default=1000, show_default=True, type=int)
+    @click.option("--dry-run", is_flag=True, help="Only report differences")
+    def reconcile_rgritten_cli(profile, date_from, date_to, chunk_size, dry_run):
+        """Checksum-compare remote and local rgritten; re-fetch only differing rows."""
+        from rgritten_sync import reconcile_rgritten
+
+        stats = reconcile_rgritten(
+            date_from, date_to, profile_name=profile, chunk_size=chunk_size, dry_run=dry_run
+        )
+        nodes = stats["nodes"]
+        click.echo(
+            f"Compared {nodes['month']} months, {nodes['day']} days, {nodes['bucket']} buckets, "
+            f"{nodes['key']} keys"
         )
         click.echo(
-            f"Synced {stats['inserted']} rows "
-            f"(ritnummer {stats['from_ritnummer']} -> {stats['through_ritnummer']})"
+            f"{stats['missing']} missing, {stats['changed']} changed, {stats['extra']} gone at source"
+            + ("" if dry_run else f"; deleted {stats['deleted']}, fetched {stats['fetched']} rows")
         )
+        for day in stats["days"]:
+            click.echo(f"- {day}")
+        if stats["frozen_months"]:
+            click.echo(f"Differs in frozen months, not repaired: {', '.join(stats['frozen_months'])}")
+
+    @app.cli.command("partitions-rgritten")
+    @click.option("--freeze", "freeze_month", default=None, help="Make month YYYY-MM read-only.")
+    @click.option("--thaw", "thaw_month", default=None, help="Make month YYYY-MM writable again.")
+    @click.option("--drop", "drop_month", default=None, help="Delete month YYYY-MM as a whole.")
+    def partitions_rgritten_cli(freeze_month, thaw_month, drop_month):
+        """Show the monthly catalog of local rgritten; freeze, thaw or drop a month."""
+        import rgritten_partitions
+
+        try:
+            if drop_month:
+                deleted = rgritten_partitions.drop(drop_month)
+                click.echo(f"Dropped {drop_month}: {deleted} rows")
+            if freeze_month:
+                rgritten_partitions.freeze(freeze_month)
+            if thaw_month:
+                rgritten_partitions.thaw(thaw_month)
+        except ValueError:
+            raise click.BadParameter("use YYYY-MM")
+        for part in rgritten_partitions.refresh():
+            click.echo(
+                f"{part.month}: {part.rows:>9} rows"
+                + (f"  frozen since {part.frozen_at:%Y-%m-%d}" if part.frozen else "")
+            )
+
+    @app.cli.command("cluster-rgritten")
+    @click.option("--dry-run", is_flag=True, help="Only report how many rows are out of key order.")
+    def cluster_rgritten_cli(dry_run):
+        """Rewrite local rgritten in (ritdatum, ritnummer) order for date-range reads."""
+        from rgritten_sync import cluster_rgritten
+
+        stats = cluster_rgritten(dry_run=dry_run)
+        click.echo(f"{stats['out_of_order']} of {stats['rows']} rows out of key order")
+        if stats["clustered"]:
+            click.echo(f"Rewrote rgritten in key order in {stats['seconds']}s")
 
     @app.cli.command("diagnose-rgritten")
     @click.option("--profile", default="Historie", show_default=True)
     @click.option("--cursor", default=0, show_default=True, type=int)
     @click.option("--min-ritdatum", default=None, help="Filter ritdatum >= YYYY-MM-DD")
-    def diagnose_rgritten_cli(profile, cursor, min_ritdatum):
+    @click.option("--top", default=5, show_default=True, type=int, help="Samples per column.")
+    @click.option("--workers", default=1, show_default=True, type=int, help="Split the ritnummer range over N connections.")
+    def diagnose_rgritten_cli(profile, cursor, min_ritdatum, top, workers):
         """Find rows/columns in rpt.RGRitten that fail numeric conversion."""
         from rgritten_sync import find_conversion_issues
 
-        problems = find_conversion_issues(
+        issues = find_conversion_issues(
             profile_name=profile,
             cursor=cursor,
             min_ritdatum=min_ritdatum,
+            top=top,
+            workers=workers,
         )
-        if not problems:
+        if not issues:
             click.echo("No conversion issues detected.")
             return
-        for p in problems:
-            click.echo(
-                f"Column {p['column']} has non-convertible value "
-                f"'{p['value']}' at ritnummer {p['ritnummer']}"
-            )
+        for issue in issues:
+            click.echo(f"Column {issue['column']}: {issue['count']} non-convertible values")
+            for sample in issue["samples"]:
+                click.echo(f"  '{sample['value']}' at ritnummer {sample['ritnummer']}")
 
     @app.cli.command("debug-rgritten-cols")
     @click.option("--profile", default="Historie", show_default=True)
-    def debug_rgritten_cols(profile):
+    @click.option("--workers", default=4, show_default=True, type=int, help="Concurrent probes.")
+    def debug_rgritten_cols(profile, workers):
         """Binary-search which columns cause SQL conversion errors in rpt.RGRitten."""
         from rgritten_sync import locate_offending_columns
 
-        bad = locate_offending_columns(profile_name=profile)
-        if not bad:
+        result = locate_offending_columns(profile_name=profile, workers=workers)
+        probe_seconds = sum(p["seconds"] for p in result["probes"])
+        click.echo(
+            f"{len(result['probes'])} probes, {probe_seconds:.1f}s probing, "
+            f"{result['seconds']:.1f}s wall"
+        )
+        if not result["offending"]:
             click.echo("No offending columns detected.")
             return
         click.echo("Columns failing selection:")
-        for col in bad:
-            click.echo(f"- {col}")
+        for item in result["offending"]:
+            click.echo(f"- {item['column']} ({item['seconds']:.2f}s): {item['error']}")
 
     return app
 
@@ -0,0 +1,127 @@
+"""
+Compare the legacy dict/ORM ingest of rgritten chunks with the tuple/executemany writer.
+
+    python benchmarks/bench_ingest.py [--rows 50000] [--chunk-size 1000]
+
+Rows are synthetic but shaped like rpt.RGRitten (~190 columns). The legacy path gets
+Decimal values as pyodbc returns them without converters; the fast path gets the raw
+decimal text and pays for the output converter inside the timed section.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, time as dtime, timedelta
+from decimal import Decimal
+from pathlib import Path
+from types import SimpleNamespace
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+
+def _make_rows(n):
+    from models import RGRit
+    from rgritten_sync import ALL_COLUMNS
+
+    table = RGRit.__table__
+    base = datetime(2025, 1, 1)
+    rows = []
+    for i in range(n):
+        row = []
+        for col in ALL_COLUMNS:
+            col_type = table.c[col].type
+            if col == "ritnummer":
+                row.append(i + 1)
+            elif col == "ritdatum":
+                row.append(base + timedelta(days=i // 2000))
+            elif isinstance(col_type, table.c.ritdatum.type.__class__):
+                row.append(base - timedelta(days=i % 9000))
+            elif isinstance(col_type, table.c.instap.type.__class__):
+                row.append(dtime(8 + i % 10, i % 60))
+            elif col_type.__class__.__name__ in ("Integer", "Numeric"):
+                nullable = table.c[col].nullable
+                row.append(Decimal(f"{i % 7}.0000000000") if i % 3 or not nullable else None)
+            else:
+                row.append(f"{col}-{i % 400}")
+        rows.append(tuple(row))
+    return rows
+
+
+def _legacy(rows, columns, chunk_size):
+    from extensions import db
+    from models import RGRit, add_encoded_strings
+
+    for start in range(0, len(rows), chunk_size):
+        payload = []
+        for row in rows[start : start + chunk_size]:
+            mapping = dict(zip(columns, row))
+            for key, val in mapping.items():
+                if isinstance(val, Decimal):
+                    mapping[key] = float(val)
+            payload.append(mapping)
+        # bulk_insert_mappings skips the mapper events that register new encoded strings.
+        add_encoded_strings(db.session.connection(), payload)
+        db.session.bulk_insert_mappings(RGRit, payload)
+        db.session.commit()
+
+
+def _as_driver_bytes(rows):
+    """What pyodbc hands to an output converter: DECIMAL values as their text bytes."""
+    return [
+        tuple(str(v).encode() if isinstance(v, Decimal) else v for v in row) for row in rows
+    ]
+
+
+def _fast(rows, columns, chunk_size):
+    from remote_engines import _decimal_output
+    from rgritten_sync import _ChunkWriter
+
+    writer = _ChunkWriter(columns, SimpleNamespace(), chunk_size)
+    decimal_idx = [
+        i for i in range(len(columns)) if any(isinstance(row[i], bytes) for row in rows[:3])
+    ]
+    for start in range(0, len(rows), chunk_size):
+        # The driver calls the converter per DECIMAL value; time those calls here as well.
+        chunk = []
+        for row in rows[start : start + chunk_size]:
+            vals = list(row)
+            for i in decimal_idx:
+                vals[i] = _decimal_output(vals[i])
+            chunk.append(vals)
+        writer.insert(chunk)
+        writer.commit((None, None), force=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{tmp}/bench.db"
+    from app import create_app
+    from extensions import db
+    from rgritten_sync import ALL_COLUMNS
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        rows = _make_rows(args.rows)
+        results = {}
+        inputs = {"legacy": rows, "fast": _as_driver_bytes(rows)}
+        for name, fn in (("legacy", _legacy), ("fast", _fast)):
+            db.session.execute(db.text("DELETE FROM rgritten"))
+            db.session.commit()
+            started = time.perf_counter()
+            fn(inputs[name], ALL_COLUMNS, args.chunk_size)
+            elapsed = time.perf_counter() - started
+            results[name] = args.rows / elapsed
+            print(f"{name:>6}: {elapsed:6.2f}s  {results[name]:9.0f} rows/s")
+        print(f"speedup: {results['fast'] / results['legacy']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
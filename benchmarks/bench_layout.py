@@ -0,0 +1,281 @@
+"""
+Compare rgritten storage layouts for the sync cursor and date-filtered report queries.
+
+    python benchmarks/bench_layout.py [--rows 300000] [--days 365] [--repeat 5]
+
+Layouts, all with the columns of the RGRit model:
+  legacy       rowid `id` key, indexes on owner_id and ritnummer only
+  rowid        rowid `id` key plus the unique (ritdatum, ritnummer) index, rows in arrival order
+  withoutrowid WITHOUT ROWID, primary key (ritdatum, ritnummer)
+  clustered    as rowid, rebuilt in (ritdatum, ritnummer) order (cluster_rgritten)
+  hot          as clustered, plus the covering index on the hot report columns (ix_rgritten_hot)
+  encoded      as hot, with RGRIT_ENCODED_COLUMNS stored as rgritten_strings codes, decoded
+               after the fetch like EncodedString does
+
+Rows are synthetic but shaped like rpt.RGRitten (about half the columns NULL). Like a real
+store, the initial load ran partitioned (sync-rgritten --workers 4 interleaves chunks of four
+date ranges) and a quarter of the days arrived later through backfills. Each query runs on a
+fresh connection with a small page cache after the file was evicted from the OS cache
+(posix_fadvise, Linux), so it reads its pages from disk.
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+CACHE_KIB = 2000
+WORKERS = 4
+CHUNK = 500
+
+
+def _columns():
+    from models import RGRit
+
+    table = RGRit.__table__
+    return [(c.name, c.type.__class__.__name__) for c in table.columns if c.name != "id"]
+
+
+def _value(name, kind, i, day):
+    if name == "ritdatum":
+        return (day + timedelta(minutes=i % 1440)).isoformat(" ")
+    if name == "ritnummer":
+        return i
+    if name in ("rittype", "status", "vervoerder"):
+        return f"{name}-{i % 7}"
+    if name == "owner_id":
+        return i % 50
+    if (i + len(name)) % 2:
+        return None
+    if kind in ("Integer", "BigInteger"):
+        return i % 1000
+    if kind == "Numeric":
+        return (i % 997) / 10
+    if kind == "DateTime":
+        return (day - timedelta(days=i % 9000)).isoformat(" ")
+    if kind == "Time":
+        return f"{8 + i % 10:02d}:{i % 60:02d}:00.000000"
+    return f"{name}-{i % 400}"
+
+
+def _days(rows, days):
+    """Per day its rows, ritnummers ascending over days like the source."""
+    base = datetime(2025, 1, 1)
+    per_day = rows // days
+    columns = _columns()
+    out = []
+    for d in range(days):
+        day = base + timedelta(days=d)
+        out.append(
+            [
+                tuple(_value(name, kind, d * per_day + n + 1, day) for name, kind in columns)
+                for n in range(per_day)
+            ]
+        )
+    return out
+
+
+def _encoded(layout):
+    from models import RGRIT_ENCODED_COLUMNS
+
+    return RGRIT_ENCODED_COLUMNS if layout == "encoded" else ()
+
+
+def _create(path, layout):
+    columns = _columns()
+    names = [name for name, _ in columns]
+    decl = []
+    for name, kind in columns:
+        sql_type = {"Integer": "INTEGER", "BigInteger": "BIGINT", "Numeric": "NUMERIC", "DateTime": "DATETIME"}.get(kind, "VARCHAR")
+        if name in _encoded(layout):
+            sql_type = "INTEGER"
+        not_null = " NOT NULL" if name in ("ritdatum", "ritnummer", "rittype", "status", "owner_id", "vervoerder") else ""
+        decl.append(f'"{name}" {sql_type}{not_null}')
+    con = sqlite3.connect(path)
+    con.execute("PRAGMA journal_mode = WAL")
+    if layout == "withoutrowid":
+        con.execute(
+            f"CREATE TABLE rgritten ({', '.join(decl)}, PRIMARY KEY (ritdatum, ritnummer)) WITHOUT ROWID"
+        )
+    else:
+        con.execute(f"CREATE TABLE rgritten (id INTEGER PRIMARY KEY, {', '.join(decl)})")
+        if layout != "legacy":
+            con.execute("CREATE UNIQUE INDEX uq_rgritten_ritdatum_ritnummer ON rgritten (ritdatum, ritnummer)")
+        if layout in ("hot", "encoded"):
+            from models import RGRIT_HOT_COLUMNS
+
+            con.execute(f"CREATE INDEX ix_rgritten_hot ON rgritten ({', '.join(RGRIT_HOT_COLUMNS)})")
+    con.execute("CREATE INDEX ix_rgritten_owner_id ON rgritten (owner_id)")
+    con.execute("CREATE INDEX ix_rgritten_ritnummer ON rgritten (ritnummer)")
+    return con, names
+
+
+def _encode(con, names, layout, days):
+    """Rows with the encoded columns replaced by codes from a fresh rgritten_strings."""
+    positions = [names.index(name) for name in _encoded(layout)]
+    if not positions:
+        return days
+    con.execute("CREATE TABLE rgritten_strings (code INTEGER PRIMARY KEY, value VARCHAR NOT NULL UNIQUE)")
+    values = sorted({row[i] for rows in days for row in rows for i in positions} - {None})
+    con.executemany("INSERT INTO rgritten_strings (value) VALUES (?)", [(v,) for v in values])
+    codes = dict(con.execute("SELECT value, code FROM rgritten_strings"))
+    return [
+        [tuple(codes.get(v) if i in positions else v for i, v in enumerate(row)) for row in rows]
+        for rows in days
+    ]
+
+
+def _load(path, layout, days):
+    con, names = _create(path, layout)
+    days = _encode(con, names, layout, days)
+    sql = f"INSERT INTO rgritten ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})"
+    order = list(range(len(days)))
+    random.Random(7).shuffle(late := order[::4])
+    initial = [row for d in order if d % 4 for row in days[d]]
+    size = -(-len(initial) // WORKERS)
+    partitions = [initial[i : i + size] for i in range(0, len(initial), size)]
+    chunks = max(-(-len(p) // CHUNK) for p in partitions)
+    for c in range(chunks):
+        for part in partitions:
+            if part[c * CHUNK : (c + 1) * CHUNK]:
+                con.executemany(sql, part[c * CHUNK : (c + 1) * CHUNK])
+                con.commit()
+    for d in late:
+        con.executemany(sql, days[d])
+        con.commit()
+    if layout in ("clustered", "hot", "encoded"):
+        _cluster(con, names)
+    con.execute("ANALYZE")
+    con.commit()
+    con.close()
+
+
+def _cluster(con, names):
+    """What cluster_rgritten does: copy the rows in key order, then swap the tables."""
+    ddl = con.execute("SELECT sql FROM sqlite_master WHERE name = 'rgritten'").fetchone()[0]
+    indexes = [r[0] for r in con.execute("SELECT sql FROM sqlite_master WHERE type = 'index' AND tbl_name = 'rgritten' AND sql IS NOT NULL")]
+    con.execute(ddl.replace("CREATE TABLE rgritten", "CREATE TABLE rgritten_clustered", 1))
+    columns = ", ".join(names)
+    con.execute(
+        f"INSERT INTO rgritten_clustered ({columns}) SELECT {columns} FROM rgritten ORDER BY ritdatum, ritnummer"
+    )
+    con.execute("DROP TABLE rgritten")
+    con.execute("ALTER TABLE rgritten_clustered RENAME TO rgritten")
+    for sql in indexes:
+        con.execute(sql)
+    con.commit()
+    con.execute("VACUUM")
+
+
+def _evict(path):
+    if not hasattr(os, "posix_fadvise"):
+        return
+    for name in (path, path + "-wal"):
+        if os.path.exists(name):
+            fd = os.open(name, os.O_RDONLY)
+            try:
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+            finally:
+                os.close(fd)
+
+
+def _timed(path, sql, params_list, layout):
+    """
+    Seconds per query, each on a fresh connection with a cold page cache. Encoded columns
+    are decoded from a dictionary loaded beforehand, like EncodedString's cached copy.
+    """
+    encoded = set(_encoded(layout))
+    values = {}
+    if encoded:
+        con = sqlite3.connect(path)
+        values = dict(con.execute("SELECT code, value FROM rgritten_strings"))
+        con.close()
+    total = 0.0
+    for params in params_list:
+        _evict(path)
+        con = sqlite3.connect(path)
+        con.execute(f"PRAGMA cache_size = -{CACHE_KIB}")
+        con.execute("PRAGMA mmap_size = 0")
+        started = time.perf_counter()
+        cursor = con.execute(sql, params)
+        rows = cursor.fetchall()
+        positions = [i for i, column in enumerate(cursor.description) if column[0] in encoded]
+        for i, row in enumerate(rows if positions else ()):
+            row = rows[i] = list(row)
+            for position in positions:
+                row[position] = values.get(row[position])
+        total += time.perf_counter() - started
+        con.close()
+    return total / len(params_list)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=300_000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    days = _days(args.rows, args.days)
+    rng = random.Random(11)
+    base = datetime(2025, 1, 1)
+    some_days = [base + timedelta(days=rng.randrange(args.days)) for _ in range(args.repeat * 4)]
+    months = [base + timedelta(days=rng.randrange(max(1, args.days - 31))) for _ in range(args.repeat)]
+    queries = {
+        "cursor lookup": (
+            "SELECT ritdatum, ritnummer FROM rgritten ORDER BY ritdatum DESC, ritnummer DESC LIMIT 1",
+            [()] * (args.repeat * 4),
+        ),
+        "day keys (upsert)": (
+            "SELECT ritdatum, ritnummer, row_hash FROM rgritten WHERE ritdatum BETWEEN ? AND ?",
+            [(d.isoformat(" "), (d + timedelta(hours=23, minutes=59)).isoformat(" ")) for d in some_days],
+        ),
+        "report: month rows": (
+            "SELECT * FROM rgritten WHERE ritdatum >= ? AND ritdatum < ? ORDER BY ritdatum, ritnummer",
+            [(m.isoformat(" "), (m + timedelta(days=31)).isoformat(" ")) for m in months],
+        ),
+        "report: hot columns": (
+            "SELECT ritdatum, ritnummer, vervoerder, opdrachtgever, instap, uitstap, afstand, "
+            "plaats_van, plaats_naar FROM rgritten WHERE ritdatum >= ? AND ritdatum < ? "
+            "ORDER BY ritdatum, ritnummer",
+            [(m.isoformat(" "), (m + timedelta(days=31)).isoformat(" ")) for m in months],
+        ),
+        "report: month totals": (
+            "SELECT vervoerder, COUNT(*), SUM(afstand) FROM rgritten "
+            "WHERE ritdatum >= ? AND ritdatum < ? GROUP BY vervoerder",
+            [(m.isoformat(" "), (m + timedelta(days=31)).isoformat(" ")) for m in months],
+        ),
+    }
+
+    results = {}
+    for layout in ("legacy", "rowid", "withoutrowid", "clustered", "hot", "encoded"):
+        path = os.path.join(tmp, f"{layout}.db")
+        started = time.perf_counter()
+        _load(path, layout, days)
+        load = time.perf_counter() - started
+        size = sum(os.path.getsize(p) for p in (path, path + "-wal") if os.path.exists(p))
+        results[layout] = {name: _timed(path, sql, params, layout) for name, (sql, params) in queries.items()}
+        print(f"{layout:>12}: loaded {args.rows} rows in {load:.1f}s, {size / 1e6:.0f} MB")
+
+    print()
+    print(
+        f"{'ms per query':<22}" + "".join(f"{layout:>13}" for layout in results)
+        + f"{'hot/rowid':>10}{'enc/hot':>10}"
+    )
+    for name in queries:
+        row = [results[layout][name] * 1000 for layout in results]
+        gain = results["rowid"][name] / results["hot"][name]
+        encoded = results["hot"][name] / results["encoded"][name]
+        print(f"{name:<22}" + "".join(f"{ms:13.2f}" for ms in row) + f"{gain:9.1f}x{encoded:9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
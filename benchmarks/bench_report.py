@@ -0,0 +1,170 @@
+"""
+Time the rgritten report query of run_report with three ways to store and decode
+RGRIT_ENCODED_COLUMNS.
+
+    python benchmarks/bench_report.py [--rows 200000] [--days 365] [--repeat 5]
+
+Variants, each on its own store file and in its own process (the types are patched):
+  text    the columns stored as text, no rgritten_strings (before encoding)
+  python  EncodedString as shipped: codes decoded from the dictionary copy that
+          models._load_string_codes keeps current on the query's connection
+  sql     codes decoded in SQL, one rgritten_strings lookup per column and row
+
+The query is built like run_report: read_session(), _apply_filters, _apply_sort and
+load_only on the report fields, then rows are read with yield_per(1000) and formatted with
+_report_value. The page cache is warm, as in a running web process.
+"""
+import argparse
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from types import SimpleNamespace
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+VARIANTS = ("text", "python", "sql")
+FIELDS = ["ritdatum", "ritnummer", "rittype", "status", "vervoerder", "opdrachtgever", "plaats_van", "plaats_naar"]
+
+
+def _patch(variant):
+    import sqlalchemy as sa
+
+    import models
+    from blueprints.reports import routes
+
+    if variant == "python":
+        return
+    sa.event.remove(sa.engine.Engine, "after_cursor_execute", models._load_string_codes)
+    models.EncodedString.process_result_value = lambda self, value, dialect: value
+    if variant == "text":
+        models.EncodedString.bind_expression = lambda self, bindvalue: bindvalue
+        routes.decoded = lambda column: column
+    else:
+        models.EncodedString.column_expression = lambda self, column: models.decoded(column)
+
+
+def _load(path, rows, days, variant):
+    """Fill rgritten like bench_layout does; encoded columns as codes unless variant is text."""
+    from bench_layout import _columns, _days
+    from models import RGRIT_ENCODED_COLUMNS
+
+    names = [name for name, _ in _columns()]
+    data = [row for day in _days(rows, days) for row in day]
+    at = names.index("ingested_at")
+    data = [row[:at] + ("2025-06-01 00:00:00",) + row[at + 1 :] for row in data]
+    con = sqlite3.connect(path)
+    if variant != "text":
+        positions = [names.index(name) for name in RGRIT_ENCODED_COLUMNS]
+        values = sorted({row[i] for row in data for i in positions} - {None})
+        con.executemany("INSERT INTO rgritten_strings (value) VALUES (?)", [(v,) for v in values])
+        codes = dict(con.execute("SELECT value, code FROM rgritten_strings"))
+        data = [tuple(codes.get(v) if i in positions else v for i, v in enumerate(row)) for row in data]
+    con.executemany(
+        f"INSERT INTO rgritten ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})", data
+    )
+    con.commit()
+    con.execute("ANALYZE")
+    con.close()
+
+
+def _reports(days, repeat):
+    base = datetime(2025, 1, 1)
+    months = [base + timedelta(days=(i * 97) % max(1, days - 31)) for i in range(repeat)]
+
+    def month(start, **more):
+        filters = [
+            {"field": "ritdatum", "op": ">=", "value": start.date().isoformat()},
+            {"field": "ritdatum", "op": "<", "value": (start + timedelta(days=31)).date().isoformat()},
+        ]
+        return SimpleNamespace(
+            filter_fields=filters + more.get("filters", []),
+            sort_fields=more.get("sort", []),
+            group_fields=more.get("group", []),
+        )
+
+    return {
+        "month rows": [month(m) for m in months],
+        "month by vervoerder": [month(m, group=["vervoerder"]) for m in months],
+        "vervoerder = value": [
+            month(m, filters=[{"field": "vervoerder", "op": "=", "value": "vervoerder-3"}]) for m in months
+        ],
+    }
+
+
+def _run(variant, path, rows, days, repeat, limit):
+    os.environ["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{path}"
+    os.environ["DATA_REFRESH_IN_WEB"] = "0"
+    _patch(variant)
+    from sqlalchemy.orm import load_only
+
+    from app import create_app
+    from blueprints.reports.routes import _apply_filters, _apply_sort, _report_columns, _report_value
+    from extensions import db
+    from models import RGRit
+    from sqlite_store import read_session
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+    _load(path, rows, days, variant)
+
+    results = {}
+    with app.test_request_context():  # the report helpers read request args
+        for name, templates in _reports(days, repeat).items():
+            times = []
+            for template in [templates[0]] + templates:  # the first run warms the caches
+                started = time.perf_counter()
+                session = read_session()
+                query = _apply_sort(_apply_filters(session.query(RGRit), "rgritten", template), "rgritten", template)
+                query = query.options(load_only(*_report_columns(FIELDS), raiseload=True))
+                count = 0
+                for row in query.limit(limit).yield_per(1000):
+                    [_report_value(field, row) for field in FIELDS]
+                    count += 1
+                session.rollback()
+                times.append(time.perf_counter() - started)
+            results[name] = (sorted(times[1:])[len(times[1:]) // 2], count)
+    print(json.dumps(results))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--limit", type=int, default=50_000)
+    parser.add_argument("--variant", choices=VARIANTS)
+    args = parser.parse_args()
+    tmp = tempfile.mkdtemp()
+    if args.variant:
+        path = os.path.join(tmp, f"{args.variant}.db")
+        return _run(args.variant, path, args.rows, args.days, args.repeat, args.limit)
+
+    results = {}
+    for variant in VARIANTS:
+        out = subprocess.run(
+            [sys.executable, __file__, "--variant", variant, "--rows", str(args.rows),
+             "--days", str(args.days), "--repeat", str(args.repeat), "--limit", str(args.limit)],
+            check=True, capture_output=True, text=True, cwd=tmp,
+        ).stdout
+        results[variant] = json.loads(out.strip().splitlines()[-1])
+
+    print(f"{'ms per report':<22}{'rows':>8}" + "".join(f"{v:>10}" for v in VARIANTS) + f"{'py/text':>10}{'sql/text':>10}")
+    for name, (_, count) in results["text"].items():
+        ms = [results[v][name][0] * 1000 for v in VARIANTS]
+        print(
+            f"{name:<22}{count:>8}" + "".join(f"{m:10.1f}" for m in ms)
+            + f"{ms[1] / ms[0]:9.2f}x{ms[2] / ms[0]:9.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,7 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+import json
+import time
+
+from flask import Blueprint, render_template, request, redirect, url_for, flash, Response, stream_with_context
 from flask_wtf import FlaskForm
 from wtforms import (
     StringField,
@@ -9,11 +12,14 @@ from wtforms import (
     IntegerField,
     HiddenField,
 )
-from wtforms.validators import DataRequired, Email, Optional, Length
-from flask_login import login_required
+from wtforms.validators import DataRequired, Email, Optional, Length, NumberRange
+from flask_login import login_required, current_user
 from extensions import db
-from models import User, Role, ConnectionSetting, ConnectionProfile, UserProject, DataRefreshConfig
+from models import User, Role, ConnectionSetting, ConnectionProfile, UserProject, DataRefreshConfig, RefreshSchedule, SyncJob, SyncRun, SyncRunChunk
 from role_required import role_required
+import refresh_scheduler
+import remote_engines
+import sync_jobs
 import sqlalchemy as sa
 
 bp = Blueprint("admin", __name__, url_prefix="/beheer")
@@ -53,6 +59,8 @@ class ConnForm(FlaskForm):
     password = PasswordField("DB Pass", validators=[Optional()])
     odbc_driver = StringField("ODBC Driver", default="ODBC Driver 17 for SQL Server", validators=[DataRequired()])
     trust_server_cert = BooleanField("Trust Server Certificate")
+    query_maxdop = IntegerField("MAXDOP (leeg = server standaard)", validators=[Optional(), NumberRange(min=0, max=64)])
+    snapshot_isolation = BooleanField("Snapshot isolation (lezen zonder locks)")
 
 class ConnProfileForm(FlaskForm):
     id = HiddenField("id")
@@ -69,17 +77,79 @@ class ConnProfileForm(FlaskForm):
 
 class RefreshConfigForm(FlaskForm):
     enabled = BooleanField("Scheduler aan")
-    run_time = StringField("Dagelijks tijdstip (HH:MM)", default="02:00", validators=[DataRequired()])
     profile_id = SelectField("Profiel", choices=[], validators=[Optional()])
     chunk_size = IntegerField("Chunk grootte", default=1000, validators=[DataRequired()])
     min_ritdatum = StringField("Minimale ritdatum (YYYY-MM-DD)", validators=[Optional()])
 
+class ScheduleForm(FlaskForm):
+    id = HiddenField("id")
+    name = StringField("Naam", validators=[DataRequired(), Length(max=120)])
+    enabled = BooleanField("Actief", default=True)
+    profile_id = SelectField("Profiel", choices=[], validators=[Optional()])
+    interval_minutes = IntegerField("Elke N minuten", validators=[Optional(), NumberRange(min=1, max=1440)])
+    cron = StringField("Cron (min uur dag maand weekdag)", validators=[Optional(), Length(max=120)])
+    mode = SelectField(
+        "Soort",
+        choices=[("append", "Nieuwe ritten"), ("upsert", "Bijwerken (upsert)"), ("reconcile", "Reconcile")],
+        default="append",
+    )
+    window_days = IntegerField("Venster (dagen)", default=0, validators=[Optional(), NumberRange(min=0)])
+    jitter_seconds = IntegerField("Jitter (s)", default=0, validators=[Optional(), NumberRange(min=0, max=3600)])
+    catch_up = BooleanField("Gemiste run inhalen", default=True)
+
+class SyncNowForm(FlaskForm):
+    profile_id = SelectField("Profiel", choices=[], validators=[DataRequired()])
+    mode = SelectField("Soort", choices=[("append", "Nieuwe ritten"), ("upsert", "Bijwerken (upsert)")], default="append")
+    resync_days = IntegerField("Dagen opnieuw ophalen", default=0, validators=[Optional(), NumberRange(min=0, max=366)])
+
+class ColumnProfileForm(FlaskForm):
+    columns = SelectMultipleField("Kolommen", choices=[], validators=[Optional()])
+    action = HiddenField("action", default="save")
+
 # ----- Views -----
 @bp.route("/")
 @login_required
 @role_required("Beheerder")
 def dashboard():
-    return render_template("admin_dashboard.html")
+    runs = (
+        db.session.query(SyncRun)
+        .filter(SyncRun.status != "running")
+        .order_by(SyncRun.id.desc())
+        .limit(60)
+        .all()
+    )[::-1]
+    latest = runs[-1] if runs else None
+    chunks = (
+        db.session.query(SyncRunChunk)
+        .filter(SyncRunChunk.run_id == latest.id)
+        .order_by(SyncRunChunk.seq)
+        .all()
+        if latest
+        else []
+    )
+    return render_template(
+        "admin_dashboard.html",
+        pools=remote_engines.pool_stats(),
+        runs=runs,
+        trends=_run_trends(runs, chunks),
+    )
+
+def _run_trends(runs, chunks):
+    """Chart series: per run (throughput, seconds per stage) and per batch of the latest run."""
+    stages = ["fetch", "convert", "insert", "commit"]
+    return {
+        "labels": [r.started_at.strftime("%d-%m %H:%M") for r in runs],
+        "rows_per_second": [round(r.rows / r.seconds, 1) if r.seconds else None for r in runs],
+        "mb": [round(r.bytes / 1e6, 2) for r in runs],
+        "status": [r.status for r in runs],
+        "stages": {st: [getattr(r, f"{st}_seconds") for r in runs] for st in stages},
+        "chunk_labels": [c.seq for c in chunks],
+        # Milliseconds per 1000 rows, so batches of different sizes compare.
+        "chunk_stages": {
+            st: [round(1e6 * getattr(c, f"{st}_seconds") / c.rows, 1) if c.rows else None for c in chunks]
+            for st in stages
+        },
+    }
 
 @bp.route("/users", methods=["GET", "POST"])
 @login_required
@@ -268,6 +338,7 @@ def connection():
         if cp:
             db.session.delete(cp)
             db.session.commit()
+            remote_engines.discard(cp.id)
             remaining = db.session.query(ConnectionProfile).filter_by(project=cp.project).order_by(ConnectionProfile.name).all()
             if remaining:
                 return redirect(url_for("admin.connection", project=remaining[0].project, id=remaining[0].id))
@@ -300,7 +371,10 @@ def connection():
                 cp.password = old_pwd
             cp.odbc_driver = form.odbc_driver.data
             cp.trust_server_cert = bool(form.trust_server_cert.data)
+            cp.query_maxdop = form.query_maxdop.data
+            cp.snapshot_isolation = bool(form.snapshot_isolation.data)
             db.session.commit()
+            remote_engines.discard(cp.id)
             flash("Profiel opgeslagen", "success")
             return redirect(url_for("admin.connection", project=cp.project, id=cp.id))
 
@@ -341,27 +415,222 @@ def refresh_config():
 
     if request.method == "POST" and form.validate_on_submit():
         cfg.enabled = bool(form.enabled.data)
-        cfg.run_time = (form.run_time.data or "02:00").strip()
         cfg.profile_id = int(form.profile_id.data) if form.profile_id.data else None
         cfg.chunk_size = form.chunk_size.data or 1000
         cfg.min_ritdatum = (form.min_ritdatum.data or "").strip() or None
         db.session.commit()
+        refresh_scheduler.notify()
         flash("Data refresh instellingen opgeslagen", "success")
         return redirect(url_for("admin.refresh_config"))
 
     if request.method == "GET":
         form.enabled.data = cfg.enabled
-        form.run_time.data = cfg.run_time or "02:00"
         form.profile_id.data = str(cfg.profile_id) if cfg.profile_id else ""
         form.chunk_size.data = cfg.chunk_size or 1000
         form.min_ritdatum.data = cfg.min_ritdatum or ""
 
+    from rgritten_sync import ALL_COLUMNS, REQUIRED_COLUMNS, suggest_sync_columns, sync_columns
+
+    columns_form = ColumnProfileForm(prefix="cols")
+    columns_form.columns.choices = [(c, c) for c in ALL_COLUMNS]
+
+    schedules = db.session.query(RefreshSchedule).order_by(RefreshSchedule.name).all()
+    edit = db.session.get(RefreshSchedule, request.args.get("schedule", type=int) or 0)
+    schedule_form = ScheduleForm(prefix="sched", obj=edit, formdata=None)
+    schedule_form.profile_id.choices = [("", "- standaardprofiel -")] + form.profile_id.choices[1:]
+    if edit:
+        schedule_form.id.data = str(edit.id)
+        schedule_form.profile_id.data = str(edit.profile_id) if edit.profile_id else ""
+
+    sync_form = SyncNowForm(prefix="sync", formdata=None)
+    sync_form.profile_id.choices = form.profile_id.choices[1:]
+    sync_form.profile_id.data = str(cfg.profile_id) if cfg.profile_id else None
+    jobs = db.session.query(SyncJob).order_by(SyncJob.id.desc()).limit(10).all()
     return render_template(
         "admin_refresh.html",
         form=form,
         profiles=profiles,
+        columns_form=columns_form,
+        schedules=schedules,
+        schedule_form=schedule_form,
+        editing=edit,
+        sync_form=sync_form,
+        jobs=jobs,
+        active_job=sync_jobs.active_job(),
+        cfg=cfg,
+        lease=refresh_scheduler.lease_holder(),
+        all_columns=ALL_COLUMNS,
+        required_columns=REQUIRED_COLUMNS,
+        synced_columns=sync_columns(),
+        suggested_columns=suggest_sync_columns(),
     )
 
+@bp.route("/refresh/schema", methods=["POST"])
+@login_required
+@role_required("Beheerder")
+def refresh_schedule():
+    profiles = db.session.query(ConnectionProfile).all()
+    form = ScheduleForm(prefix="sched")
+    form.profile_id.choices = [("", "")] + [(str(p.id), p.name) for p in profiles]
+    if not form.validate_on_submit():
+        flash("Ongeldig schema: " + "; ".join(e for errs in form.errors.values() for e in errs), "warning")
+        return redirect(url_for("admin.refresh_config"))
+
+    cron = (form.cron.data or "").strip() or None
+    interval = form.interval_minutes.data
+    if bool(cron) == bool(interval):
+        flash("Vul een interval of een cron-expressie in (niet allebei)", "warning")
+        return redirect(url_for("admin.refresh_config"))
+    if cron:
+        try:
+            refresh_scheduler.parse_cron(cron)
+        except ValueError as exc:
+            flash(str(exc), "warning")
+            return redirect(url_for("admin.refresh_config"))
+
+    schedule = db.session.get(RefreshSchedule, int(form.id.data)) if form.id.data else None
+    if schedule is None:
+        schedule = RefreshSchedule()
+        db.session.add(schedule)
+    schedule.name = form.name.data.strip()
+    schedule.enabled = bool(form.enabled.data)
+    schedule.profile_id = int(form.profile_id.data) if form.profile_id.data else None
+    schedule.cron = cron
+    schedule.interval_minutes = None if cron else interval
+    schedule.mode = form.mode.data
+    schedule.window_days = form.window_days.data or 0
+    schedule.jitter_seconds = form.jitter_seconds.data or 0
+    schedule.catch_up = bool(form.catch_up.data)
+    schedule.next_run_at = None  # replanned by the scheduler
+    try:
+        db.session.commit()
+    except sa.exc.IntegrityError:
+        db.session.rollback()
+        flash("Er bestaat al een schema met deze naam", "warning")
+        return redirect(url_for("admin.refresh_config"))
+    refresh_scheduler.notify()
+    flash(f"Schema '{schedule.name}' opgeslagen", "success")
+    return redirect(url_for("admin.refresh_config"))
+
+@bp.route("/refresh/schema/<int:schedule_id>/delete", methods=["POST"])
+@login_required
+@role_required("Beheerder")
+def delete_refresh_schedule(schedule_id):
+    schedule = db.session.get(RefreshSchedule, schedule_id)
+    if schedule:
+        db.session.delete(schedule)
+        db.session.commit()
+        refresh_scheduler.notify()
+        flash("Schema verwijderd", "success")
+    return redirect(url_for("admin.refresh_config"))
+
+@bp.route("/refresh/sync", methods=["POST"])
+@login_required
+@role_required("Beheerder")
+def refresh_sync_now():
+    form = SyncNowForm(prefix="sync")
+    form.profile_id.choices = [(str(p.id), p.name) for p in db.session.query(ConnectionProfile)]
+    if not form.validate_on_submit():
+        flash("Kies een profiel voor de sync", "warning")
+        return redirect(url_for("admin.refresh_config"))
+    try:
+        sync_jobs.enqueue(
+            int(form.profile_id.data),
+            mode=form.mode.data,
+            resync_days=form.resync_days.data or 0,
+            requested_by=current_user.username,
+        )
+    except ValueError as exc:
+        flash(str(exc), "warning")
+        return redirect(url_for("admin.refresh_config"))
+    refresh_scheduler.notify()
+    if refresh_scheduler.lease_holder() is None:
+        flash("Sync-job staat in de wachtrij, maar er draait geen scheduler om hem uit te voeren", "warning")
+    else:
+        flash("Sync-job gestart", "success")
+    return redirect(url_for("admin.refresh_config"))
+
+@bp.route("/refresh/jobs/<int:job_id>/cancel", methods=["POST"])
+@login_required
+@role_required("Beheerder")
+def cancel_sync_job(job_id):
+    result = sync_jobs.request_cancel(job_id)
+    if result == "cancelled":
+        flash("Sync-job geannuleerd", "info")
+    elif result == "requested":
+        flash("Sync-job wordt geannuleerd na de volgende commit", "info")
+    else:
+        flash("Sync-job loopt niet meer", "warning")
+    return redirect(url_for("admin.refresh_config"))
+
+@bp.route("/refresh/jobs/<int:job_id>/events")
+@login_required
+@role_required("Beheerder")
+def sync_job_events(job_id):
+    """Server-Sent Events with the job's progress; closes after STREAM_SECONDS, the browser reconnects."""
+
+    def generate():
+        yield "retry: 2000\n\n"
+        deadline = time.monotonic() + sync_jobs.STREAM_SECONDS
+        last = None
+        while True:
+            job = db.session.get(SyncJob, job_id)
+            data = sync_jobs.snapshot(job) if job else {"id": job_id, "status": "missing"}
+            # Do not keep a connection checked out while waiting.
+            db.session.remove()
+            if data != last:
+                yield f"data: {json.dumps(data)}\n\n"
+                last = data
+            if data["status"] not in sync_jobs.ACTIVE:
+                yield "event: end\ndata: {}\n\n"
+                return
+            if time.monotonic() > deadline:
+                return
+            time.sleep(1)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@bp.route("/refresh/kolommen", methods=["POST"])
+@login_required
+@role_required("Beheerder")
+def refresh_columns():
+    from rgritten_partitions import frozen_months
+    from rgritten_sync import ALL_COLUMNS, save_column_profile, suggest_sync_columns
+
+    form = ColumnProfileForm(prefix="cols")
+    form.columns.choices = [(c, c) for c in ALL_COLUMNS]
+    if not form.validate_on_submit():
+        flash("Ongeldige kolomselectie", "warning")
+        return redirect(url_for("admin.refresh_config"))
+
+    if form.action.data == "all":
+        columns = None
+    elif form.action.data == "suggest":
+        columns = suggest_sync_columns()
+    else:
+        columns = form.columns.data
+    added, dropped = save_column_profile(columns)
+    if not added and not dropped:
+        flash("Kolomprofiel ongewijzigd", "info")
+        return redirect(url_for("admin.refresh_config"))
+    sync_jobs.enqueue_columns(dropped, requested_by=current_user.username)
+    refresh_scheduler.notify()
+    msg = f"Kolomprofiel opgeslagen: {len(added)} toegevoegd, {len(dropped)} verwijderd."
+    msg += " De opgeslagen ritten worden op de achtergrond bijgewerkt (sync-job)."
+    if dropped:
+        msg += " Verwijderde kolommen worden daarbij lokaal leeggemaakt."
+    if added:
+        msg += " Draai reconcile-rgritten om de toegevoegde kolommen voor bestaande ritten te vullen."
+    frozen = sorted(frozen_months())
+    if frozen:
+        msg += f" Bevroren maanden ({', '.join(frozen)}) worden niet aangepast."
+    flash(msg, "success")
+    return redirect(url_for("admin.refresh_config"))
+
 @bp.route("/connection/test", methods=["POST"])
 @login_required
 @role_required("Beheerder")
@@ -374,9 +643,8 @@ def connection_test():
     if not cp:
         flash("Profiel niet gevonden", "warning")
         return redirect(url_for("admin.connection"))
-    uri = cp.build_uri()
     try:
-        engine = sa.create_engine(uri)
+        engine, _ = remote_engines.get_engine(cp)
         with engine.connect() as con:
             version = con.execute(sa.text("SELECT @@VERSION")).scalar()
         flash(f"OK – {version}", "success")
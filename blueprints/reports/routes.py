@@ -1,10 +1,12 @@
 from io import StringIO, BytesIO
-from datetime import datetime, date, time
+from datetime import datetime, date, time, timedelta
 from flask import render_template, request, redirect, url_for, flash, send_file, Response, stream_with_context
 from flask_login import login_required
-from sqlalchemy import asc, desc, func
+from sqlalchemy import and_, asc, desc, func, or_
+from sqlalchemy.orm import load_only
 from extensions import db
-from models import RGRit, ReportTemplate
+from models import RGRIT_ENCODED_COLUMNS, RGRIT_INDICATOR_COLUMNS, RGRit, ReportTemplate, decoded
+from sqlite_store import read_session
 from . import bp
 
 DEFAULT_REPORT_ROW_LIMIT = 1000
@@ -14,7 +16,7 @@ PIVOT_AGGS = ("count", "sum", "avg", "min", "max")
 def _dataset_fields(dataset):
     if dataset == "rgritten":
         cols = [c.key for c in RGRit.__table__.columns]
-        base = [c for c in cols if c not in ("id", "ingested_at")]
+        base = [c for c in cols if c not in ("id", "ingested_at", "row_hash", "ind_set", "ind_clear")]
         base.append("reistijd_calc")
         base.append("locatie")
         return base
@@ -42,18 +44,67 @@ def _field_kind(dataset, field):
     return "text"
 
 
-def _parse_date_value(val, as_end=False):
+def _parse_date_value(val):
     if not val:
         return None
     try:
         if "T" in val or " " in val:
             return datetime.fromisoformat(val)
-        d = date.fromisoformat(val)
-        return datetime.combine(d, time.max if as_end else time.min)
+        return datetime.combine(date.fromisoformat(val), time.min)
     except ValueError:
         return None
 
 
+def _date_span(val):
+    """
+    Half-open [start, end) covered by a date filter value: the whole day for YYYY-MM-DD,
+    the instant itself for a datetime. None if the value does not parse.
+    """
+    val = (val or "").strip()
+    start = _parse_date_value(val)
+    if start is None:
+        return None
+    if "T" in val or " " in val:
+        return start, start + timedelta(microseconds=1)
+    return start, start + timedelta(days=1)
+
+
+def _date_condition(col, op, val):
+    """
+    Date filter as a range on the stored value. Stored datetimes are ISO strings, which
+    sort like a day key, so ritdatum filters use the (ritdatum, ritnummer) index; DATE(col)
+    would make SQLite scan the table.
+    """
+    if op == "between":
+        parts = (val or "").split(",")
+        if len(parts) != 2:
+            return None
+        start, end = _date_span(parts[0]), _date_span(parts[1])
+        conditions = []
+        if start:
+            conditions.append(col >= start[0])
+        if end:
+            conditions.append(col < end[1])
+        return and_(*conditions) if conditions else None
+    span = _date_span(val)
+    if span is None:
+        return None
+    start, end = span
+    if op == "=":
+        return and_(col >= start, col < end)
+    if op == "!=":
+        return or_(col < start, col >= end)
+    if op == "<":
+        return col < start
+    if op == "<=":
+        return col < end
+    if op == ">":
+        return col >= end
+    if op == ">=":
+        return col >= start
+    return None
+
+
 def _parse_time_value(val):
     if not val:
         return None
@@ -63,6 +114,25 @@ def _parse_time_value(val):
         return None
 
 
+# Source columns each calculated field reads; the sync column profile must keep these.
+CALC_FIELD_COLUMNS = {
+    "reistijd_calc": ("instapgerealiseerd", "uitstapgerealiseerd"),
+    "locatie": ("aankomst", "locatie_van", "locatie_naar"),
+}
+
+
+def _report_columns(fields):
+    """
+    RGRit attributes the rows of a report read: its fields plus the inputs of calculated
+    ones. Loading only these lets SQLite answer from ix_rgritten_hot when they are all hot.
+    """
+    names = []
+    for field in fields:
+        names.extend(CALC_FIELD_COLUMNS.get(field, (field,)))
+    columns = RGRit.__table__.c
+    return [getattr(RGRit, name) for name in dict.fromkeys(names) if name in columns] or [RGRit.id]
+
+
 def _calc_value(field, row):
     if field == "reistijd_calc":
         a = getattr(row, "instapgerealiseerd", None)
@@ -170,7 +240,7 @@ def _build_pivot_table(dataset, query, row_fields, col_field, value_defs, row_li
         select_cols.append(expr.label(agg_label))
 
     grouped = (
-        db.session.query(*select_cols)
+        query.session.query(*select_cols)
         .group_by(*(row_sel_cols + [col_sel]))
         .all()
     )
@@ -520,9 +590,38 @@ def duplicate_report(template_id):
     return redirect(url_for("reports.edit_report", template_id=copy_tmpl.id))
 
 
+# Operators on encoded text columns that need the text itself; "=" compares the codes.
+DECODED_OPS = ("like", "not_like", "!=", ">", ">=", "<", "<=")
+
+
+def _filter_column(field, col, op):
+    if field in RGRIT_ENCODED_COLUMNS and op in DECODED_OPS:
+        return decoded(col)
+    return col
+
+
+def _indicator_bit(field, op, val):
+    """(value, bit) when `field = val` is an indicator flag test the bitmasks can answer."""
+    if field not in RGRIT_INDICATOR_COLUMNS or op != "=" or (val or "").strip() not in ("0", "1"):
+        return None
+    return int(val.strip()), 1 << RGRIT_INDICATOR_COLUMNS.index(field)
+
+
+def _apply_indicator_masks(query, masks):
+    """
+    Indicator equality filters as one test per bitmask, so a report combining several
+    flags is answered from ix_rgritten_hot instead of reading every flag from the table.
+    """
+    for value, column in ((1, RGRit.ind_set), (0, RGRit.ind_clear)):
+        if masks[value]:
+            query = query.filter(column.op("&")(masks[value]) == masks[value])
+    return query
+
+
 def _apply_filters(query, dataset, template):
     if dataset != "rgritten":
         return query
+    masks = {1: 0, 0: 0}
     # Apply saved filters
     for fdef in template.filter_fields or []:
         if isinstance(fdef, str):
@@ -534,6 +633,11 @@ def _apply_filters(query, dataset, template):
         col = getattr(RGRit, field, None)
         if col is None:
             continue
+        bit = _indicator_bit(field, op, val)
+        if bit:
+            masks[bit[0]] |= bit[1]
+            continue
+        col = _filter_column(field, col, op)
         kind = _field_kind(dataset, field)
         if kind == "date":
             if op == "is_null":
@@ -541,33 +645,9 @@ def _apply_filters(query, dataset, template):
             elif op == "not_null":
                 query = query.filter(col.isnot(None))
             else:
-                # treat val as date-only or datetime; apply equality/range depending on op
-                if op in ("=", "!=", "<", "<=", ">", ">="):
-                    if not val:
-                        continue
-                    dt = _parse_date_value(val, as_end=(op in ("<=", "<")))
-                    if dt:
-                        if op == "=":
-                            query = query.filter(func.date(col) == dt.date())
-                        elif op == "!=":
-                            query = query.filter(func.date(col) != dt.date())
-                        elif op == "<":
-                            query = query.filter(col < dt)
-                        elif op == "<=":
-                            query = query.filter(col <= dt)
-                        elif op == ">":
-                            query = query.filter(col > dt)
-                        elif op == ">=":
-                            query = query.filter(col >= dt)
-                elif op == "between":
-                    parts = (val or "").split(",")
-                    if len(parts) == 2:
-                        start = _parse_date_value(parts[0], as_end=False)
-                        end = _parse_date_value(parts[1], as_end=True)
-                        if start:
-                            query = query.filter(col >= start)
-                        if end:
-                            query = query.filter(col <= end)
+                condition = _date_condition(col, op, val)
+                if condition is not None:
+                    query = query.filter(condition)
         elif kind == "time":
             if op == "is_null":
                 query = query.filter(col.is_(None))
@@ -634,30 +714,20 @@ def _apply_filters(query, dataset, template):
         col = getattr(RGRit, field, None)
         if col is None:
             continue
+        rt_op = (request.args.get(f"rt_op_{field}") or "=").lower()
+        bit = _indicator_bit(field, rt_op, request.args.get(f"rt_val_{field}"))
+        if bit:
+            masks[bit[0]] |= bit[1]
+            continue
+        col = _filter_column(field, col, rt_op)
         kind = _field_kind(dataset, field)
         if kind == "date":
-            raw_start = request.args.get(f"rt_from_{field}")
-            raw_end = request.args.get(f"rt_to_{field}")
-            # If input is date-only, compare on DATE(col)
-            if (raw_start and len(raw_start) == 10) or (raw_end and len(raw_end) == 10):
-                try:
-                    if raw_start:
-                        ds = date.fromisoformat(raw_start)
-                        query = query.filter(func.date(col) >= ds)
-                    if raw_end:
-                        de = date.fromisoformat(raw_end)
-                        query = query.filter(func.date(col) <= de)
-                except ValueError:
-                    pass
-            else:
-                if raw_start:
-                    start = _parse_date_value(raw_start, as_end=False)
-                    if start:
-                        query = query.filter(col >= start)
-                if raw_end:
-                    end = _parse_date_value(raw_end, as_end=True)
-                    if end:
-                        query = query.filter(col <= end)
+            start = _date_span(request.args.get(f"rt_from_{field}"))
+            end = _date_span(request.args.get(f"rt_to_{field}"))
+            if start:
+                query = query.filter(col >= start[0])
+            if end:
+                query = query.filter(col < end[1])
         elif kind == "time":
             op = (request.args.get(f"rt_op_{field}") or "=").lower()
             if op in ("is_null", "not_null", "between", "=", "!=", ">", ">=", "<", "<="):
@@ -716,7 +786,7 @@ def _apply_filters(query, dataset, template):
             else:  # "=" or unspecified
                 if val is not None:
                     query = query.filter(col == val)
-    return query
+    return _apply_indicator_masks(query, masks)
 
 
 def _apply_sort(query, dataset, template):
@@ -727,6 +797,8 @@ def _apply_sort(query, dataset, template):
         col = getattr(RGRit, item.get("field", ""), None)
         if col is None:
             continue
+        if item.get("field") in RGRIT_ENCODED_COLUMNS:
+            col = decoded(col)
         if item.get("dir") == "desc":
             orders.append(desc(col))
         else:
@@ -735,7 +807,7 @@ def _apply_sort(query, dataset, template):
         for gf in template.group_fields:
             col = getattr(RGRit, gf, None)
             if col is not None:
-                orders.insert(0, asc(col))
+                orders.insert(0, asc(decoded(col) if gf in RGRIT_ENCODED_COLUMNS else col))
     if orders:
         query = query.order_by(*orders)
     return query
@@ -754,7 +826,7 @@ def run_report(template_id):
 
     dataset_fields = _dataset_fields(tmpl.dataset)
     fields = tmpl.include_fields or []
-    query = db.session.query(RGRit)
+    query = read_session().query(RGRit)
     query = _apply_filters(query, tmpl.dataset, tmpl)
     query = _apply_sort(query, tmpl.dataset, tmpl)
 
@@ -788,6 +860,9 @@ def run_report(template_id):
     else:
         pivot_enabled = False
 
+    # Pivots select their own columns; rows load only what the report shows.
+    query = query.options(load_only(*_report_columns(fields), raiseload=True))
+
     if fmt == "csv":
         def generate():
             if pivot_enabled:
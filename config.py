@@ -7,9 +7,18 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.getenv("SQLALCHEMY_DATABASE_URI", "sqlite:///app.db")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
-    # Daily data refresh scheduler (disabled by default)
+    # Local SQLite storage profile (see sqlite_store.py)
+    SQLITE_CACHE_MB = int(os.getenv("SQLITE_CACHE_MB", "64"))
+    SQLITE_MMAP_MB = int(os.getenv("SQLITE_MMAP_MB", "256"))
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "10000"))
+    SQLITE_READERS = int(os.getenv("SQLITE_READERS", "4"))  # pooled read-only connections
+    SQLITE_ANALYSIS_LIMIT = int(os.getenv("SQLITE_ANALYSIS_LIMIT", "1000"))  # rows ANALYZE samples per index
+
+    # Data refresh scheduler (disabled by default); DATA_REFRESH_TIME seeds the first daily schedule
     DATA_REFRESH_ENABLED = os.getenv("DATA_REFRESH_ENABLED", "0") == "1"
     DATA_REFRESH_TIME = os.getenv("DATA_REFRESH_TIME", "02:00")  # HH:MM local time
     DATA_REFRESH_PROFILE = os.getenv("DATA_REFRESH_PROFILE", "Historie")
     DATA_REFRESH_CHUNK_SIZE = int(os.getenv("DATA_REFRESH_CHUNK_SIZE", "1000"))
     DATA_REFRESH_MIN_RITDATUM = os.getenv("DATA_REFRESH_MIN_RITDATUM") or None
+    # Run the scheduler inside the web processes; set to 0 when a `flask refresh-worker` runs.
+    DATA_REFRESH_IN_WEB = os.getenv("DATA_REFRESH_IN_WEB", "1") == "1"
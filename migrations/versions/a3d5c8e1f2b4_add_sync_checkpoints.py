@@ -0,0 +1,34 @@
+"""add sync checkpoints
+
+Revision ID: a3d5c8e1f2b4
+Revises: f5ff3f754f29
+Create Date: 2026-10-17 09:12:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3d5c8e1f2b4'
+down_revision = 'f5ff3f754f29'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'sync_checkpoints',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('dataset', sa.String(length=120), nullable=False),
+        sa.Column('profile_id', sa.Integer(), sa.ForeignKey('connection_profiles.id'), nullable=True),
+        sa.Column('last_ritdatum', sa.String(length=20), nullable=True),
+        sa.Column('last_ritnummer', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('status', sa.String(length=20), nullable=False, server_default='ok'),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.UniqueConstraint('dataset', name='uq_sync_checkpoints_dataset'),
+    )
+
+
+def downgrade():
+    op.drop_table('sync_checkpoints')
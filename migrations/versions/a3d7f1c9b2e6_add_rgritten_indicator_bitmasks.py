@@ -0,0 +1,135 @@
+"""add rgritten indicator bitmasks
+
+Revision ID: a3d7f1c9b2e6
+Revises: f8c3a6d1e5b7
+Create Date: 2026-10-18 15:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3d7f1c9b2e6'
+down_revision = 'f8c3a6d1e5b7'
+branch_labels = None
+depends_on = None
+
+
+HOT_COLUMNS = [
+    'ritdatum',
+    'ritnummer',
+    'rittype',
+    'status',
+    'vervoerder',
+    'opdrachtgever',
+    'instap',
+    'uitstap',
+    'instapgerealiseerd',
+    'uitstapgerealiseerd',
+    'afstand',
+    'aankomst',
+    'locatie_van',
+    'locatie_naar',
+    'plaats_van',
+    'plaats_naar',
+]
+
+# Bit n is the n-th flag; must match models.RGRIT_INDICATOR_COLUMNS.
+INDICATOR_COLUMNS = [
+    'ind_rolstoel',
+    'ind_begeleiding_sociaal',
+    'ind_begeleiding_medisch',
+    'ind_beperking_lichamelijk',
+    'ind_beperking_verstandelijk',
+    'ind_hulphond',
+    'ind_voorin_in_taxi',
+    'ind_kamer_tot_kamer_vervoer',
+    'ind_gezinstaxi',
+    'ind_personenauto',
+    'ind_lage_instap',
+    'ind_voldoende_beenruimte',
+    'ind_rollator',
+    'ind_beperking_visueel',
+    'ind_beperking_auditief',
+    'ind_autisme',
+    'ind_individueel_vervoer',
+    'ind_scootmobiel',
+    'ind_strippen',
+    'ind_voldoende_zithoogte',
+    'ind_afwijkend_tarief',
+    'ind_zithulp',
+    'ind_belservice',
+    'ind_epilepsie',
+    'ind_geen_warme_overdracht',
+    'ind_kleinschalig',
+    'ind_extra1',
+    'ind_extra2',
+    'ind_extra3',
+    'ind_extra4',
+    'ind_extra5',
+    'ind_busbegeleider_nodig',
+    'ind_is_busbegeleider',
+    'ind_inclusief_begeleider',
+    'ind_alleen_begeleider',
+    'ind_invloed_op_factuur',
+    'ind_client_mag_rit_wijzigen',
+    'ind_ontheffing_mondkapje',
+    'ind_ontheffing_gordelplicht',
+    'ind_bus',
+    'ind_mag_vraagafhankelijk',
+    'ind_alleen_zitten',
+    'ind_diabetes',
+    'ind_deur_deur',
+    'ind_anderstalig',
+    'ind_opvouwbare_rolstoel',
+    'ind_kinderstoel',
+    'ind_stoelverhoger',
+    'ind_gordelkapje',
+    'ind_meerpuntsgordel',
+    'ind_maxicosi',
+    'ind_begeleiding_niet_verplicht',
+    'ind_afasie',
+    'ind_vaste_zitplaats',
+    'ind_gordelverlenging',
+    'ind_lifo',
+    'ind_filo',
+    'ind_fifo',
+    'ind_vervroegde_belservice',
+    'ind_opstappunt_verplicht',
+    'ind_bagage',
+    'ind_niet_combineren',
+]
+
+
+def _mask(value):
+    # << and | share one precedence level in SQLite, hence the parentheses.
+    return ' | '.join(
+        f'(({name} IS {value}) << {bit})' for bit, name in enumerate(INDICATOR_COLUMNS)
+    )
+
+
+def upgrade():
+    op.add_column('rgritten', sa.Column('ind_set', sa.BigInteger(), nullable=True))
+    op.add_column('rgritten', sa.Column('ind_clear', sa.BigInteger(), nullable=True))
+    # The masks only restate stored flags, so frozen months may be filled in as well.
+    bind = op.get_bind()
+    frozen = bind.execute(
+        sa.text("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = 'rgritten_frozen_update'")
+    ).scalar()
+    if frozen:
+        op.execute('DROP TRIGGER rgritten_frozen_update')
+    op.execute(f'UPDATE rgritten SET ind_set = {_mask(1)}, ind_clear = {_mask(0)}')
+    if frozen:
+        op.execute(frozen)
+    op.drop_index('ix_rgritten_hot', table_name='rgritten')
+    op.create_index('ix_rgritten_hot', 'rgritten', HOT_COLUMNS + ['ind_set', 'ind_clear'], unique=False)
+    op.execute('ANALYZE rgritten')
+
+
+def downgrade():
+    op.drop_index('ix_rgritten_hot', table_name='rgritten')
+    op.create_index('ix_rgritten_hot', 'rgritten', HOT_COLUMNS, unique=False)
+    # Plain DROP COLUMN keeps the clustered row order and the frozen-month triggers.
+    op.execute('ALTER TABLE rgritten DROP COLUMN ind_clear')
+    op.execute('ALTER TABLE rgritten DROP COLUMN ind_set')
@@ -0,0 +1,61 @@
+"""add refresh schedules
+
+Revision ID: a8d4f1c6b2e0
+Revises: f3c7b2e9a5d1
+Create Date: 2026-10-17 18:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a8d4f1c6b2e0'
+down_revision = 'f3c7b2e9a5d1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    schedules = op.create_table(
+        'refresh_schedules',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('name', sa.String(length=120), nullable=False),
+        sa.Column('enabled', sa.Boolean(), nullable=False, server_default=sa.true()),
+        sa.Column('profile_id', sa.Integer(), sa.ForeignKey('connection_profiles.id'), nullable=True),
+        sa.Column('cron', sa.String(length=120), nullable=True),
+        sa.Column('interval_minutes', sa.Integer(), nullable=True),
+        sa.Column('mode', sa.String(length=20), nullable=False, server_default='append'),
+        sa.Column('window_days', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('jitter_seconds', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('catch_up', sa.Boolean(), nullable=False, server_default=sa.true()),
+        sa.Column('next_run_at', sa.DateTime(), nullable=True),
+        sa.Column('last_run_at', sa.DateTime(), nullable=True),
+        sa.Column('last_status', sa.String(length=20), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.UniqueConstraint('name', name='uq_refresh_schedules_name'),
+    )
+
+    # The single daily run_time becomes the first schedule.
+    cfg = op.get_bind().execute(
+        sa.text('SELECT run_time FROM data_refresh_config WHERE id = 1')
+    ).first()
+    if cfg is not None:
+        try:
+            hh, mm = [int(x) for x in (cfg.run_time or '02:00').split(':')[:2]]
+        except ValueError:
+            hh, mm = 2, 0
+        op.bulk_insert(schedules, [{
+            'name': 'Dagelijks',
+            'enabled': True,
+            'cron': f'{mm} {hh} * * *',
+            'mode': 'append',
+            'window_days': 0,
+            'jitter_seconds': 0,
+            'catch_up': False,
+        }])
+
+
+def downgrade():
+    op.drop_table('refresh_schedules')
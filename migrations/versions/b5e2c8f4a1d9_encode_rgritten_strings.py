@@ -0,0 +1,102 @@
+"""encode rgritten strings
+
+Moves the low-cardinality text columns of rgritten into the rgritten_strings dictionary:
+the columns keep their names but hold the integer codes. SQLite cannot change a column's
+type in place, so the table is rebuilt once, keeping ids, row order, indexes and the
+frozen-month triggers.
+
+Revision ID: b5e2c8f4a1d9
+Revises: a3d7f1c9b2e6
+Create Date: 2026-10-18 17:20:00.000000
+
+"""
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5e2c8f4a1d9'
+down_revision = 'a3d7f1c9b2e6'
+branch_labels = None
+depends_on = None
+
+
+# Must match models.RGRIT_ENCODED_COLUMNS.
+ENCODED_COLUMNS = [
+    'rittype',
+    'status',
+    'weekdag',
+    'vervoer_type_omschrijving',
+    'plaats_van',
+    'plaats_naar',
+    'vervoerder',
+    'opdrachtgever',
+    'perceel_omschrijving',
+]
+
+
+def _rebuild(bind, declared, convert):
+    """Copy rgritten into a table with the encoded columns declared as `declared`."""
+    table = bind.exec_driver_sql(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'rgritten'"
+    ).scalar()
+    extras = [
+        sql
+        for (sql,) in bind.exec_driver_sql(
+            "SELECT sql FROM sqlite_master WHERE type IN ('index', 'trigger') "
+            "AND tbl_name = 'rgritten' AND sql IS NOT NULL ORDER BY type"
+        )
+    ]
+    for name in ENCODED_COLUMNS:
+        table, found = re.subn(
+            rf'(\n\s*"?{name}"?\s+)\w+(\(\d+\))?', rf'\g<1>{declared}', table, count=1
+        )
+        if not found:
+            raise RuntimeError(f'rgritten.{name} not found in the table definition')
+    names = [row[1] for row in bind.exec_driver_sql("PRAGMA table_info(rgritten)")]
+    columns = ", ".join(f'"{name}"' for name in names)
+    values = ", ".join(convert(name) if name in ENCODED_COLUMNS else f'"{name}"' for name in names)
+    bind.exec_driver_sql("DROP TABLE IF EXISTS rgritten_encoded")
+    bind.exec_driver_sql(table.replace("rgritten", "rgritten_encoded", 1))
+    bind.exec_driver_sql(
+        f"INSERT INTO rgritten_encoded ({columns}) SELECT {values} FROM rgritten ORDER BY id"
+    )
+    bind.exec_driver_sql("DROP TABLE rgritten")
+    bind.exec_driver_sql("ALTER TABLE rgritten_encoded RENAME TO rgritten")
+    for sql in extras:
+        bind.exec_driver_sql(sql)
+    bind.exec_driver_sql("ANALYZE rgritten")
+
+
+def upgrade():
+    op.create_table(
+        'rgritten_strings',
+        sa.Column('code', sa.Integer(), nullable=False),
+        sa.Column('value', sa.String(length=255), nullable=False),
+        sa.PrimaryKeyConstraint('code'),
+        sa.UniqueConstraint('value'),
+    )
+    bind = op.get_bind()
+    if bind.dialect.name != 'sqlite':
+        return
+    distinct = " UNION ".join(f'SELECT "{name}" AS value FROM rgritten' for name in ENCODED_COLUMNS)
+    op.execute(
+        f"INSERT INTO rgritten_strings (value) SELECT value FROM ({distinct}) "
+        "WHERE value IS NOT NULL ORDER BY value"
+    )
+    _rebuild(
+        bind, 'INTEGER', lambda name: f'(SELECT code FROM rgritten_strings WHERE value = "{name}")'
+    )
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite':
+        _rebuild(
+            bind,
+            'VARCHAR(255)',
+            lambda name: f'(SELECT value FROM rgritten_strings WHERE code = "{name}")',
+        )
+    op.drop_table('rgritten_strings')
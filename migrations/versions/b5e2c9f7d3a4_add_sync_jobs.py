@@ -0,0 +1,48 @@
+"""add sync jobs
+
+Revision ID: b5e2c9f7d3a4
+Revises: a8d4f1c6b2e0
+Create Date: 2026-10-17 20:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5e2c9f7d3a4'
+down_revision = 'a8d4f1c6b2e0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'sync_jobs',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('profile_id', sa.Integer(), sa.ForeignKey('connection_profiles.id'), nullable=False),
+        sa.Column('mode', sa.String(length=20), nullable=False, server_default='append'),
+        sa.Column('resync_days', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('status', sa.String(length=20), nullable=False, server_default='queued'),
+        sa.Column('cancel_requested', sa.Boolean(), nullable=False, server_default=sa.false()),
+        sa.Column('requested_by', sa.String(length=120), nullable=True),
+        sa.Column('owner', sa.String(length=255), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.Column('heartbeat_at', sa.DateTime(), nullable=True),
+        sa.Column('rows', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('pending', sa.Integer(), nullable=True),
+        sa.Column('rows_per_second', sa.Float(), nullable=True),
+        sa.Column('eta_seconds', sa.Float(), nullable=True),
+        sa.Column('cursor_ritdatum', sa.String(length=20), nullable=True),
+        sa.Column('cursor_ritnummer', sa.Integer(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('stats', sa.JSON(), nullable=True),
+    )
+    op.create_index('ix_sync_jobs_status', 'sync_jobs', ['status'])
+
+
+def downgrade():
+    op.drop_index('ix_sync_jobs_status', table_name='sync_jobs')
+    op.drop_table('sync_jobs')
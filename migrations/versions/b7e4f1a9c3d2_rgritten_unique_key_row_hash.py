@@ -0,0 +1,36 @@
+"""rgritten unique (ritdatum, ritnummer) and row_hash
+
+Revision ID: b7e4f1a9c3d2
+Revises: a3d5c8e1f2b4
+Create Date: 2026-10-17 10:05:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e4f1a9c3d2'
+down_revision = 'a3d5c8e1f2b4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('rgritten', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('row_hash', sa.BigInteger(), nullable=True))
+
+    # Earlier append-only runs may have stored a ride more than once; keep the newest copy.
+    op.execute(
+        "DELETE FROM rgritten WHERE ritdatum IS NOT NULL AND id NOT IN ("
+        "SELECT MAX(id) FROM rgritten WHERE ritdatum IS NOT NULL GROUP BY ritdatum, ritnummer)"
+    )
+    op.create_index(
+        'uq_rgritten_ritdatum_ritnummer', 'rgritten', ['ritdatum', 'ritnummer'], unique=True
+    )
+
+
+def downgrade():
+    op.drop_index('uq_rgritten_ritdatum_ritnummer', table_name='rgritten')
+    with op.batch_alter_table('rgritten', schema=None) as batch_op:
+        batch_op.drop_column('row_hash')
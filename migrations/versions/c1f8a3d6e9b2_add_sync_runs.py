@@ -0,0 +1,76 @@
+"""add sync runs
+
+Revision ID: c1f8a3d6e9b2
+Revises: b5e2c9f7d3a4
+Create Date: 2026-10-17 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c1f8a3d6e9b2'
+down_revision = 'b5e2c9f7d3a4'
+branch_labels = None
+depends_on = None
+
+
+def _seconds(name):
+    return sa.Column(name, sa.Float(), nullable=False, server_default='0')
+
+
+def upgrade():
+    op.create_table(
+        'sync_runs',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('dataset', sa.String(length=120), nullable=False, server_default='rgritten'),
+        sa.Column('profile_name', sa.String(length=255), nullable=True),
+        sa.Column('mode', sa.String(length=20), nullable=True),
+        sa.Column('workers', sa.Integer(), nullable=False, server_default='1'),
+        sa.Column('pipeline', sa.Boolean(), nullable=False, server_default=sa.false()),
+        sa.Column('bulk', sa.Boolean(), nullable=False, server_default=sa.false()),
+        sa.Column('status', sa.String(length=20), nullable=False, server_default='running'),
+        sa.Column('started_at', sa.DateTime(), nullable=False),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.Column('seconds', sa.Float(), nullable=True),
+        sa.Column('rows', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('inserted', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('updated', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('unchanged', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('bytes', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('from_ritdatum', sa.String(length=20), nullable=True),
+        sa.Column('from_ritnummer', sa.Integer(), nullable=True),
+        sa.Column('through_ritdatum', sa.String(length=20), nullable=True),
+        sa.Column('through_ritnummer', sa.Integer(), nullable=True),
+        _seconds('fetch_seconds'),
+        _seconds('convert_seconds'),
+        _seconds('insert_seconds'),
+        _seconds('commit_seconds'),
+        sa.Column('index_seconds', sa.Float(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+    )
+    op.create_index('ix_sync_runs_started_at', 'sync_runs', ['started_at'])
+    op.create_table(
+        'sync_run_chunks',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('run_id', sa.Integer(), sa.ForeignKey('sync_runs.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('seq', sa.Integer(), nullable=False),
+        sa.Column('finished_at', sa.DateTime(), nullable=False),
+        sa.Column('rows', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('bytes', sa.BigInteger(), nullable=False, server_default='0'),
+        _seconds('fetch_seconds'),
+        _seconds('convert_seconds'),
+        _seconds('insert_seconds'),
+        _seconds('commit_seconds'),
+        sa.Column('through_ritdatum', sa.String(length=20), nullable=True),
+        sa.Column('through_ritnummer', sa.Integer(), nullable=True),
+    )
+    op.create_index('ix_sync_run_chunks_run_id', 'sync_run_chunks', ['run_id'])
+
+
+def downgrade():
+    op.drop_index('ix_sync_run_chunks_run_id', table_name='sync_run_chunks')
+    op.drop_table('sync_run_chunks')
+    op.drop_index('ix_sync_runs_started_at', table_name='sync_runs')
+    op.drop_table('sync_runs')
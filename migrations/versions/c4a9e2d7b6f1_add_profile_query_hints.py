@@ -0,0 +1,30 @@
+"""add connection profile query hints
+
+Revision ID: c4a9e2d7b6f1
+Revises: b7e4f1a9c3d2
+Create Date: 2026-10-17 11:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4a9e2d7b6f1'
+down_revision = 'b7e4f1a9c3d2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('connection_profiles', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('query_maxdop', sa.Integer(), nullable=True))
+        batch_op.add_column(
+            sa.Column('snapshot_isolation', sa.Boolean(), nullable=False, server_default=sa.false())
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('connection_profiles', schema=None) as batch_op:
+        batch_op.drop_column('snapshot_isolation')
+        batch_op.drop_column('query_maxdop')
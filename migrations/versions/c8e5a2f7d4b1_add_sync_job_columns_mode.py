@@ -0,0 +1,32 @@
+"""add sync job columns mode
+
+Column-profile rewrites run as sync jobs (mode 'columns'): they belong to no connection
+profile and carry the dropped columns in params.
+
+Revision ID: c8e5a2f7d4b1
+Revises: b5e2c8f4a1d9
+Create Date: 2026-10-19 09:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c8e5a2f7d4b1'
+down_revision = 'b5e2c8f4a1d9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('sync_jobs', schema=None) as batch_op:
+        batch_op.alter_column('profile_id', existing_type=sa.Integer(), nullable=True)
+        batch_op.add_column(sa.Column('params', sa.JSON(), nullable=True))
+
+
+def downgrade():
+    op.execute("DELETE FROM sync_jobs WHERE profile_id IS NULL")
+    with op.batch_alter_table('sync_jobs', schema=None) as batch_op:
+        batch_op.drop_column('params')
+        batch_op.alter_column('profile_id', existing_type=sa.Integer(), nullable=False)
@@ -0,0 +1,28 @@
+"""add scheduler lease generation
+
+Counts the owner changes of a lease; runs carry it as a fencing token.
+
+Revision ID: d1a7c3e9f5b2
+Revises: c8e5a2f7d4b1
+Create Date: 2026-10-19 14:15:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd1a7c3e9f5b2'
+down_revision = 'c8e5a2f7d4b1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('scheduler_leases', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('generation', sa.Integer(), nullable=False, server_default='1'))
+
+
+def downgrade():
+    with op.batch_alter_table('scheduler_leases', schema=None) as batch_op:
+        batch_op.drop_column('generation')
@@ -0,0 +1,31 @@
+"""add dataset column profiles
+
+Revision ID: d2b8c5f3a1e7
+Revises: c4a9e2d7b6f1
+Create Date: 2026-10-17 12:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2b8c5f3a1e7'
+down_revision = 'c4a9e2d7b6f1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'dataset_column_profiles',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('dataset', sa.String(length=120), nullable=False),
+        sa.Column('columns', sa.JSON(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.UniqueConstraint('dataset', name='uq_dataset_column_profiles_dataset'),
+    )
+
+
+def downgrade():
+    op.drop_table('dataset_column_profiles')
@@ -0,0 +1,54 @@
+"""cluster rgritten by key
+
+Rewrites rgritten once in (ritdatum, ritnummer) order, the one-time form of
+`flask cluster-rgritten`. Only the physical row order and the ids change.
+
+Revision ID: d7a2e5b9c3f1
+Revises: c1f8a3d6e9b2
+Create Date: 2026-10-17 23:30:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'd7a2e5b9c3f1'
+down_revision = 'c1f8a3d6e9b2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'sqlite':
+        return
+    table = bind.exec_driver_sql(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'rgritten'"
+    ).scalar()
+    if table is None:
+        return
+    indexes = [
+        sql
+        for (sql,) in bind.exec_driver_sql(
+            "SELECT sql FROM sqlite_master WHERE type = 'index' AND tbl_name = 'rgritten' "
+            "AND sql IS NOT NULL"
+        )
+    ]
+    columns = ", ".join(
+        f'"{row[1]}"' for row in bind.exec_driver_sql("PRAGMA table_info(rgritten)") if row[1] != 'id'
+    )
+    bind.exec_driver_sql("DROP TABLE IF EXISTS rgritten_clustered")
+    bind.exec_driver_sql(table.replace("rgritten", "rgritten_clustered", 1))
+    bind.exec_driver_sql(
+        f"INSERT INTO rgritten_clustered ({columns}) SELECT {columns} FROM rgritten "
+        "ORDER BY ritdatum, ritnummer"
+    )
+    bind.exec_driver_sql("DROP TABLE rgritten")
+    bind.exec_driver_sql("ALTER TABLE rgritten_clustered RENAME TO rgritten")
+    for sql in indexes:
+        bind.exec_driver_sql(sql)
+
+
+def downgrade():
+    # Row order is not part of the schema; nothing to undo.
+    pass
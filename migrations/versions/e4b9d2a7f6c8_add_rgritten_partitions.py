@@ -0,0 +1,40 @@
+"""add rgritten partitions
+
+Revision ID: e4b9d2a7f6c8
+Revises: d7a2e5b9c3f1
+Create Date: 2026-10-18 09:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4b9d2a7f6c8'
+down_revision = 'd7a2e5b9c3f1'
+branch_labels = None
+depends_on = None
+
+
+TRIGGERS = ('rgritten_frozen_insert', 'rgritten_frozen_update', 'rgritten_frozen_delete')
+
+
+def upgrade():
+    op.create_table(
+        'rgritten_partitions',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('month', sa.String(length=7), nullable=False, unique=True),
+        sa.Column('rows', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('first_ritdatum', sa.DateTime(), nullable=True),
+        sa.Column('last_ritdatum', sa.DateTime(), nullable=True),
+        sa.Column('frozen', sa.Boolean(), nullable=False, server_default=sa.false()),
+        sa.Column('frozen_at', sa.DateTime(), nullable=True),
+        sa.Column('refreshed_at', sa.DateTime(), nullable=True),
+    )
+
+
+def downgrade():
+    # The triggers read rgritten_partitions; without it every write to rgritten would fail.
+    for name in TRIGGERS:
+        op.execute(f'DROP TRIGGER IF EXISTS {name}')
+    op.drop_table('rgritten_partitions')
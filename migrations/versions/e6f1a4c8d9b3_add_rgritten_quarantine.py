@@ -0,0 +1,43 @@
+"""add rgritten quarantine
+
+Revision ID: e6f1a4c8d9b3
+Revises: d2b8c5f3a1e7
+Create Date: 2026-10-17 14:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e6f1a4c8d9b3'
+down_revision = 'd2b8c5f3a1e7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'rgritten_quarantine',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('ritdatum', sa.DateTime(), nullable=False),
+        sa.Column('ritnummer', sa.Integer(), nullable=False),
+        sa.Column('column', sa.String(length=120), nullable=False),
+        sa.Column('raw_value', sa.String(length=4000), nullable=True),
+        sa.Column('detected_at', sa.DateTime(), nullable=False),
+    )
+    op.create_index(
+        'uq_rgritten_quarantine_key_column',
+        'rgritten_quarantine',
+        ['ritdatum', 'ritnummer', 'column'],
+        unique=True,
+    )
+    op.create_index(
+        op.f('ix_rgritten_quarantine_column'), 'rgritten_quarantine', ['column'], unique=False
+    )
+
+
+def downgrade():
+    op.drop_index(op.f('ix_rgritten_quarantine_column'), table_name='rgritten_quarantine')
+    op.drop_index('uq_rgritten_quarantine_key_column', table_name='rgritten_quarantine')
+    op.drop_table('rgritten_quarantine')
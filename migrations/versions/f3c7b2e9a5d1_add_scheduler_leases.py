@@ -0,0 +1,37 @@
+"""add scheduler leases
+
+Revision ID: f3c7b2e9a5d1
+Revises: e6f1a4c8d9b3
+Create Date: 2026-10-17 16:05:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3c7b2e9a5d1'
+down_revision = 'e6f1a4c8d9b3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'scheduler_leases',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('name', sa.String(length=120), nullable=False),
+        sa.Column('owner', sa.String(length=255), nullable=False),
+        sa.Column('acquired_at', sa.DateTime(), nullable=False),
+        sa.Column('heartbeat_at', sa.DateTime(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.UniqueConstraint('name', name='uq_scheduler_leases_name'),
+    )
+    with op.batch_alter_table('data_refresh_config', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('last_run_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('data_refresh_config', schema=None) as batch_op:
+        batch_op.drop_column('last_run_at')
+    op.drop_table('scheduler_leases')
@@ -0,0 +1,44 @@
+"""add rgritten hot index
+
+Revision ID: f8c3a6d1e5b7
+Revises: e4b9d2a7f6c8
+Create Date: 2026-10-18 11:40:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'f8c3a6d1e5b7'
+down_revision = 'e4b9d2a7f6c8'
+branch_labels = None
+depends_on = None
+
+
+HOT_COLUMNS = [
+    'ritdatum',
+    'ritnummer',
+    'rittype',
+    'status',
+    'vervoerder',
+    'opdrachtgever',
+    'instap',
+    'uitstap',
+    'instapgerealiseerd',
+    'uitstapgerealiseerd',
+    'afstand',
+    'aankomst',
+    'locatie_van',
+    'locatie_naar',
+    'plaats_van',
+    'plaats_naar',
+]
+
+
+def upgrade():
+    op.create_index('ix_rgritten_hot', 'rgritten', HOT_COLUMNS, unique=False)
+    op.execute('ANALYZE rgritten')
+
+
+def downgrade():
+    op.drop_index('ix_rgritten_hot', table_name='rgritten')
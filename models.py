@@ -1,6 +1,10 @@
+import threading
+import weakref
 from datetime import datetime
 from passlib.hash import pbkdf2_sha256
 from flask_login import UserMixin
+import sqlalchemy as sa
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from extensions import db
 
 # Tabel associatie User <-> Role (many-to-many)
@@ -106,6 +110,9 @@ class ConnectionProfile(db.Model):
     password = db.Column(db.String(255), nullable=False, default="")
     odbc_driver = db.Column(db.String(255), nullable=False, default="ODBC Driver 17 for SQL Server")
     trust_server_cert = db.Column(db.Boolean, default=True)
+    # Query hints for reads from this source: OPTION (MAXDOP n) and SNAPSHOT isolation.
+    query_maxdop = db.Column(db.Integer, nullable=True)
+    snapshot_isolation = db.Column(db.Boolean, nullable=False, default=False)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     def build_uri(self):
@@ -118,17 +125,206 @@ class ConnectionProfile(db.Model):
         )
 
 
+# Columns nearly every report reads: key, times, carrier, client, distance and locations
+# (including the inputs of the calculated "locatie" and "reistijd_calc" fields). The covering
+# index ix_rgritten_hot holds them in key order, so a report that needs no other column never
+# reads the wide rows.
+RGRIT_HOT_COLUMNS = (
+    "ritdatum",
+    "ritnummer",
+    "rittype",
+    "status",
+    "vervoerder",
+    "opdrachtgever",
+    "instap",
+    "uitstap",
+    "instapgerealiseerd",
+    "uitstapgerealiseerd",
+    "afstand",
+    "aankomst",
+    "locatie_van",
+    "locatie_naar",
+    "plaats_van",
+    "plaats_naar",
+)
+
+
+# Indicator flags packed into the bitmasks ind_set (value 1) and ind_clear (value 0): bit n
+# belongs to the n-th name. Append only; reordering would invalidate the stored masks.
+RGRIT_INDICATOR_COLUMNS = (
+    "ind_rolstoel",
+    "ind_begeleiding_sociaal",
+    "ind_begeleiding_medisch",
+    "ind_beperking_lichamelijk",
+    "ind_beperking_verstandelijk",
+    "ind_hulphond",
+    "ind_voorin_in_taxi",
+    "ind_kamer_tot_kamer_vervoer",
+    "ind_gezinstaxi",
+    "ind_personenauto",
+    "ind_lage_instap",
+    "ind_voldoende_beenruimte",
+    "ind_rollator",
+    "ind_beperking_visueel",
+    "ind_beperking_auditief",
+    "ind_autisme",
+    "ind_individueel_vervoer",
+    "ind_scootmobiel",
+    "ind_strippen",
+    "ind_voldoende_zithoogte",
+    "ind_afwijkend_tarief",
+    "ind_zithulp",
+    "ind_belservice",
+    "ind_epilepsie",
+    "ind_geen_warme_overdracht",
+    "ind_kleinschalig",
+    "ind_extra1",
+    "ind_extra2",
+    "ind_extra3",
+    "ind_extra4",
+    "ind_extra5",
+    "ind_busbegeleider_nodig",
+    "ind_is_busbegeleider",
+    "ind_inclusief_begeleider",
+    "ind_alleen_begeleider",
+    "ind_invloed_op_factuur",
+    "ind_client_mag_rit_wijzigen",
+    "ind_ontheffing_mondkapje",
+    "ind_ontheffing_gordelplicht",
+    "ind_bus",
+    "ind_mag_vraagafhankelijk",
+    "ind_alleen_zitten",
+    "ind_diabetes",
+    "ind_deur_deur",
+    "ind_anderstalig",
+    "ind_opvouwbare_rolstoel",
+    "ind_kinderstoel",
+    "ind_stoelverhoger",
+    "ind_gordelkapje",
+    "ind_meerpuntsgordel",
+    "ind_maxicosi",
+    "ind_begeleiding_niet_verplicht",
+    "ind_afasie",
+    "ind_vaste_zitplaats",
+    "ind_gordelverlenging",
+    "ind_lifo",
+    "ind_filo",
+    "ind_fifo",
+    "ind_vervroegde_belservice",
+    "ind_opstappunt_verplicht",
+    "ind_bagage",
+    "ind_niet_combineren",
+)
+
+
+def _indicator_mask(value):
+    """Insert default for ind_set/ind_clear; the sync fetches the masks with the rows."""
+
+    def default(context):
+        params = context.get_current_parameters()
+        return sum(
+            1 << bit for bit, name in enumerate(RGRIT_INDICATOR_COLUMNS) if params.get(name) == value
+        )
+
+    return default
+
+
+# Low-cardinality text columns stored as codes into rgritten_strings (see EncodedString).
+RGRIT_ENCODED_COLUMNS = (
+    "rittype",
+    "status",
+    "weekdag",
+    "vervoer_type_omschrijving",
+    "plaats_van",
+    "plaats_naar",
+    "vervoerder",
+    "opdrachtgever",
+    "perceel_omschrijving",
+)
+
+
+class RGRittenString(db.Model):
+    """Dictionary of the RGRIT_ENCODED_COLUMNS values; a code never changes once given out."""
+
+    __tablename__ = "rgritten_strings"
+
+    code = db.Column(db.Integer, primary_key=True)
+    value = db.Column(db.String(255), nullable=False, unique=True)
+
+
+def decoded(column):
+    """The text behind an EncodedString column, for LIKE, ranges and sorting by name."""
+    strings = RGRittenString.__table__
+    return sa.select(strings.c.value).where(strings.c.code == column).scalar_subquery()
+
+
+# Per engine: rgritten_strings code -> value. Codes are only added, so entries stay valid.
+_string_values = weakref.WeakKeyDictionary()
+# The dictionary of the engine whose query this thread is decoding.
+_decoding = threading.local()
+
+
+class EncodedString(sa.types.TypeDecorator):
+    """
+    Text stored as its rgritten_strings code. Bound values are looked up in SQL, so equality,
+    GROUP BY and the hot index work on small integers. Fetched codes are decoded from a
+    cached copy of the dictionary, which _load_string_codes brings up to date on the
+    connection that ran the query. A value must be in rgritten_strings before it is written:
+    the sync writer and the RGRit insert/update hooks add new ones. Unknown values compare
+    as NULL.
+    """
+
+    impl = sa.Integer
+    cache_ok = True
+
+    def bind_expression(self, bindvalue):
+        strings = RGRittenString.__table__
+        return (
+            sa.select(strings.c.code)
+            .where(strings.c.value == sa.type_coerce(bindvalue, sa.String()))
+            .scalar_subquery()
+        )
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return _decoding.values.get(value)
+
+
+@sa.event.listens_for(sa.engine.Engine, "after_cursor_execute")
+def _load_string_codes(conn, cursor, statement, parameters, context, executemany):
+    """
+    Before the rows of a query with EncodedString columns are fetched, add the codes given
+    out since the last load to the engine's dictionary copy, on the same connection: inside
+    the query's read transaction, so every code it returns is known.
+    """
+    compiled = context.compiled
+    if compiled is None or not any(
+        isinstance(entry[3], EncodedString) for entry in getattr(compiled, "_result_columns", None) or ()
+    ):
+        return
+    values = _string_values.get(conn.engine)
+    if values is None:
+        values = _string_values[conn.engine] = {}
+    strings = RGRittenString.__table__
+    newer = sa.select(strings.c.code, strings.c.value)
+    if values:
+        newer = newer.where(strings.c.code > max(values))
+    values.update(conn.execute(newer).all())
+    _decoding.values = values
+
+
 class RGRit(db.Model):
     __tablename__ = "rgritten"
 
     id = db.Column(db.Integer, primary_key=True)
     ingested_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
 
-    rittype = db.Column(db.String(255), nullable=False)
+    rittype = db.Column(EncodedString, nullable=False)
     ritnummer = db.Column(db.Integer, nullable=False, index=True)
     schema = db.Column(db.Integer, nullable=True)
-    status = db.Column(db.String(255), nullable=False)
-    weekdag = db.Column(db.String(255), nullable=True)
+    status = db.Column(EncodedString, nullable=False)
+    weekdag = db.Column(EncodedString, nullable=True)
     aankomst = db.Column(db.String(255), nullable=True)
     vertrek = db.Column(db.String(255), nullable=True)
     voornaam = db.Column(db.String(255), nullable=True)
@@ -185,7 +381,7 @@ class RGRit(db.Model):
     ind_individueel_vervoer = db.Column(db.Integer, nullable=True)
     beschikkingnummer = db.Column(db.String(255), nullable=True)
     vervoer_type = db.Column(db.Integer, nullable=True)
-    vervoer_type_omschrijving = db.Column(db.String(255), nullable=True)
+    vervoer_type_omschrijving = db.Column(EncodedString, nullable=True)
     rolstoel_type_omschrijving = db.Column(db.String(255), nullable=True)
     aantal_gezinstaxi = db.Column(db.Integer, nullable=True)
     aantal_begeleiding_sociaal = db.Column(db.Integer, nullable=True)
@@ -255,18 +451,18 @@ class RGRit(db.Model):
     huisnummer_van = db.Column(db.String(255), nullable=True)
     huisnummer_toev_van = db.Column(db.String(255), nullable=True)
     postcode_van = db.Column(db.String(255), nullable=True)
-    plaats_van = db.Column(db.String(255), nullable=True)
+    plaats_van = db.Column(EncodedString, nullable=True)
     locatie_naar = db.Column(db.String(255), nullable=True)
     straat_naar = db.Column(db.String(255), nullable=True)
     huisnummer_naar = db.Column(db.String(255), nullable=True)
     huisnummer_toev_naar = db.Column(db.String(255), nullable=True)
     postcode_naar = db.Column(db.String(255), nullable=True)
-    plaats_naar = db.Column(db.String(255), nullable=True)
+    plaats_naar = db.Column(EncodedString, nullable=True)
     weekdag_id = db.Column(db.Integer, nullable=True)
     owner_id = db.Column(db.Integer, nullable=False, index=True)
     carrier_id = db.Column(db.Integer, nullable=True)
-    vervoerder = db.Column(db.String(255), nullable=False)
-    opdrachtgever = db.Column(db.String(255), nullable=True)
+    vervoerder = db.Column(EncodedString, nullable=False)
+    opdrachtgever = db.Column(EncodedString, nullable=True)
     effective_date = db.Column(db.DateTime, nullable=True)
     ritdatum = db.Column(db.DateTime, nullable=True)
     routenummer = db.Column(db.String(255), nullable=True)
@@ -280,7 +476,7 @@ class RGRit(db.Model):
     zoneafstand1 = db.Column(db.Integer, nullable=True)
     zoneafstand2 = db.Column(db.Integer, nullable=True)
     perceel_id = db.Column(db.Integer, nullable=True)
-    perceel_omschrijving = db.Column(db.String(255), nullable=True)
+    perceel_omschrijving = db.Column(EncodedString, nullable=True)
     gemeld_op = db.Column(db.DateTime, nullable=True)
     afwezig_van = db.Column(db.DateTime, nullable=True)
     afwezig_totmet = db.Column(db.DateTime, nullable=True)
@@ -303,6 +499,36 @@ class RGRit(db.Model):
     loosmeldinggerealiseerd = db.Column(db.Time, nullable=True)
     loosmeldinglatitude = db.Column(db.Numeric(18, 10), nullable=True)
     loosmeldinglongitude = db.Column(db.Numeric(18, 10), nullable=True)
+    # First 8 bytes of a SHA2-256 over the remote values, computed by SQL Server during sync.
+    row_hash = db.Column(db.BigInteger, nullable=True)
+    # Bitmaps over RGRIT_INDICATOR_COLUMNS, so flag filters are answered from ix_rgritten_hot.
+    ind_set = db.Column(db.BigInteger, nullable=True, default=_indicator_mask(1))
+    ind_clear = db.Column(db.BigInteger, nullable=True, default=_indicator_mask(0))
+
+    __table_args__ = (
+        db.Index("uq_rgritten_ritdatum_ritnummer", "ritdatum", "ritnummer", unique=True),
+        db.Index("ix_rgritten_hot", *RGRIT_HOT_COLUMNS, "ind_set", "ind_clear"),
+    )
+
+
+def add_encoded_strings(connection, rows):
+    """
+    Add the RGRIT_ENCODED_COLUMNS values of `rows` (mappings) to rgritten_strings. ORM flushes
+    do so by themselves; bulk paths that skip mapper events (bulk_insert_mappings, Core
+    inserts) must call this first, or the codes looked up for new values are NULL.
+    """
+    values = {row.get(name) for row in rows for name in RGRIT_ENCODED_COLUMNS} - {None}
+    if values:
+        connection.execute(
+            sqlite_insert(RGRittenString.__table__).on_conflict_do_nothing(),
+            [{"value": value} for value in sorted(values)],
+        )
+
+
+@sa.event.listens_for(RGRit, "before_insert")
+@sa.event.listens_for(RGRit, "before_update")
+def _add_encoded_strings(mapper, connection, target):
+    add_encoded_strings(connection, [{name: getattr(target, name) for name in RGRIT_ENCODED_COLUMNS}])
 
 
 class DataRefreshConfig(db.Model):
@@ -310,13 +536,190 @@ class DataRefreshConfig(db.Model):
 
     id = db.Column(db.Integer, primary_key=True)
     enabled = db.Column(db.Boolean, nullable=False, default=False)
-    run_time = db.Column(db.String(10), nullable=False, default="02:00")  # HH:MM
+    run_time = db.Column(db.String(10), nullable=False, default="02:00")  # HH:MM; seeds the first schedule
     profile_id = db.Column(db.Integer, db.ForeignKey("connection_profiles.id"), nullable=True)
     chunk_size = db.Column(db.Integer, nullable=False, default=1000)
     min_ritdatum = db.Column(db.String(20), nullable=True)
+    last_run_at = db.Column(db.DateTime, nullable=True)  # local time of the last started run
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
 
 
+class RefreshSchedule(db.Model):
+    """One cadence of the data refresh: every `interval_minutes` or a 5-field cron expression."""
+
+    __tablename__ = "refresh_schedules"
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(120), nullable=False, unique=True)
+    enabled = db.Column(db.Boolean, nullable=False, default=True)
+    profile_id = db.Column(db.Integer, db.ForeignKey("connection_profiles.id"), nullable=True)  # None: profile of DataRefreshConfig
+    cron = db.Column(db.String(120), nullable=True)  # "m h dom mon dow", local time
+    interval_minutes = db.Column(db.Integer, nullable=True)  # aligned to midnight
+    mode = db.Column(db.String(20), nullable=False, default="append")  # append | upsert | reconcile
+    window_days = db.Column(db.Integer, nullable=False, default=0)  # resync days, or days to reconcile
+    jitter_seconds = db.Column(db.Integer, nullable=False, default=0)
+    catch_up = db.Column(db.Boolean, nullable=False, default=True)  # run once for slots missed while down
+    next_run_at = db.Column(db.DateTime, nullable=True)  # local time, jitter included; None: recompute
+    last_run_at = db.Column(db.DateTime, nullable=True)
+    last_status = db.Column(db.String(20), nullable=True)  # ok | fout | overgeslagen
+    last_error = db.Column(db.Text, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    profile = db.relationship("ConnectionProfile")
+
+
+class SyncJob(db.Model):
+    """An on-demand sync or column-profile rewrite, queued from Beheer and run by the process holding the scheduler lease."""
+
+    __tablename__ = "sync_jobs"
+
+    id = db.Column(db.Integer, primary_key=True)
+    profile_id = db.Column(db.Integer, db.ForeignKey("connection_profiles.id"), nullable=True)  # None for mode "columns"
+    mode = db.Column(db.String(20), nullable=False, default="append")  # append | upsert | columns
+    resync_days = db.Column(db.Integer, nullable=False, default=0)
+    params = db.Column(db.JSON, nullable=True)  # mode "columns": {"dropped": [...]}
+    status = db.Column(db.String(20), nullable=False, default="queued", index=True)  # queued | running | done | failed | cancelled
+    cancel_requested = db.Column(db.Boolean, nullable=False, default=False)
+    requested_by = db.Column(db.String(120), nullable=True)
+    owner = db.Column(db.String(255), nullable=True)  # process running the job
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    heartbeat_at = db.Column(db.DateTime, nullable=True)  # last progress update
+    rows = db.Column(db.Integer, nullable=False, default=0)
+    pending = db.Column(db.Integer, nullable=True)  # estimated rows to fetch, counted at the start
+    rows_per_second = db.Column(db.Float, nullable=True)
+    eta_seconds = db.Column(db.Float, nullable=True)
+    cursor_ritdatum = db.Column(db.String(20), nullable=True)
+    cursor_ritnummer = db.Column(db.Integer, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    stats = db.Column(db.JSON, nullable=True)
+
+    profile = db.relationship("ConnectionProfile")
+
+
+class SchedulerLease(db.Model):
+    """Which process may run scheduled jobs; taken over once `expires_at` has passed."""
+
+    __tablename__ = "scheduler_leases"
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(120), nullable=False, unique=True)
+    owner = db.Column(db.String(255), nullable=False)  # host:pid:token
+    generation = db.Column(db.Integer, nullable=False, default=1)  # +1 on every change of owner
+    acquired_at = db.Column(db.DateTime, nullable=False)
+    heartbeat_at = db.Column(db.DateTime, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+
+class SyncCheckpoint(db.Model):
+    __tablename__ = "sync_checkpoints"
+
+    id = db.Column(db.Integer, primary_key=True)
+    dataset = db.Column(db.String(120), nullable=False, unique=True, default="rgritten")
+    profile_id = db.Column(db.Integer, db.ForeignKey("connection_profiles.id"), nullable=True)
+    last_ritdatum = db.Column(db.String(20), nullable=True)  # YYYY-MM-DD
+    last_ritnummer = db.Column(db.Integer, nullable=False, default=0)
+    status = db.Column(db.String(20), nullable=False, default="ok")  # ok | running | failed
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class SyncRun(db.Model):
+    """One sync_rgritten run: cursor range, row counts and where the time went."""
+
+    __tablename__ = "sync_runs"
+
+    id = db.Column(db.Integer, primary_key=True)
+    dataset = db.Column(db.String(120), nullable=False, default="rgritten")
+    profile_name = db.Column(db.String(255), nullable=True)
+    mode = db.Column(db.String(20), nullable=True)
+    workers = db.Column(db.Integer, nullable=False, default=1)
+    pipeline = db.Column(db.Boolean, nullable=False, default=False)
+    bulk = db.Column(db.Boolean, nullable=False, default=False)
+    status = db.Column(db.String(20), nullable=False, default="running")  # running | ok | failed | cancelled
+    started_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    seconds = db.Column(db.Float, nullable=True)
+    rows = db.Column(db.Integer, nullable=False, default=0)  # fetched rows
+    inserted = db.Column(db.Integer, nullable=False, default=0)
+    updated = db.Column(db.Integer, nullable=False, default=0)
+    unchanged = db.Column(db.Integer, nullable=False, default=0)
+    bytes = db.Column(db.BigInteger, nullable=False, default=0)  # estimated payload size
+    from_ritdatum = db.Column(db.String(20), nullable=True)
+    from_ritnummer = db.Column(db.Integer, nullable=True)
+    through_ritdatum = db.Column(db.String(20), nullable=True)
+    through_ritnummer = db.Column(db.Integer, nullable=True)
+    fetch_seconds = db.Column(db.Float, nullable=False, default=0)
+    convert_seconds = db.Column(db.Float, nullable=False, default=0)
+    insert_seconds = db.Column(db.Float, nullable=False, default=0)
+    commit_seconds = db.Column(db.Float, nullable=False, default=0)
+    index_seconds = db.Column(db.Float, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+
+
+class SyncRunChunk(db.Model):
+    """Metrics of one committed batch of a sync run."""
+
+    __tablename__ = "sync_run_chunks"
+
+    id = db.Column(db.Integer, primary_key=True)
+    run_id = db.Column(db.Integer, db.ForeignKey("sync_runs.id", ondelete="CASCADE"), nullable=False, index=True)
+    seq = db.Column(db.Integer, nullable=False)
+    finished_at = db.Column(db.DateTime, nullable=False)
+    rows = db.Column(db.Integer, nullable=False, default=0)
+    bytes = db.Column(db.BigInteger, nullable=False, default=0)
+    fetch_seconds = db.Column(db.Float, nullable=False, default=0)
+    convert_seconds = db.Column(db.Float, nullable=False, default=0)
+    insert_seconds = db.Column(db.Float, nullable=False, default=0)
+    commit_seconds = db.Column(db.Float, nullable=False, default=0)
+    through_ritdatum = db.Column(db.String(20), nullable=True)
+    through_ritnummer = db.Column(db.Integer, nullable=True)
+
+
+class RGRittenQuarantine(db.Model):
+    """Source values the sync's TRY_CONVERT turned into NULL, one row per key and column."""
+
+    __tablename__ = "rgritten_quarantine"
+    __table_args__ = (
+        db.Index(
+            "uq_rgritten_quarantine_key_column", "ritdatum", "ritnummer", "column", unique=True
+        ),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    ritdatum = db.Column(db.DateTime, nullable=False)
+    ritnummer = db.Column(db.Integer, nullable=False)
+    column = db.Column(db.String(120), nullable=False, index=True)
+    raw_value = db.Column(db.String(4000), nullable=True)
+    detected_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+
+class RGRittenPartition(db.Model):
+    """A month of rgritten in the partition catalog; a frozen month is read-only."""
+
+    __tablename__ = "rgritten_partitions"
+
+    id = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.String(7), nullable=False, unique=True)  # YYYY-MM
+    rows = db.Column(db.Integer, nullable=False, default=0)
+    first_ritdatum = db.Column(db.DateTime, nullable=True)
+    last_ritdatum = db.Column(db.DateTime, nullable=True)
+    frozen = db.Column(db.Boolean, nullable=False, default=False)
+    frozen_at = db.Column(db.DateTime, nullable=True)
+    refreshed_at = db.Column(db.DateTime, nullable=True)
+
+
+class DatasetColumnProfile(db.Model):
+    """Columns the sync fetches for a dataset; NULL columns means all of them."""
+
+    __tablename__ = "dataset_column_profiles"
+
+    id = db.Column(db.Integer, primary_key=True)
+    dataset = db.Column(db.String(120), nullable=False, unique=True, default="rgritten")
+    columns = db.Column(db.JSON, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
 class ReportTemplate(db.Model):
     __tablename__ = "report_templates"
     id = db.Column(db.Integer, primary_key=True)
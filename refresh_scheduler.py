@@ -0,0 +1,446 @@
+"""
+Scheduler for the rgritten refresh.
+
+Schedules (refresh_schedules) run every N minutes or on a cron expression, each with its own
+sync mode and window, e.g. an upsert of today's data every 15 minutes plus a nightly
+reconcile. Their next_run_at is stored with the jitter applied, so every process agrees on it
+and slots missed while the app was down are found after a restart: a schedule with catch_up
+runs once for them, otherwise they are skipped. The loop sleeps outside any database session
+until the earliest next_run_at (at most TICK seconds) and wakes early on notify(), which the
+admin pages call after a change. On-demand jobs (sync_jobs) run in the same loop, before the
+schedules, so they never overlap a scheduled run.
+
+Any number of processes (gunicorn workers, several app nodes on one database, or a
+dedicated `flask refresh-worker`) may run the scheduler; a lease row in scheduler_leases
+decides which one runs jobs. The holder renews it every HEARTBEAT seconds from a separate
+thread, also while a long sync is running; when a holder dies its lease expires after
+LEASE_TTL seconds and another process takes over. A run is claimed by advancing its
+schedule's next_run_at before it starts, so a takeover never runs the same slot twice.
+
+On SQLite the heartbeat waits while a sync holds the write lock, so a sync also renews the
+lease in each of its own commits (extend_lease). The lease's generation, raised on every
+change of owner, is the fencing token: a sync whose lease was taken over anyway fails at
+its next commit with LeaseLost instead of moving the checkpoint on beside the new holder.
+"""
+import os
+import random
+import socket
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+import sqlalchemy as sa
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models import ConnectionProfile, DataRefreshConfig, RefreshSchedule, SchedulerLease
+import sync_jobs
+
+LEASE_NAME = "data-refresh"
+# Seconds without a heartbeat after which another process may take the lease.
+LEASE_TTL = 90
+HEARTBEAT = 20
+# Longest sleep between checks, seconds; also how long a job queued by another process waits.
+TICK = 5
+# A slot found later than this after its time (app was down) only runs with catch_up.
+LATE_GRACE = timedelta(minutes=15)
+SCHEDULE_MODES = ("append", "upsert", "reconcile")
+# Upper bounds of the cron fields: minute, hour, day of month, month, day of week (0 = Sunday).
+_CRON_FIELDS = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+_wake = threading.Event()
+
+
+class LeaseLost(Exception):
+    """Raised when a run's lease has passed to another process; its writes must roll back."""
+
+
+def new_owner():
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def acquire_lease(name, owner, ttl=LEASE_TTL):
+    """Take or renew lease `name` for `owner`; True if `owner` holds it afterwards."""
+    table = SchedulerLease.__table__
+    now = datetime.utcnow()
+    values = {
+        "owner": owner,
+        "heartbeat_at": now,
+        "expires_at": now + timedelta(seconds=ttl),
+        "acquired_at": sa.case((table.c.owner == owner, table.c.acquired_at), else_=now),
+        "generation": sa.case(
+            (table.c.owner == owner, table.c.generation), else_=table.c.generation + 1
+        ),
+    }
+    # One UPDATE, so two processes cannot both take an expired lease.
+    taken = db.session.execute(
+        table.update()
+        .where(table.c.name == name, sa.or_(table.c.owner == owner, table.c.expires_at < now))
+        .values(**values)
+    ).rowcount
+    if not taken and not db.session.query(SchedulerLease.id).filter_by(name=name).first():
+        values["acquired_at"], values["generation"] = now, 1
+        try:
+            db.session.execute(table.insert().values(name=name, **values))
+            taken = 1
+        except IntegrityError:
+            db.session.rollback()
+            return False
+    db.session.commit()
+    return bool(taken)
+
+
+def current_lease(name, owner):
+    """(name, owner, generation) while `owner` holds lease `name`, else None: a run's token."""
+    lease = db.session.query(SchedulerLease).filter_by(name=name, owner=owner).first()
+    if lease is None or lease.expires_at < datetime.utcnow():
+        return None
+    return name, owner, lease.generation
+
+
+def extend_lease(lease, ttl=LEASE_TTL):
+    """
+    Renew a current_lease() token in the caller's transaction, which already holds the
+    write lock. Raises LeaseLost when another process has taken the lease since.
+    """
+    name, owner, generation = lease
+    table = SchedulerLease.__table__
+    now = datetime.utcnow()
+    held = db.session.execute(
+        table.update()
+        .where(table.c.name == name, table.c.owner == owner, table.c.generation == generation)
+        .values(heartbeat_at=now, expires_at=now + timedelta(seconds=ttl))
+    ).rowcount
+    if not held:
+        raise LeaseLost(f"lease {name} is niet meer van {owner}")
+
+
+def release_lease(name, owner):
+    table = SchedulerLease.__table__
+    db.session.execute(
+        table.update()
+        .where(table.c.name == name, table.c.owner == owner)
+        .values(expires_at=datetime.utcnow())
+    )
+    db.session.commit()
+
+
+def lease_holder(name=LEASE_NAME):
+    """The current, unexpired lease or None."""
+    lease = db.session.query(SchedulerLease).filter_by(name=name).first()
+    if lease is None or lease.expires_at < datetime.utcnow():
+        return None
+    return lease
+
+
+def notify():
+    """Wake the schedulers of this process, e.g. after a schedule was changed."""
+    _wake.set()
+
+
+def _cron_field(spec, lo, hi):
+    values = set()
+    for part in spec.split(","):
+        part, _, step = part.partition("/")
+        step = int(step) if step else 1
+        if part == "*":
+            first, last = lo, hi
+        elif "-" in part:
+            first, last = [int(x) for x in part.split("-", 1)]
+        else:
+            first = int(part)
+            last = hi if step > 1 else first
+        if step < 1 or first < lo or last > hi or first > last:
+            raise ValueError(spec)
+        values.update(range(first, last + 1, step))
+    return values
+
+
+def parse_cron(expr):
+    """Parse "m h dom mon dow" into value sets; raises ValueError for invalid expressions."""
+    fields = (expr or "").split()
+    if len(fields) != 5:
+        raise ValueError("cron-expressie moet 5 velden hebben: min uur dag maand weekdag")
+    try:
+        parsed = [_cron_field(f, lo, hi) for f, (lo, hi) in zip(fields, _CRON_FIELDS)]
+    except ValueError:
+        raise ValueError(f"ongeldige cron-expressie: {expr}") from None
+    if 7 in parsed[4]:
+        parsed[4] = (parsed[4] - {7}) | {0}
+    # As in cron: when both day fields are restricted, a day matching either one counts.
+    parsed.append(fields[2] != "*" and fields[4] != "*")
+    return parsed
+
+
+def cron_next(expr, after):
+    """First minute strictly after `after` that matches `expr`."""
+    minutes, hours, days, months, weekdays, either = parse_cron(expr)
+    t = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+    for _ in range(366 * 5):
+        dom, dow = t.day in days, (t.weekday() + 1) % 7 in weekdays
+        if t.month in months and ((dom or dow) if either else (dom and dow)):
+            for hh in sorted(h for h in hours if h >= t.hour):
+                first = t.minute if hh == t.hour else 0
+                mm = min((m for m in minutes if m >= first), default=None)
+                if mm is not None:
+                    return t.replace(hour=hh, minute=mm)
+        t = (t + timedelta(days=1)).replace(hour=0, minute=0)
+    raise ValueError(f"cron-expressie komt nooit voor: {expr}")
+
+
+def next_slot(schedule, after):
+    """Next slot of `schedule` after `after`, without jitter."""
+    if schedule.cron:
+        return cron_next(schedule.cron, after)
+    step = max(1, schedule.interval_minutes or 0)
+    midnight = after.replace(hour=0, minute=0, second=0, microsecond=0)
+    elapsed = int((after - midnight).total_seconds() // 60)
+    return min(
+        midnight + timedelta(minutes=(elapsed // step + 1) * step),
+        midnight + timedelta(days=1),
+    )
+
+
+def _planned(schedule, after):
+    slot = next_slot(schedule, after)
+    if schedule.jitter_seconds:
+        slot += timedelta(seconds=random.uniform(0, schedule.jitter_seconds))
+    return slot
+
+
+def _daily_cron(run_time):
+    try:
+        hh, mm = [int(x) for x in (run_time or "02:00").split(":")[:2]]
+    except ValueError:
+        hh, mm = 2, 0
+    return f"{mm} {hh} * * *"
+
+
+def _config(app):
+    cfg = db.session.get(DataRefreshConfig, 1)
+    if cfg is None:
+        # First start: seed from the DATA_REFRESH_* settings.
+        profile = (
+            db.session.query(ConnectionProfile)
+            .filter_by(name=app.config.get("DATA_REFRESH_PROFILE"))
+            .first()
+        )
+        cfg = DataRefreshConfig(
+            id=1,
+            enabled=bool(app.config.get("DATA_REFRESH_ENABLED")),
+            run_time=app.config.get("DATA_REFRESH_TIME") or "02:00",
+            profile_id=profile.id if profile else None,
+            chunk_size=app.config.get("DATA_REFRESH_CHUNK_SIZE") or 1000,
+            min_ritdatum=app.config.get("DATA_REFRESH_MIN_RITDATUM"),
+        )
+        db.session.add(cfg)
+        if not db.session.query(RefreshSchedule.id).first():
+            db.session.add(
+                RefreshSchedule(name="Dagelijks", cron=_daily_cron(cfg.run_time), catch_up=False)
+            )
+        db.session.commit()
+    return cfg
+
+
+def _set_schedule(schedule_id, **values):
+    table = RefreshSchedule.__table__
+    db.session.execute(table.update().where(table.c.id == schedule_id).values(**values))
+    db.session.commit()
+
+
+class RefreshScheduler:
+    def __init__(self, app, owner=None):
+        self.app = app
+        self.owner = owner or new_owner()
+        self.stop = threading.Event()
+        self.leader = threading.Event()
+
+    def _heartbeat(self):
+        while not self.stop.is_set():
+            try:
+                with self.app.app_context():
+                    held = acquire_lease(LEASE_NAME, self.owner)
+                if held and not self.leader.is_set():
+                    self.app.logger.info("Data refresh: scheduler lease taken by %s", self.owner)
+                (self.leader.set if held else self.leader.clear)()
+            except Exception:
+                self.leader.clear()
+                self.app.logger.exception("Data refresh: lease heartbeat failed")
+            self.stop.wait(HEARTBEAT)
+        try:
+            with self.app.app_context():
+                release_lease(LEASE_NAME, self.owner)
+        except Exception:
+            self.app.logger.exception("Data refresh: releasing the lease failed")
+
+    def tick(self, now=None):
+        """
+        Run the schedules that are due, if this process holds the lease. Returns
+        {schedule name: stats} of the runs started (stats None for a failed run).
+        """
+        now = now or datetime.now()
+        results = {}
+        with self.app.app_context():
+            cfg = _config(self.app)
+            if not cfg.enabled:
+                return results
+            schedules = (
+                db.session.query(RefreshSchedule)
+                .filter(RefreshSchedule.enabled.is_(True))
+                .order_by(RefreshSchedule.next_run_at, RefreshSchedule.id)
+                .all()
+            )
+            for schedule in schedules:
+                if schedule.next_run_at is None:
+                    _set_schedule(schedule.id, next_run_at=_planned(schedule, now))
+                    continue
+                if schedule.next_run_at > now:
+                    continue
+                # Renew right before claiming: a paused process may have lost the lease.
+                if not acquire_lease(LEASE_NAME, self.owner):
+                    self.leader.clear()
+                    break
+                run = schedule.catch_up or now - schedule.next_run_at <= LATE_GRACE
+                # Claim the slot first, so a failing run is not retried by this or another
+                # process; missed slots collapse into this one run.
+                table = RefreshSchedule.__table__
+                values = {"next_run_at": _planned(schedule, now)}
+                if run:
+                    values.update(last_run_at=now, last_status=None, last_error=None)
+                else:
+                    values["last_status"] = "overgeslagen"
+                claimed = db.session.execute(
+                    table.update()
+                    .where(table.c.id == schedule.id, table.c.next_run_at == schedule.next_run_at)
+                    .values(**values)
+                ).rowcount
+                if run and claimed:
+                    cfg.last_run_at = now
+                db.session.commit()
+                if not claimed:
+                    continue
+                if not run:
+                    self.app.logger.info("Data refresh %s: gemiste run overgeslagen", schedule.name)
+                    continue
+                results[schedule.name] = self._run(
+                    schedule, cfg, now, current_lease(LEASE_NAME, self.owner)
+                )
+        return results
+
+    def _run(self, schedule, cfg, now, lease=None):
+        profile_id = schedule.profile_id or cfg.profile_id
+        profile = db.session.get(ConnectionProfile, profile_id) if profile_id else None
+        if not profile:
+            self.app.logger.warning("Data refresh %s: geen profiel geselecteerd, sla over", schedule.name)
+            _set_schedule(schedule.id, last_status="fout", last_error="geen profiel")
+            return None
+
+        from rgritten_sync import reconcile_rgritten, sync_rgritten
+
+        schedule_id, name, mode = schedule.id, schedule.name, schedule.mode
+        chunk_size = max(1, cfg.chunk_size or 1000)
+        try:
+            if mode == "reconcile":
+                days = max(1, schedule.window_days or 0)
+                stats = reconcile_rgritten(
+                    date_from=(now.date() - timedelta(days=days - 1)).isoformat(),
+                    date_to=now.date().isoformat(),
+                    profile_name=profile.name,
+                    chunk_size=chunk_size,
+                    lease=lease,
+                )
+            else:
+                stats = sync_rgritten(
+                    profile_name=profile.name,
+                    chunk_size=chunk_size,
+                    min_ritdatum=cfg.min_ritdatum,
+                    mode=mode,
+                    resync_days=max(0, schedule.window_days or 0),
+                    lease=lease,
+                )
+        except Exception as exc:
+            db.session.rollback()
+            self.app.logger.exception("Data refresh %s failed", name)
+            _set_schedule(schedule_id, last_status="fout", last_error=str(exc)[:2000])
+            return None
+        _set_schedule(schedule_id, last_status="ok")
+        self.app.logger.info(
+            "Data refresh %s ok (%s %s, %s): %s",
+            name,
+            profile.project,
+            profile.name,
+            mode,
+            {k: v for k, v in stats.items() if isinstance(v, (int, float, str))},
+        )
+        return stats
+
+    def run_jobs(self):
+        """Run queued on-demand sync jobs, if this process holds the lease."""
+        with self.app.app_context():
+            if not acquire_lease(LEASE_NAME, self.owner):
+                self.leader.clear()
+                return 0
+            cfg = _config(self.app)
+            return sync_jobs.run_queued(
+                self.owner,
+                chunk_size=max(1, cfg.chunk_size or 1000),
+                min_ritdatum=cfg.min_ritdatum,
+                logger=self.app.logger,
+                lease=current_lease(LEASE_NAME, self.owner),
+            )
+
+    def seconds_until_due(self, now=None):
+        """Seconds until the earliest planned run, capped at TICK."""
+        now = now or datetime.now()
+        with self.app.app_context():
+            due = (
+                db.session.query(sa.func.min(RefreshSchedule.next_run_at))
+                .filter(RefreshSchedule.enabled.is_(True))
+                .scalar()
+            )
+        if due is None:
+            return TICK
+        return min(TICK, max(1.0, (due - now).total_seconds()))
+
+    def run_forever(self):
+        heartbeat = threading.Thread(
+            target=self._heartbeat, name="data-refresh-lease", daemon=True
+        )
+        heartbeat.start()
+        self.app.logger.info("Data refresh scheduler started (%s)", self.owner)
+        try:
+            while not self.stop.is_set():
+                timeout = TICK
+                if self.leader.is_set():
+                    try:
+                        self.run_jobs()
+                        self.tick()
+                        timeout = self.seconds_until_due()
+                    except Exception:
+                        self.app.logger.exception("Data refresh failed")
+                # Sleep outside the app context, so no session or connection is held.
+                if _wake.wait(timeout):
+                    _wake.clear()
+        finally:
+            self.stop.set()
+            heartbeat.join(timeout=5)
+
+    def start(self):
+        thread = threading.Thread(target=self.run_forever, name="data-refresh", daemon=True)
+        thread.start()
+        return thread
+
+
+def start_in_web(app):
+    """Run the scheduler in this web process, unless disabled with DATA_REFRESH_IN_WEB=0."""
+    if not app.config.get("DATA_REFRESH_IN_WEB", True):
+        return None
+    # Avoid double-start in dev reloader
+    if app.debug and os.environ.get("WERKZEUG_RUN_MAIN") != "true":
+        return None
+    if app.extensions.get("refresh_scheduler"):
+        return app.extensions["refresh_scheduler"]
+    scheduler = RefreshScheduler(app)
+    app.extensions["refresh_scheduler"] = scheduler
+    scheduler.start()
+    return scheduler
@@ -0,0 +1,156 @@
+"""
+Process-wide registry of pooled SQL Server engines, one per connection profile.
+
+Engines are keyed by (profile.id, profile.updated_at): editing a profile yields a new
+engine and the old one is disposed. Pooled connections are pinged before use and recycled
+periodically, so a dropped VPN link costs one reconnect instead of a failed sync, and the
+ODBC login only happens when the pool really needs a new connection.
+"""
+import threading
+import time
+from datetime import datetime
+
+import sqlalchemy as sa
+
+POOL_SIZE = 5
+MAX_OVERFLOW = 5
+# Seconds; below the idle timeouts of typical VPN/firewall links.
+POOL_RECYCLE = 1800
+POOL_TIMEOUT = 60
+
+_engines = {}
+_lock = threading.Lock()
+
+
+class _Entry:
+    def __init__(self, profile, engine, pool_size, numbers_converted):
+        self.key = (profile.id, profile.updated_at)
+        self.name = profile.name
+        self.engine = engine
+        self.pool_size = pool_size
+        self.numbers_converted = numbers_converted
+        self.created_at = datetime.now()
+        self.connects = 0
+        self.checkouts = 0
+        self.last_connect_seconds = None
+
+
+def _decimal_output(raw):
+    """
+    pyodbc output converter: DECIMAL/NUMERIC arrive as float instead of Decimal. Integral
+    values end up as INTEGER anyway through the affinity of the local Integer columns.
+    """
+    return None if raw is None else float(raw)
+
+
+def _register_output_converters(engine):
+    """Make the remote driver hand decimals over as plain numbers. Returns True if active."""
+    if engine.dialect.driver != "pyodbc":
+        return False
+    import pyodbc
+
+    @sa.event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        dbapi_connection.add_output_converter(pyodbc.SQL_DECIMAL, _decimal_output)
+        dbapi_connection.add_output_converter(pyodbc.SQL_NUMERIC, _decimal_output)
+
+    return True
+
+
+def _track(entry):
+    engine = entry.engine
+
+    @sa.event.listens_for(engine, "do_connect")
+    def _before_login(dialect, conn_rec, cargs, cparams):
+        conn_rec.info["login_started"] = time.perf_counter()
+
+    @sa.event.listens_for(engine, "connect")
+    def _after_login(dbapi_connection, connection_record):
+        entry.connects += 1
+        started = connection_record.info.pop("login_started", None)
+        if started is not None:
+            entry.last_connect_seconds = round(time.perf_counter() - started, 3)
+
+    @sa.event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        entry.checkouts += 1
+
+
+def _create(profile, pool_size):
+    kwargs = {
+        "pool_size": pool_size,
+        "max_overflow": MAX_OVERFLOW,
+        "pool_pre_ping": True,
+        "pool_recycle": POOL_RECYCLE,
+        "pool_timeout": POOL_TIMEOUT,
+    }
+    if getattr(profile, "snapshot_isolation", False):
+        # Readers see a consistent version and take no shared locks on the source tables.
+        kwargs["isolation_level"] = "SNAPSHOT"
+    engine = sa.create_engine(profile.build_uri(), **kwargs)
+    entry = _Entry(profile, engine, pool_size, _register_output_converters(engine))
+    _track(entry)
+    return entry
+
+
+def get_engine(profile, pool_size=None):
+    """
+    Shared engine for a profile, with its isolation level and output converters. Returns
+    (engine, numbers_converted). `pool_size` is a minimum: a caller that needs more parallel
+    connections (sync workers) gets the engine replaced by a larger one. Callers must not
+    dispose the engine.
+    """
+    pool_size = max(pool_size or 0, POOL_SIZE)
+    stale = []
+    with _lock:
+        entry = _engines.get(profile.id)
+        if entry is None or entry.key != (profile.id, profile.updated_at) or entry.pool_size < pool_size:
+            if entry is not None:
+                stale.append(entry)
+            entry = _create(profile, pool_size)
+            _engines[profile.id] = entry
+    for old in stale:
+        # Checked-in connections close now; ones still in use close when they are returned.
+        old.engine.dispose()
+    return entry.engine, entry.numbers_converted
+
+
+def discard(profile_id):
+    """Dispose a profile's engine, e.g. after the profile was edited or deleted."""
+    with _lock:
+        entry = _engines.pop(profile_id, None)
+    if entry is not None:
+        entry.engine.dispose()
+
+
+def dispose_all():
+    with _lock:
+        entries = list(_engines.values())
+        _engines.clear()
+    for entry in entries:
+        entry.engine.dispose()
+
+
+def pool_stats():
+    """Per registered engine: pool occupancy and how often a new login was needed."""
+    with _lock:
+        entries = list(_engines.values())
+    stats = []
+    for entry in entries:
+        pool = entry.engine.pool
+        stats.append(
+            {
+                "profile_id": entry.key[0],
+                "profile": entry.name,
+                "created_at": entry.created_at,
+                "pool_size": entry.pool_size,
+                "max_overflow": MAX_OVERFLOW,
+                "checked_out": pool.checkedout() if hasattr(pool, "checkedout") else None,
+                "checked_in": pool.checkedin() if hasattr(pool, "checkedin") else None,
+                "overflow": max(pool.overflow(), 0) if hasattr(pool, "overflow") else None,
+                "connects": entry.connects,
+                "checkouts": entry.checkouts,
+                "last_connect_seconds": entry.last_connect_seconds,
+            }
+        )
+    return sorted(stats, key=lambda s: s["profile"] or "")
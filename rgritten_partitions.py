@@ -0,0 +1,171 @@
+"""
+Month catalog for rgritten: per-month row counts, read-only (frozen) months and dropping a
+month as a whole.
+
+This is not partitioned storage. rgritten stays one table in one file: there are no
+per-month tables or attached databases and no routing layer, so reports are not pruned to
+partitions (a date-bounded query reads its range through the (ritdatum, ritnummer) key
+index), and VACUUM, ANALYZE and compaction still work on the whole file. Splitting the
+storage would also change the sync's conflict key, the reconcile checksums and every
+report query, which all address the one table.
+
+The catalog in rgritten_partitions is recounted from the key index. Frozen months are
+enforced by triggers, so ad-hoc SQL cannot change them either; the sync, backfill and
+reconcile skip them.
+"""
+from datetime import datetime, time, timedelta
+
+import sqlalchemy as sa
+
+from extensions import db
+from models import RGRit, RGRittenPartition, RGRittenQuarantine
+
+FROZEN_MESSAGE = "rgritten: maand is bevroren (alleen-lezen)"
+_FROZEN = (
+    "EXISTS (SELECT 1 FROM rgritten_partitions "
+    "WHERE frozen AND month = substr({row}.ritdatum, 1, 7))"
+)
+# Only present while some month is frozen, so loads into an unfrozen store pay nothing.
+TRIGGERS = {
+    "rgritten_frozen_insert": ("INSERT", _FROZEN.format(row="NEW")),
+    "rgritten_frozen_update": (
+        "UPDATE",
+        f"{_FROZEN.format(row='OLD')} OR {_FROZEN.format(row='NEW')}",
+    ),
+    "rgritten_frozen_delete": ("DELETE", _FROZEN.format(row="OLD")),
+}
+
+
+def month_bounds(month):
+    """[start, end) of a YYYY-MM month as datetimes; raises ValueError for other input."""
+    start = datetime.combine(datetime.strptime(month, "%Y-%m").date(), time.min)
+    return start, (start + timedelta(days=32)).replace(day=1)
+
+
+def _in_months(months):
+    return sa.or_(
+        *(
+            sa.and_(RGRit.ritdatum >= start, RGRit.ritdatum < end)
+            for start, end in map(month_bounds, months)
+        )
+    )
+
+
+def outside_frozen(query, months=None):
+    """Restrict an RGRit query to rows outside the frozen months (or the given ones)."""
+    months = frozen_months() if months is None else months
+    return query.filter(sa.not_(_in_months(months))) if months else query
+
+
+def catalog():
+    return db.session.query(RGRittenPartition).order_by(RGRittenPartition.month).all()
+
+
+def frozen_months():
+    return {
+        month
+        for (month,) in db.session.query(RGRittenPartition.month).filter(RGRittenPartition.frozen)
+    }
+
+
+def refresh(months=None):
+    """
+    Recount the catalog from rgritten, for all months or the given YYYY-MM ones: one pass
+    over the key index. Months without rows leave the catalog unless they are frozen.
+    """
+    month = sa.func.strftime("%Y-%m", RGRit.ritdatum)
+    query = db.session.query(
+        month, sa.func.count(), sa.func.min(RGRit.ritdatum), sa.func.max(RGRit.ritdatum)
+    )
+    stored = db.session.query(RGRittenPartition)
+    if months is not None:
+        query = query.filter(_in_months(months))
+        stored = stored.filter(RGRittenPartition.month.in_(months))
+    found = {m: (n, first, last) for m, n, first, last in query.group_by(month)}
+    parts = {part.month: part for part in stored}
+    now = datetime.utcnow()
+    for m, (n, first, last) in found.items():
+        part = parts.get(m)
+        if part is None:
+            part = RGRittenPartition(month=m)
+            db.session.add(part)
+        part.rows, part.first_ritdatum, part.last_ritdatum = n, first, last
+        part.refreshed_at = now
+    for m, part in parts.items():
+        if m in found:
+            continue
+        if part.frozen:
+            part.rows, part.first_ritdatum, part.last_ritdatum = 0, None, None
+            part.refreshed_at = now
+        else:
+            db.session.delete(part)
+    db.session.commit()
+    return catalog()
+
+
+def apply_triggers():
+    """Create the frozen-month triggers while any month is frozen, drop them otherwise."""
+    connection = db.session.connection()
+    if db.session.query(RGRittenPartition.id).filter(RGRittenPartition.frozen).first():
+        for name, (event, condition) in TRIGGERS.items():
+            connection.exec_driver_sql(
+                f"CREATE TRIGGER IF NOT EXISTS {name} BEFORE {event} ON {RGRit.__tablename__} "
+                f"WHEN {condition} BEGIN SELECT RAISE(ABORT, '{FROZEN_MESSAGE}'); END"
+            )
+    else:
+        for name in TRIGGERS:
+            connection.exec_driver_sql(f"DROP TRIGGER IF EXISTS {name}")
+    db.session.commit()
+
+
+def freeze(month):
+    """Make a month read-only; returns its catalog entry."""
+    month_bounds(month)
+    refresh([month])
+    part = db.session.query(RGRittenPartition).filter_by(month=month).first()
+    if part is None:
+        part = RGRittenPartition(month=month, rows=0)
+        db.session.add(part)
+    if not part.frozen:
+        part.frozen, part.frozen_at = True, datetime.utcnow()
+    db.session.commit()
+    apply_triggers()
+    return part
+
+
+def thaw(month):
+    """Make a frozen month writable again; returns its catalog entry or None."""
+    month_bounds(month)
+    part = db.session.query(RGRittenPartition).filter_by(month=month).first()
+    if part is not None:
+        part.frozen, part.frozen_at = False, None
+        db.session.commit()
+        apply_triggers()
+    return part
+
+
+def drop(month):
+    """
+    Delete a month of rgritten (frozen or not) with its quarantined values and catalog
+    entry in one transaction; returns the number of rows deleted. The freed pages stay in
+    the file until a VACUUM of the whole database.
+    """
+    start, end = month_bounds(month)
+    part = db.session.query(RGRittenPartition).filter_by(month=month).first()
+    if part is not None:
+        # Unfreeze in the same transaction, so the delete trigger lets the rows go.
+        part.frozen = False
+        db.session.flush()
+    deleted = (
+        db.session.query(RGRit)
+        .filter(RGRit.ritdatum >= start, RGRit.ritdatum < end)
+        .delete(synchronize_session=False)
+    )
+    db.session.query(RGRittenQuarantine).filter(
+        RGRittenQuarantine.ritdatum >= start, RGRittenQuarantine.ritdatum < end
+    ).delete(synchronize_session=False)
+    if part is not None:
+        db.session.delete(part)
+    db.session.commit()
+    apply_triggers()
+    return deleted
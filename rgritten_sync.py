@@ -1,8 +1,27 @@
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import date, datetime, time as dt_time, timedelta
+from decimal import Decimal
 import sqlalchemy as sa
+from sqlalchemy.dialects import sqlite as sqlite_dialect
 from sqlalchemy.exc import SQLAlchemyError
-from decimal import Decimal
 from extensions import db
-from models import ConnectionProfile, RGRit
+from models import (
+    RGRIT_ENCODED_COLUMNS,
+    RGRIT_INDICATOR_COLUMNS,
+    ConnectionProfile,
+    DatasetColumnProfile,
+    ReportTemplate,
+    RGRit,
+    SyncCheckpoint,
+    SyncRun,
+    SyncRunChunk,
+)
+from remote_engines import get_engine
+from refresh_scheduler import LeaseLost, extend_lease
+from rgritten_partitions import apply_triggers, frozen_months, month_bounds, outside_frozen
 
 # Column definitions for safe casting in the remote SELECT
 ALL_COLUMNS = [
@@ -318,25 +337,228 @@ DECIMAL_COLS = {
 }
 
 
-def _build_select(columns, min_ritdatum=None, last_date=None, last_ritnummer=None, limit=None):
-    rit_expr = "TRY_CONVERT(bigint, [ritnummer])"
-    date_expr = "TRY_CONVERT(date, [ritdatum])"
-    select_parts = []
-    for col in columns:
-        if col in DATETIME_COLS:
-            select_parts.append(f"TRY_CONVERT(datetime, [{col}]) AS [{col}]")
-        elif col in TIME_COLS:
-            select_parts.append(f"TRY_CONVERT(time, [{col}]) AS [{col}]")
-        elif col in DECIMAL_COLS:
-            select_parts.append(f"TRY_CONVERT(decimal(38, 10), [{col}]) AS [{col}]")
-        elif col in NUMERIC_COLS:
-            select_parts.append(f"TRY_CONVERT(decimal(38, 10), [{col}]) AS [{col}]")
-        elif col == "ritnummer":
-            select_parts.append(f"{rit_expr} AS [ritnummer]")
-        else:
-            select_parts.append(f"[{col}]")
+RIT_EXPR = "TRY_CONVERT(bigint, [ritnummer])"
+DATE_EXPR = "TRY_CONVERT(date, [ritdatum])"
+# Chunks buffered between two pipeline stages; bounds memory and gives backpressure.
+PIPELINE_DEPTH = 4
+# Local unique key; rows re-fetched with this key replace (upsert) or keep (append) the old one.
+UPSERT_KEY = ("ritdatum", "ritnummer")
+# Always fetched, whatever the column profile: the cursor key and the NOT NULL columns.
+REQUIRED_COLUMNS = [
+    c for c in ALL_COLUMNS if c in ("ritdatum", "ritnummer") or not RGRit.__table__.c[c].nullable
+]
+SYNC_MODES = ("append", "upsert")
+# Bulk loads drop the secondary rgritten indexes and rebuild them afterwards. "auto"
+# does so when at least BULK_MIN_ROWS are pending and they are BULK_RATIO of the table.
+BULK_MODES = ("auto", "on", "off")
+BULK_MIN_ROWS = 200_000
+BULK_RATIO = 0.25
+# Rows per transaction during a bulk load.
+BULK_COMMIT_EVERY = 100_000
+# Rows per transaction when a column-profile change is applied to the stored rows.
+COLUMN_REWRITE_BATCH = 50_000
+# Marks a fetched column holding the raw source value that TRY_CONVERT lost (else NULL).
+LOST_PREFIX = "lost:"
+# Indicator bitmasks fetched next to row_hash, per flag value; see RGRIT_INDICATOR_COLUMNS.
+INDICATOR_MASKS = {"ind_set": 1, "ind_clear": 0}
+# ritnummer buckets below a mismatched day in the reconcile checksum tree.
+RECONCILE_BUCKETS = 64
+# Where a sync's time goes, recorded per run and per committed batch in sync_runs.
+RUN_STAGES = ("fetch", "convert", "insert", "commit")
+# Per-batch metrics are kept for this many recent runs; run totals are kept for all.
+RUN_CHUNK_HISTORY = 50
+
+
+# Declared SQL Server types that already arrive in the local type, so need no TRY_CONVERT.
+NATIVE_TYPES = {
+    "datetime": {"datetime", "datetime2", "smalldatetime", "date"},
+    "time": {"time"},
+    "number": {
+        "bigint",
+        "int",
+        "smallint",
+        "tinyint",
+        "bit",
+        "decimal",
+        "numeric",
+        "money",
+        "smallmoney",
+        "float",
+        "real",
+    },
+    "integer": {"bigint", "int", "smallint", "tinyint"},
+}
+COLUMN_TYPES_SQL = (
+    "SELECT COLUMN_NAME AS [name], DATA_TYPE AS [data_type] "
+    "FROM INFORMATION_SCHEMA.COLUMNS "
+    "WHERE TABLE_SCHEMA = 'rpt' AND TABLE_NAME = 'RGRitten'"
+)
+# Declared column types per (profile id, profile updated_at); editing a profile refreshes them.
+_column_types = {}
+_column_types_lock = threading.Lock()
+
+
+class _SourcePlan:
+    """
+    How rpt.RGRitten is read for one profile. Columns whose declared type already matches
+    the local one are selected as they are; only the rest go through TRY_CONVERT. With a
+    native ritdatum/ritnummer the cursor predicates stay sargable, so SQL Server can seek
+    instead of scanning and converting the whole view. Without types every column is
+    converted, as before. `columns` is the projection fetched (plus row_hash and, with any
+    indicator flag among them, the indicator bitmasks). For every
+    converted column the raw value is fetched as well when the conversion loses it, so the
+    writer can quarantine it. Rows of `skip_months` (YYYY-MM) are left out of every range.
+    """
+
+    def __init__(self, types=None, maxdop=None, columns=None):
+        self.types = types or {}
+        self.maxdop = maxdop
+        self.rit_expr = "[ritnummer]" if self._native("ritnummer", "integer") else RIT_EXPR
+        # CAST(datetime AS date) is one of the conversions SQL Server can still seek on.
+        self.date_expr = (
+            "CAST([ritdatum] AS date)" if self._native("ritdatum", "datetime") else DATE_EXPR
+        )
+        self.hashed = list(columns or ALL_COLUMNS)
+        self.quarantine = [c for c in self.hashed if self.converts(c)]
+        self.indicators = [c for c in self.hashed if c in RGRIT_INDICATOR_COLUMNS]
+        self.columns = (
+            self.hashed
+            + ["row_hash"]
+            + (list(INDICATOR_MASKS) if self.indicators else [])
+            + [LOST_PREFIX + c for c in self.quarantine]
+        )
+        self.skip_months = ()
+
+    def _native(self, col, kind):
+        return self.types.get(col) in NATIVE_TYPES[kind]
+
+    def column(self, col):
+        if col == "ritnummer":
+            return self.rit_expr
+        if col in DATETIME_COLS and not self._native(col, "datetime"):
+            return f"TRY_CONVERT(datetime, [{col}])"
+        if col in TIME_COLS and not self._native(col, "time"):
+            return f"TRY_CONVERT(time, [{col}])"
+        if (col in DECIMAL_COLS or col in NUMERIC_COLS) and not self._native(col, "number"):
+            return f"TRY_CONVERT(decimal(38, 10), [{col}])"
+        return f"[{col}]"
+
+    def converts(self, col):
+        """True for data columns whose values go through TRY_CONVERT, i.e. can turn NULL."""
+        return col not in UPSERT_KEY and self.column(col).startswith("TRY_CONVERT")
+
+    @property
+    def options(self):
+        return f"\nOPTION (MAXDOP {int(self.maxdop)})" if self.maxdop else ""
+
 
-    filters = [f"{rit_expr} IS NOT NULL"]
+def _load_source_plan(remote, profile, dataset="rgritten"):
+    key = (profile.id, profile.updated_at)
+    with _column_types_lock:
+        types = _column_types.get(key)
+    if types is None:
+        types = {
+            r.name.lower(): r.data_type.lower()
+            for r in remote.execute(sa.text(COLUMN_TYPES_SQL))
+        }
+        with _column_types_lock:
+            _column_types[key] = types
+    return _SourcePlan(
+        types, maxdop=getattr(profile, "query_maxdop", None), columns=sync_columns(dataset)
+    )
+
+
+def sync_columns(dataset="rgritten"):
+    """Columns the sync fetches: the dataset's column profile plus REQUIRED_COLUMNS."""
+    profile = db.session.query(DatasetColumnProfile).filter_by(dataset=dataset).first()
+    if not profile or not profile.columns:
+        return list(ALL_COLUMNS)
+    chosen = set(profile.columns) | set(REQUIRED_COLUMNS)
+    return [c for c in ALL_COLUMNS if c in chosen]
+
+
+def suggest_sync_columns(dataset="rgritten"):
+    """Columns used by saved report templates (incl. inputs of calculated fields)."""
+    from blueprints.reports.routes import CALC_FIELD_COLUMNS
+
+    used = set(REQUIRED_COLUMNS)
+    for tpl in db.session.query(ReportTemplate).filter_by(dataset=dataset):
+        used.update(tpl.include_fields or [])
+        used.update(tpl.group_fields or [])
+        used.update(tpl.pivot_row_fields or [])
+        used.add(tpl.pivot_col_field)
+        for item in (tpl.filter_fields or []) + (tpl.sort_fields or []) + (tpl.pivot_values or []):
+            used.add(item.get("field") if isinstance(item, dict) else item)
+    for field, inputs in CALC_FIELD_COLUMNS.items():
+        if field in used:
+            used.update(inputs)
+    return [c for c in ALL_COLUMNS if c in used]
+
+
+def save_column_profile(columns, dataset="rgritten"):
+    """
+    Store the column profile (None = all columns). Returns (added, dropped); the stored rows
+    are brought in line by rewrite_column_profile, which the admin page queues as a sync
+    job (sync_jobs.enqueue_columns) rather than running in the request.
+    """
+    before = set(sync_columns(dataset))
+    profile = db.session.query(DatasetColumnProfile).filter_by(dataset=dataset).first()
+    if not profile:
+        profile = DatasetColumnProfile(dataset=dataset)
+        db.session.add(profile)
+    chosen = set(columns or ())
+    profile.columns = [c for c in ALL_COLUMNS if c in chosen] or None
+    db.session.flush()
+    after = set(sync_columns(dataset))
+    added = [c for c in ALL_COLUMNS if c in after - before]
+    dropped = [c for c in ALL_COLUMNS if c in before - after]
+    db.session.commit()
+    return added, dropped
+
+
+def rewrite_column_profile(dropped, batch_size=None, progress=None, lease=None):
+    """
+    Apply a column-profile change to the stored rows: clear the dropped columns (and their
+    indicator bits) and the row_hash, which covers the synced columns only; reconcile-rgritten
+    then fetches the rows again and fills in added columns. Works through id ranges of
+    `batch_size` rows (default COLUMN_REWRITE_BATCH), one commit each, so writers are never
+    blocked for the whole table.
+
+    Frozen months are read-only and keep their values and hashes; after a thaw, reconcile
+    sees their old hashes as changed and re-fetches them. Dropped columns stay filled there.
+
+    progress(rows, None, total) is called after every batch; it may raise SyncCancelled to
+    stop there. lease is the scheduler's current_lease() token: every batch commit renews it
+    and raises LeaseLost once another process holds it. Returns the number of rows rewritten.
+    """
+    values = {getattr(RGRit, c): None for c in dropped}
+    bits = sum(1 << RGRIT_INDICATOR_COLUMNS.index(c) for c in dropped if c in RGRIT_INDICATOR_COLUMNS)
+    if bits:
+        values[RGRit.ind_set] = RGRit.ind_set.op("&")(~bits)
+        values[RGRit.ind_clear] = RGRit.ind_clear.op("&")(~bits)
+    values[RGRit.row_hash] = None
+    batch_size = batch_size or COLUMN_REWRITE_BATCH
+    first, last = db.session.query(sa.func.min(RGRit.id), sa.func.max(RGRit.id)).one()
+    total = outside_frozen(db.session.query(RGRit)).count()
+    done = 0
+    for lo in range(first or 0, (last or -1) + 1, batch_size):
+        done += outside_frozen(
+            db.session.query(RGRit).filter(RGRit.id >= lo, RGRit.id < lo + batch_size)
+        ).update(values, synchronize_session=False)
+        if lease is not None:
+            extend_lease(lease)
+        db.session.commit()
+        if progress is not None:
+            progress(done, None, total)
+    return done
+
+
+def _build_filters(min_ritdatum=None, last_date=None, date_from=False, date_to=False, plan=None):
+    plan = plan or _SourcePlan()
+    rit_expr = plan.rit_expr
+    date_expr = plan.date_expr
+    # Rows without a valid ritdatum cannot be placed on the (ritdatum, ritnummer) cursor.
+    filters = [f"{rit_expr} IS NOT NULL", f"{date_expr} IS NOT NULL"]
     if min_ritdatum:
         filters.append(f"{date_expr} >= :min_ritdatum")
     if last_date is not None:
@@ -344,28 +566,1084 @@ def _build_select(columns, min_ritdatum=None, last_date=None, last_ritnummer=Non
             f"(({date_expr} > :last_date) OR "
             f"({date_expr} = :last_date AND {rit_expr} > :last_ritnummer))"
         )
+    if date_from:
+        filters.append(f"{date_expr} >= :date_from")
+    if date_to:
+        filters.append(f"{date_expr} < :date_to")
+    for month in plan.skip_months:
+        start, end = month_bounds(month)
+        filters.append(f"NOT ({date_expr} >= '{start:%Y-%m-%d}' AND {date_expr} < '{end:%Y-%m-%d}')")
+    return filters
+
+
+def _row_hash_expr(columns=ALL_COLUMNS, size=8):
+    """
+    SQL Server expression for the row hash: the first 8 bytes of SHA2-256 over the converted
+    values as a signed bigint. NULL hashes as '' so values cannot shift between columns;
+    datetimes use style 121 so the text does not depend on session language settings.
+    size=4 gives the upper half as int, which equals the stored row_hash >> 32.
+    Always hashes the fully converted values, so hashes do not change with the plan; they
+    do change with the column profile, which only covers the synced columns.
+    """
+    plan = _SourcePlan()
+    parts = []
+    for col in columns:
+        expr = plan.column(col)
+        if col in DATETIME_COLS:
+            expr = f"CONVERT(varchar(23), {expr}, 121)"
+        parts.append(f"ISNULL(CAST({expr} AS nvarchar(max)), N'')")
+    return (
+        "CAST(SUBSTRING(HASHBYTES('SHA2_256', CONCAT_WS(N'|', "
+        + ", ".join(parts)
+        + f")), 1, {size}) AS {'bigint' if size == 8 else 'int'})"
+    )
+
+
+def _indicator_mask_expr(value, plan):
+    """
+    SQL Server expression for an indicator bitmask: bit n is set when the n-th flag of
+    RGRIT_INDICATOR_COLUMNS equals `value`. Only synced flags count, so a mask never
+    disagrees with the stored columns; NULL and non-numeric values set no bit.
+    """
+    bits = []
+    for col in plan.indicators:
+        expr = plan.column(col)
+        if expr == f"[{col}]" and not plan._native(col, "number"):
+            # Flags outside NUMERIC_COLS arrive as text; comparing that with a number fails.
+            expr = f"TRY_CONVERT(decimal(38, 10), {expr})"
+        bits.append(
+            f"CASE WHEN {expr} = {value} "
+            f"THEN CAST({1 << RGRIT_INDICATOR_COLUMNS.index(col)} AS bigint) ELSE 0 END"
+        )
+    return "(" + " | ".join(bits) + ")"
+
+
+def _lost_value_expr(col, plan):
+    """The raw value of a converted column when TRY_CONVERT turns it into NULL, else NULL."""
+    return (
+        f"CASE WHEN {plan.column(col)} IS NULL "
+        f"THEN NULLIF(LTRIM(RTRIM(CAST([{col}] AS nvarchar(4000)))), N'') END"
+    )
+
 
-    top_clause = f"TOP {limit} " if limit else ""
+def _build_select(
+    columns,
+    min_ritdatum=None,
+    last_date=None,
+    last_ritnummer=None,
+    limit=None,
+    date_from=False,
+    date_to=False,
+    with_ties=False,
+    extra_filters=(),
+    plan=None,
+):
+    plan = plan or _SourcePlan()
+    select_parts = []
+    for col in columns:
+        if col == "row_hash":
+            select_parts.append(f"{_row_hash_expr(plan.hashed)} AS [row_hash]")
+        elif col in INDICATOR_MASKS:
+            select_parts.append(f"{_indicator_mask_expr(INDICATOR_MASKS[col], plan)} AS [{col}]")
+        elif col.startswith(LOST_PREFIX):
+            select_parts.append(f"{_lost_value_expr(col[len(LOST_PREFIX):], plan)} AS [{col}]")
+        else:
+            select_parts.append(f"{plan.column(col)} AS [{col}]")
+
+    filters = _build_filters(min_ritdatum, last_date, date_from, date_to, plan)
+    filters += list(extra_filters)
+
+    if limit and with_ties:
+        # WITH TIES keeps every row sharing the last key, so the next window can use ">"
+        top_clause = f"TOP ({int(limit)}) WITH TIES "
+    else:
+        top_clause = f"TOP {limit} " if limit else ""
     select_sql = (
         f"SELECT {top_clause}\n       " + ",\n       ".join(select_parts) + "\n"
         "FROM rpt.RGRitten\n"
         "WHERE " + " AND ".join(filters) + "\n"
-        f"ORDER BY {date_expr}, {rit_expr}"
+        f"ORDER BY {plan.date_expr}, {plan.rit_expr}" + plan.options
     )
     return select_sql
 
 
+def _build_day_counts(min_ritdatum=None, last_date=None, date_from=False, date_to=False, plan=None):
+    plan = plan or _SourcePlan()
+    date_expr = plan.date_expr
+    filters = _build_filters(min_ritdatum, last_date, date_from, date_to, plan)
+    return (
+        f"SELECT {date_expr} AS [dag], COUNT(*) AS [n]\n"
+        "FROM rpt.RGRitten\n"
+        "WHERE " + " AND ".join(filters) + "\n"
+        f"GROUP BY {date_expr}\n"
+        f"ORDER BY {date_expr}" + plan.options
+    )
+
+
+def _build_pending_count(min_ritdatum=None, last_date=None, plan=None):
+    plan = plan or _SourcePlan()
+    filters = _build_filters(min_ritdatum, last_date, plan=plan)
+    return "SELECT COUNT_BIG(*) AS [n]\nFROM rpt.RGRitten\nWHERE " + " AND ".join(filters) + plan.options
+
+
+def _use_bulk(bulk, pending):
+    """Whether a load of `pending` rows should defer index maintenance."""
+    if bulk not in BULK_MODES:
+        raise ValueError(f"bulk must be one of {', '.join(BULK_MODES)}")
+    if bulk != "auto":
+        return bulk == "on"
+    if not pending or pending < BULK_MIN_ROWS:
+        return False
+    # MAX(id) is a free estimate of the table size; exact enough for this decision.
+    stored = db.session.query(sa.func.max(RGRit.id)).scalar() or 0
+    return pending >= BULK_RATIO * stored
+
+
+def _drop_secondary_indexes():
+    """
+    Drop the non-unique rgritten indexes before a bulk load. The unique key stays: the
+    INSERT's conflict handling and the checkpoint cleanup depend on it.
+    """
+    connection = db.session.connection()
+    dropped = []
+    for index in RGRit.__table__.indexes:
+        if not index.unique:
+            index.drop(connection, checkfirst=True)
+            dropped.append(index.name)
+    db.session.commit()
+    return dropped
+
+
+def _ensure_indexes():
+    """
+    Create the rgritten indexes of the model that are missing locally, e.g. after a bulk
+    load or one that was interrupted, and refresh the planner statistics when any were.
+    """
+    started = time.perf_counter()
+    connection = db.session.connection()
+    existing = {index["name"] for index in sa.inspect(connection).get_indexes(RGRit.__tablename__)}
+    created = []
+    for index in sorted(RGRit.__table__.indexes, key=lambda index: index.name):
+        if index.name not in existing:
+            index.create(connection)
+            created.append(index.name)
+    if created:
+        connection.exec_driver_sql(f"ANALYZE {RGRit.__tablename__}")
+    db.session.commit()
+    return {"created": created, "seconds": round(time.perf_counter() - started, 3)}
+
+
+def _out_of_order():
+    """Rows whose rowid does not follow the previous row in (ritdatum, ritnummer) order."""
+    steps = (
+        sa.select(
+            (RGRit.id - sa.func.lag(RGRit.id).over(order_by=(RGRit.ritdatum, RGRit.ritnummer))).label(
+                "step"
+            )
+        )
+    ).subquery()
+    return db.session.query(sa.func.count()).select_from(steps).filter(steps.c.step != 1).scalar()
+
+
+def cluster_rgritten(dry_run=False):
+    """
+    Rewrite rgritten in (ritdatum, ritnummer) order, so a date range is stored in adjacent
+    pages. The forward sync appends in that order by itself; partitioned loads, backfills and
+    reconcile re-fetches do not. The copy gets fresh ids in key order and replaces the table
+    in one transaction; readers keep the old table until it commits. WITHOUT ROWID would
+    keep this order permanently, but a row of rgritten exceeds its in-page limit and every
+    row would spill to overflow pages (see benchmarks/bench_layout.py).
+    """
+    started = time.perf_counter()
+    stats = {
+        "rows": db.session.query(sa.func.count(RGRit.id)).scalar(),
+        "out_of_order": _out_of_order(),
+        "clustered": False,
+    }
+    db.session.commit()
+    if dry_run or not stats["out_of_order"]:
+        stats["seconds"] = round(time.perf_counter() - started, 3)
+        return stats
+
+    table = RGRit.__table__
+    copy = table.to_metadata(sa.MetaData(), name=f"{table.name}_clustered")
+    columns = ", ".join(f'"{column.name}"' for column in table.columns if column.name != "id")
+    connection = db.session.connection()
+    connection.exec_driver_sql(f"DROP TABLE IF EXISTS {copy.name}")
+    connection.execute(sa.schema.CreateTable(copy))
+    connection.exec_driver_sql(
+        f"INSERT INTO {copy.name} ({columns}) SELECT {columns} FROM {table.name} "
+        "ORDER BY ritdatum, ritnummer"
+    )
+    connection.exec_driver_sql(f"DROP TABLE {table.name}")
+    connection.exec_driver_sql(f"ALTER TABLE {copy.name} RENAME TO {table.name}")
+    for index in sorted(table.indexes, key=lambda index: index.name):
+        index.create(connection)
+    connection.exec_driver_sql(f"ANALYZE {table.name}")
+    # Dropping the old table took its frozen-month triggers along.
+    apply_triggers()
+    stats["clustered"] = True
+    stats["seconds"] = round(time.perf_counter() - started, 3)
+    return stats
+
+
+def _sqlite_temporal(impl, proc):
+    """
+    Same strings as SQLite's default DATETIME/TIME bind processors, via the C isoformat
+    instead of a %-format per value; anything unexpected falls back to the original.
+    """
+    if impl._storage_format == sqlite_dialect.DATETIME._storage_format:
+        kind, args = datetime, (" ", "microseconds")
+    elif impl._storage_format == sqlite_dialect.TIME._storage_format:
+        kind, args = dt_time, ("microseconds",)
+    else:
+        return proc
+
+    def process(value):
+        if type(value) is kind:
+            return value.isoformat(*args)
+        return proc(value)
+
+    return process
+
+
+def _decimal_to_float(value):
+    """Like remote_engines._decimal_output; integral values are stored as INTEGER by affinity."""
+    return float(value) if isinstance(value, Decimal) else value
+
+
+class SyncCancelled(Exception):
+    """Raised by a progress callback to stop a sync; the rows committed so far are kept."""
+
+
+class _ChunkWriter:
+    """
+    Single-threaded SQLite writer for remote row tuples. The INSERT is compiled once for the
+    remote column order and run through executemany; only columns whose local type needs a
+    bind processor (dates, times and, without driver converters, numbers) are touched per row.
+    Commits happen every `commit_every` rows, together with the checkpoint (if any).
+
+    Rows conflict on (ritdatum, ritnummer). In append mode a conflicting row is skipped; in
+    upsert mode it replaces the stored row, unless its row_hash is unchanged.
+
+    Trailing LOST_PREFIX columns carry raw values that TRY_CONVERT turned into NULL; they
+    are stripped off and stored in rgritten_quarantine with the rows that are written.
+    RGRIT_ENCODED_COLUMNS are written as their rgritten_strings codes; new values are added
+    to the dictionary in the same transaction.
+
+    `timings` accumulates seconds per RUN_STAGES entry; callers add the fetch time. With a
+    `run_id`, every commit also stores the metrics of the previous batch in sync_run_chunks.
+    """
+
+    def __init__(self, columns, checkpoint, commit_every, numbers_converted=True, upsert=False):
+        table = RGRit.__table__
+        dialect = db.engine.dialect
+        quote = dialect.identifier_preparer.quote
+        self.lost = [c[len(LOST_PREFIX) :] for c in columns if c.startswith(LOST_PREFIX)]
+        columns = [c for c in columns if not c.startswith(LOST_PREFIX)]
+        names = ["ingested_at"] + list(columns)
+        marker = "?" if dialect.paramstyle == "qmark" else "%s"
+        self.sql = (
+            f"INSERT INTO {quote(table.name)} ({', '.join(quote(n) for n in names)}) "
+            f"VALUES ({', '.join([marker] * len(names))}) "
+        )
+        if upsert:
+            updates = ", ".join(
+                f"{quote(n)} = excluded.{quote(n)}" for n in names if n not in UPSERT_KEY
+            )
+            self.sql += (
+                f"ON CONFLICT ({', '.join(quote(n) for n in UPSERT_KEY)}) DO UPDATE SET {updates} "
+                f"WHERE {quote(table.name)}.row_hash IS NOT excluded.row_hash"
+            )
+        else:
+            self.sql += "ON CONFLICT DO NOTHING"
+        quarantine = ["ritdatum", "ritnummer", "column", "raw_value", "detected_at"]
+        self.quarantine_sql = (
+            f"INSERT INTO rgritten_quarantine ({', '.join(quote(n) for n in quarantine)}) "
+            f"VALUES ({', '.join([marker] * len(quarantine))}) "
+            f"ON CONFLICT (ritdatum, ritnummer, {quote('column')}) DO UPDATE SET "
+            "raw_value = excluded.raw_value, detected_at = excluded.detected_at"
+        )
+        self.unquarantine_sql = (
+            f"DELETE FROM rgritten_quarantine WHERE ritdatum = {marker} AND ritnummer = {marker}"
+        )
+        self.stored_sql = (
+            f"SELECT ritdatum, ritnummer, row_hash FROM {quote(table.name)} "
+            f"WHERE ritdatum BETWEEN {marker} AND {marker}"
+        )
+        self.width = len(names)
+        self.quarantined = {}
+        self.upsert = upsert
+        self.key_positions = [names.index(n) for n in UPSERT_KEY]
+        self.hash_position = names.index("row_hash") if "row_hash" in names else None
+        self.encoded = [idx for idx, name in enumerate(names) if name in RGRIT_ENCODED_COLUMNS]
+        self.codes = None  # value -> code, loaded on the first write
+        self.counts = {"inserted": 0, "updated": 0, "unchanged": 0}
+        self.processors = []
+        for idx, name in enumerate(columns):
+            col_type = table.c[name].type
+            if numbers_converted and isinstance(col_type, (sa.Numeric, sa.Integer)):
+                continue
+            impl = col_type.dialect_impl(dialect)
+            proc = impl.bind_processor(dialect)
+            if proc is None and isinstance(col_type, sa.Integer):
+                # Converted flags and ids arrive as Decimal, which sqlite3 cannot bind.
+                proc = _decimal_to_float
+            if proc is None:
+                continue
+            if isinstance(impl, (sqlite_dialect.DATETIME, sqlite_dialect.TIME)):
+                proc = _sqlite_temporal(impl, proc)
+            self.processors.append((idx + 1, proc))
+        self.ingested_proc = table.c.ingested_at.type.dialect_impl(dialect).bind_processor(dialect)
+        self.checkpoint = checkpoint
+        self.commit_every = commit_every
+        self.pending = 0
+        self.progress = None  # called with (rows written or skipped, key) after each commit
+        self.lease = None  # refresh_scheduler.current_lease() token, checked on each commit
+        self.run_id = None
+        self.timings = dict.fromkeys(RUN_STAGES, 0.0)
+        self.bytes = 0
+        self.chunk = self._new_chunk()
+        self.chunks = []  # finished batches not stored yet
+        self.seq = 0
+
+    def _new_chunk(self):
+        return {"rows": 0, "bytes": 0, **{f"{stage}_seconds": 0.0 for stage in RUN_STAGES}}
+
+    def add_time(self, stage, seconds):
+        self.timings[stage] += seconds
+        self.chunk[f"{stage}_seconds"] += seconds
+
+    def flush_chunks(self):
+        """Add the finished batch metrics to the current transaction."""
+        if self.chunks:
+            db.session.execute(SyncRunChunk.__table__.insert(), self.chunks)
+            self.chunks = []
+
+    def prepare(self, rows):
+        """
+        Turn remote rows into INSERT parameter tuples: (params, estimated bytes, seconds).
+        Reads only what __init__ set up, so the pipeline's converter thread may call it; the
+        writer thread books the size and time with account().
+        """
+        started = time.perf_counter()
+        size = _estimate_bytes(rows)
+        ingested_at = datetime.utcnow()
+        if self.ingested_proc:
+            ingested_at = self.ingested_proc(ingested_at)
+        processors = self.processors
+        params = []
+        for row in rows:
+            vals = [ingested_at, *row]
+            for idx, proc in processors:
+                val = vals[idx]
+                if val is not None:
+                    vals[idx] = proc(val)
+            params.append(tuple(vals))
+        return params, size, time.perf_counter() - started
+
+    def account(self, size, seconds):
+        """Book a prepared window on the current batch; writer thread only."""
+        self.bytes += size
+        self.chunk["bytes"] += size
+        self.add_time("convert", seconds)
+
+    def _stored_hashes(self, connection, params):
+        """{(ritdatum, ritnummer): row_hash} of the stored rows in the window's date range."""
+        date_pos, rit_pos = self.key_positions
+        dates = [p[date_pos] for p in params]
+        return {
+            (day, rit): row_hash
+            for day, rit, row_hash in connection.exec_driver_sql(
+                self.stored_sql, (min(dates), max(dates))
+            )
+        }
+
+    def _split_changed(self, connection, params):
+        """Compare a window with the stored hashes: (rows to insert, rows to update)."""
+        date_pos, rit_pos = self.key_positions
+        stored = self._stored_hashes(connection, params)
+        new, changed = [], []
+        for p in params:
+            key = (p[date_pos], p[rit_pos])
+            if key not in stored:
+                new.append(p)
+            elif stored[key] != p[self.hash_position]:
+                changed.append(p)
+        return new, changed
+
+    def _split_lost(self, params):
+        """
+        Strip the lost raw values off the tuples: (row tuples, quarantine entries, index of
+        the row of each entry).
+        """
+        width = self.width
+        date_pos, rit_pos = self.key_positions
+        rows, lost, owners = [], [], []
+        for idx, p in enumerate(params):
+            rows.append(p[:width])
+            for col, raw in zip(self.lost, p[width:]):
+                if raw is not None:
+                    lost.append((p[date_pos], p[rit_pos], col, raw, p[0]))
+                    owners.append(idx)
+        return rows, lost, owners
+
+    @staticmethod
+    def _load_codes(connection):
+        return dict(connection.exec_driver_sql("SELECT value, code FROM rgritten_strings").all())
+
+    def _encode(self, connection, params):
+        """Replace the RGRIT_ENCODED_COLUMNS values by their codes, adding new values first."""
+        positions = self.encoded
+        if self.codes is None:
+            self.codes = self._load_codes(connection)
+        new = {p[idx] for p in params for idx in positions} - self.codes.keys() - {None}
+        if new:
+            connection.exec_driver_sql(
+                "INSERT INTO rgritten_strings (value) VALUES (?) ON CONFLICT DO NOTHING",
+                [(value,) for value in sorted(new)],
+            )
+            self.codes = self._load_codes(connection)
+        codes = self.codes
+        encoded = []
+        for p in params:
+            vals = list(p)
+            for idx in positions:
+                if vals[idx] is not None:
+                    vals[idx] = codes[vals[idx]]
+            encoded.append(tuple(vals))
+        return encoded
+
+    def write(self, params):
+        """Write parameter tuples; returns the number of rows inserted or updated."""
+        if not params:
+            return 0
+        started = time.perf_counter()
+        self.chunk["rows"] += len(params)
+        connection = db.session.connection()
+        lost = []
+        if self.lost:
+            params, lost, owners = self._split_lost(params)
+        if self.encoded:
+            params = self._encode(connection, params)
+        if self.upsert and self.hash_position is not None:
+            new, changed = self._split_changed(connection, params)
+            self.counts["unchanged"] += len(params) - len(new) - len(changed)
+            params = new + changed
+            if params:
+                connection.exec_driver_sql(self.sql, params)
+            self.counts["inserted"] += len(new)
+            self.counts["updated"] += len(changed)
+            written = len(params)
+            if self.lost:
+                date_pos, rit_pos = self.key_positions
+                if changed:
+                    # A changed row may have been fixed at the source: drop its old entries.
+                    connection.exec_driver_sql(
+                        self.unquarantine_sql, [(p[date_pos], p[rit_pos]) for p in changed]
+                    )
+                keys = {(p[date_pos], p[rit_pos]) for p in params}
+                lost = [entry for entry in lost if entry[:2] in keys]
+        else:
+            if lost:
+                # ON CONFLICT DO NOTHING keeps the stored row (or the first of the window)
+                # of a key; the values lost in the skipped rows were never written.
+                date_pos, rit_pos = self.key_positions
+                seen = set(self._stored_hashes(connection, params))
+                inserted = set()
+                for idx, p in enumerate(params):
+                    key = (p[date_pos], p[rit_pos])
+                    if key not in seen:
+                        seen.add(key)
+                        inserted.add(idx)
+                lost = [entry for entry, idx in zip(lost, owners) if idx in inserted]
+            written = connection.exec_driver_sql(self.sql, params).rowcount
+            self.counts["inserted"] += written
+            self.counts["unchanged"] += len(params) - written
+        if lost:
+            connection.exec_driver_sql(self.quarantine_sql, lost)
+            for entry in lost:
+                self.quarantined[entry[2]] = self.quarantined.get(entry[2], 0) + 1
+        self.pending += len(params)
+        self.add_time("insert", time.perf_counter() - started)
+        return written
+
+    def insert(self, rows):
+        params, size, seconds = self.prepare(rows)
+        self.account(size, seconds)
+        return self.write(params)
+
+    def commit(self, key, force=False):
+        if not force and self.pending < self.commit_every:
+            return False
+        # The checkpoint is committed in the same transaction as the rows it covers.
+        if self.checkpoint is not None:
+            _set_checkpoint(self.checkpoint, key, self.lease)
+        elif self.lease is not None:
+            extend_lease(self.lease)
+        if self.run_id is not None:
+            self.flush_chunks()
+        started = time.perf_counter()
+        db.session.commit()
+        self.add_time("commit", time.perf_counter() - started)
+        self.pending = 0
+        if self.chunk["rows"]:
+            if self.run_id is not None:
+                self.seq += 1
+                self.chunks.append(
+                    {
+                        **{k: round(v, 4) if isinstance(v, float) else v for k, v in self.chunk.items()},
+                        "run_id": self.run_id,
+                        "seq": self.seq,
+                        "finished_at": datetime.utcnow(),
+                        "through_ritdatum": key[0] if key else None,
+                        "through_ritnummer": key[1] if key else None,
+                    }
+                )
+            self.chunk = self._new_chunk()
+        if self.progress is not None:
+            self.progress(sum(self.counts.values()), key)
+        return True
+
+
+def _estimate_bytes(rows, samples=8):
+    """Approximate payload size of fetched rows, from a few evenly spaced sample rows."""
+    if not rows:
+        return 0
+    picked = rows[:: max(1, len(rows) // samples)][:samples]
+    size = 0
+    for row in picked:
+        for val in row:
+            if val is None:
+                continue
+            size += len(val) if isinstance(val, (str, bytes, bytearray)) else 8
+    return size * len(rows) // len(picked)
+
+
+def _row_key(mapping):
+    """Return the (ritdatum as YYYY-MM-DD, ritnummer) cursor key of a payload row."""
+    val = mapping.get("ritdatum")
+    dval = val.date().isoformat() if hasattr(val, "date") else val
+    return dval or None, mapping.get("ritnummer")
+
+
+def _iter_windows(
+    remote,
+    columns,
+    chunk_size,
+    min_ritdatum=None,
+    last_date=None,
+    last_ritnummer=0,
+    date_from=None,
+    date_to=None,
+    stop=None,
+    plan=None,
+):
+    """
+    Yield (keys, rows) keyset windows: one short TOP (n) query per chunk, each starting
+    after the last key of the previous window, instead of one long-lived streaming query.
+    """
+    while stop is None or not stop.is_set():
+        sql = _build_select(
+            columns,
+            min_ritdatum=min_ritdatum,
+            last_date=last_date,
+            limit=chunk_size,
+            date_from=date_from is not None,
+            date_to=date_to is not None,
+            with_ties=True,
+            plan=plan,
+        )
+        params = {
+            "min_ritdatum": min_ritdatum,
+            "last_date": last_date,
+            "last_ritnummer": last_ritnummer,
+            "date_from": date_from,
+            "date_to": date_to,
+        }
+        result = remote.execute(sa.text(sql), params)
+        keys = list(result.keys())
+        rows = result.fetchall()
+        if not rows:
+            return
+        yield keys, rows
+        last_date, last_ritnummer = _row_key(rows[-1]._mapping)
+        if len(rows) < chunk_size:
+            return
+
+
+def _as_date(val):
+    if isinstance(val, datetime):
+        return val.date()
+    if isinstance(val, date):
+        return val
+    return date.fromisoformat(str(val)[:10])
+
+
+def _plan_partitions(day_counts, partitions):
+    """
+    Split ordered (day, row count) pairs into at most `partitions` contiguous date ranges
+    of roughly equal row volume. The first range is open at the start and the last range
+    is open at the end, so together they always cover the whole pending range.
+    """
+    total = sum(n for _, n in day_counts)
+    if not total or partitions < 1:
+        return []
+    target = total / partitions
+    plan = []
+    start = None
+    rows = 0
+    for day, n in day_counts:
+        if start is None:
+            start = day
+        rows += n
+        if rows >= target and len(plan) < partitions - 1:
+            plan.append({"start": start, "end": day + timedelta(days=1), "rows": rows})
+            start = None
+            rows = 0
+    if start is not None:
+        plan.append({"start": start, "end": None, "rows": rows})
+    else:
+        plan[-1]["end"] = None
+    plan[0]["start"] = None
+    for idx, part in enumerate(plan):
+        part["index"] = idx
+    return plan
+
+
+def _queue_put(q, item, stop):
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _fetch_partition(
+    engine, part, columns, chunk_size, out, stop, min_ritdatum, last_date, last_ritnummer, plan
+):
+    """Fetch one date partition in keyset windows on its own pooled connection."""
+    started = time.perf_counter()
+    try:
+        with engine.connect() as remote:
+            for keys, rows in _iter_windows(
+                remote,
+                columns,
+                chunk_size,
+                min_ritdatum=min_ritdatum,
+                last_date=last_date,
+                last_ritnummer=last_ritnummer,
+                date_from=part["start"].isoformat() if part["start"] else None,
+                date_to=part["end"].isoformat() if part["end"] else None,
+                stop=stop,
+                plan=plan,
+            ):
+                if not _queue_put(out, ("rows", part["index"], keys, rows), stop):
+                    return
+        _queue_put(out, ("done", part["index"], time.perf_counter() - started), stop)
+    except Exception as exc:  # handed to the writer, which re-raises
+        _queue_put(out, ("error", part["index"], exc), stop)
+
+
+def _queue_get(q, stop):
+    while not stop.is_set():
+        try:
+            return q.get(timeout=0.5)
+        except queue.Empty:
+            continue
+    return None
+
+
+def _new_stage_clock():
+    return {"busy": 0.0, "wait_input": 0.0, "wait_output": 0.0}
+
+
+def _pipeline_fetch(engine, plan, start, chunk_size, min_ritdatum, out, stop, clock):
+    """Pipeline stage 1: keyset windows from the remote, handed on as raw rows."""
+    try:
+        with engine.connect() as remote:
+            windows = _iter_windows(
+                remote,
+                plan.columns,
+                chunk_size,
+                min_ritdatum=min_ritdatum,
+                last_date=start[0],
+                last_ritnummer=start[1],
+                stop=stop,
+                plan=plan,
+            )
+            while True:
+                started = time.perf_counter()
+                window = next(windows, None)
+                clock["busy"] += time.perf_counter() - started
+                if window is None:
+                    break
+                started = time.perf_counter()
+                handed_on = _queue_put(out, ("rows", window[1]), stop)
+                clock["wait_output"] += time.perf_counter() - started
+                if not handed_on:
+                    return
+        _queue_put(out, ("done",), stop)
+    except Exception as exc:  # handed downstream, the writer re-raises
+        _queue_put(out, ("error", exc), stop)
+
+
+def _pipeline_convert(writer, inbox, out, stop, clock):
+    """
+    Pipeline stage 2: rows -> (params, size, seconds) from writer.prepare plus the checkpoint
+    key they reach. The writer thread does the accounting, in the batch that writes them.
+    """
+    try:
+        while True:
+            started = time.perf_counter()
+            item = _queue_get(inbox, stop)
+            clock["wait_input"] += time.perf_counter() - started
+            if item is None:
+                return
+            if item[0] == "rows":
+                started = time.perf_counter()
+                rows = item[1]
+                item = ("params", writer.prepare(rows), _row_key(rows[-1]._mapping))
+                clock["busy"] += time.perf_counter() - started
+            started = time.perf_counter()
+            handed_on = _queue_put(out, item, stop)
+            clock["wait_output"] += time.perf_counter() - started
+            if not handed_on or item[0] != "params":
+                return
+    except Exception as exc:
+        _queue_put(out, ("error", exc), stop)
+
+
+def _sync_pipelined(writer, engine, plan, start, chunk_size, min_ritdatum):
+    """
+    Fetch, convert and write concurrently: a fetcher thread and a converter thread feed this
+    (the only SQLite) thread through bounded queues, so memory stays at a few chunks however
+    large the range is. Returns the busy/stall seconds per stage.
+    """
+    clocks = {name: _new_stage_clock() for name in ("fetch", "convert", "write")}
+    fetched = queue.Queue(maxsize=PIPELINE_DEPTH)
+    converted = queue.Queue(maxsize=PIPELINE_DEPTH)
+    stop = threading.Event()
+    stages = [
+        threading.Thread(
+            target=_pipeline_fetch,
+            args=(engine, plan, start, chunk_size, min_ritdatum, fetched, stop, clocks["fetch"]),
+            name="rgritten-fetch",
+            daemon=True,
+        ),
+        threading.Thread(
+            target=_pipeline_convert,
+            args=(writer, fetched, converted, stop, clocks["convert"]),
+            name="rgritten-convert",
+            daemon=True,
+        ),
+    ]
+    key = start
+    clock = clocks["write"]
+    try:
+        for stage in stages:
+            stage.start()
+        while True:
+            started = time.perf_counter()
+            item = converted.get()
+            clock["wait_input"] += time.perf_counter() - started
+            writer.add_time("fetch", time.perf_counter() - started)
+            if item[0] == "error":
+                raise item[1]
+            if item[0] == "done":
+                break
+            started = time.perf_counter()
+            params, size, seconds = item[1]
+            writer.account(size, seconds)
+            writer.write(params)
+            key = item[2]
+            writer.commit(key)
+            clock["busy"] += time.perf_counter() - started
+        started = time.perf_counter()
+        writer.commit(key, force=True)
+        clock["busy"] += time.perf_counter() - started
+    finally:
+        stop.set()
+        for stage in stages:
+            stage.join()
+    stages = {}
+    for name, stage_clock in clocks.items():
+        stages[name] = {k: round(v, 3) for k, v in stage_clock.items()}
+    return stages
+
+
+def _load_checkpoint(profile, dataset="rgritten"):
+    checkpoint = db.session.query(SyncCheckpoint).filter_by(dataset=dataset).first()
+    if checkpoint:
+        return checkpoint
+    # First run with checkpoints: seed once from the newest row already stored.
+    last_row = (
+        db.session.query(RGRit.ritdatum, RGRit.ritnummer)
+        .order_by(RGRit.ritdatum.desc(), RGRit.ritnummer.desc())
+        .first()
+    )
+    checkpoint = SyncCheckpoint(
+        dataset=dataset,
+        profile_id=profile.id,
+        last_ritdatum=last_row.ritdatum.date().isoformat() if last_row and last_row.ritdatum else None,
+        last_ritnummer=last_row.ritnummer if last_row and last_row.ritnummer else 0,
+        status="ok",
+    )
+    db.session.add(checkpoint)
+    db.session.commit()
+    return checkpoint
+
+
+def _discard_beyond(checkpoint):
+    """
+    Delete local rows past the committed checkpoint. Only partitioned runs can leave such
+    rows behind (later partitions commit ahead of the checkpoint); they are re-fetched.
+    Frozen months are not synced, so their rows stay.
+    """
+    query = outside_frozen(db.session.query(RGRit))
+    if checkpoint.last_ritdatum:
+        day = date.fromisoformat(checkpoint.last_ritdatum)
+        day_start = datetime.combine(day, datetime.min.time())
+        next_day = day_start + timedelta(days=1)
+        query = query.filter(
+            sa.or_(
+                RGRit.ritdatum >= next_day,
+                sa.and_(
+                    RGRit.ritdatum >= day_start,
+                    RGRit.ritdatum < next_day,
+                    RGRit.ritnummer > (checkpoint.last_ritnummer or 0),
+                ),
+            )
+        )
+    removed = query.delete(synchronize_session=False)
+    db.session.commit()
+    return removed
+
+
+def _set_checkpoint(checkpoint, key, lease=None):
+    # A run started under a scheduler lease only commits while it still holds that lease.
+    if lease is not None:
+        extend_lease(lease)
+    # Re-synced trailing windows lie behind the checkpoint; it only ever moves forward.
+    if key[0] is None:
+        return
+    if checkpoint.last_ritdatum is None or key > (
+        checkpoint.last_ritdatum,
+        checkpoint.last_ritnummer or 0,
+    ):
+        checkpoint.last_ritdatum, checkpoint.last_ritnummer = key
+
+
+def _resync_start(checkpoint, days):
+    """Cursor key just before the first of the last `days` synced days."""
+    if not days or not checkpoint.last_ritdatum:
+        return checkpoint.last_ritdatum, checkpoint.last_ritnummer or 0
+    first_day = date.fromisoformat(checkpoint.last_ritdatum) - timedelta(days=days)
+    # (day before, largest bigint) puts every row of first_day after the cursor.
+    return (first_day - timedelta(days=1)).isoformat(), 2**63 - 1
+
+
+def _sync_partitioned(writer, engine, plan, start, chunk_size, min_ritdatum, workers):
+    last_date, last_ritnummer = start
+    params = {
+        "last_ritnummer": last_ritnummer,
+        "last_date": last_date,
+        "min_ritdatum": min_ritdatum,
+    }
+    with engine.connect() as remote:
+        day_counts = [
+            (_as_date(r.dag), r.n)
+            for r in remote.execute(
+                sa.text(_build_day_counts(min_ritdatum, last_date, plan=plan)), params
+            )
+            if r.dag is not None
+        ]
+    parts = _plan_partitions(day_counts, workers * 4)
+
+    done = set()
+    part_stats = {p["index"]: {"rows": 0, "seconds": None, "last_key": None} for p in parts}
+
+    def contiguous_key():
+        # The checkpoint may only move up to the first partition that is not finished yet.
+        key = (last_date, last_ritnummer)
+        for part in parts:
+            part_key = part_stats[part["index"]]["last_key"]
+            if part_key is not None:
+                key = part_key
+            if part["index"] not in done:
+                break
+        return key
+
+    stop = threading.Event()
+    out = queue.Queue(maxsize=workers * 2)
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rgritten-fetch")
+    try:
+        for part in parts:
+            pool.submit(
+                _fetch_partition,
+                engine,
+                part,
+                plan.columns,
+                chunk_size,
+                out,
+                stop,
+                min_ritdatum,
+                last_date,
+                last_ritnummer,
+                plan,
+            )
+        # Single SQLite writer: all fetchers hand their chunks to this thread.
+        while len(done) < len(parts):
+            started = time.perf_counter()
+            kind, idx, *rest = out.get()
+            writer.add_time("fetch", time.perf_counter() - started)
+            if kind == "error":
+                raise rest[0]
+            if kind == "done":
+                done.add(idx)
+                part_stats[idx]["seconds"] = rest[0]
+            else:
+                keys, rows = rest
+                writer.insert(rows)
+                part_stats[idx]["rows"] += len(rows)
+                part_stats[idx]["last_key"] = _row_key(rows[-1]._mapping)
+            writer.commit(contiguous_key())
+        writer.commit(contiguous_key(), force=True)
+    finally:
+        stop.set()
+        pool.shutdown(wait=True)
+
+    partitions = []
+    for part in parts:
+        stats = part_stats[part["index"]]
+        seconds = stats["seconds"] or 0.0
+        partitions.append(
+            {
+                "start": part["start"].isoformat() if part["start"] else last_date,
+                "end": part["end"].isoformat() if part["end"] else None,
+                "rows": stats["rows"],
+                "seconds": round(seconds, 3),
+                "rows_per_s": round(stats["rows"] / seconds, 1) if seconds else None,
+            }
+        )
+    return partitions
+
+
+def _sync_windows(writer, engine, plan, start, chunk_size, min_ritdatum):
+    key = start
+    with engine.connect() as remote:
+        windows = _iter_windows(
+            remote,
+            plan.columns,
+            chunk_size,
+            min_ritdatum=min_ritdatum,
+            last_date=start[0],
+            last_ritnummer=start[1],
+            plan=plan,
+        )
+        while True:
+            started = time.perf_counter()
+            window = next(windows, None)
+            writer.add_time("fetch", time.perf_counter() - started)
+            if window is None:
+                break
+            keys, rows = window
+            writer.insert(rows)
+            key = _row_key(rows[-1]._mapping)
+            writer.commit(key)
+    writer.commit(key, force=True)
+
+
+def _finish_run(run, writer, checkpoint, status, error=None):
+    """Fill in the run's totals and store its remaining batches; the caller commits."""
+    run.status = status
+    run.finished_at = datetime.utcnow()
+    run.seconds = round((run.finished_at - run.started_at).total_seconds(), 3)
+    run.error = error[:2000] if error else None
+    run.through_ritdatum = checkpoint.last_ritdatum
+    run.through_ritnummer = checkpoint.last_ritnummer
+    if writer is not None:
+        writer.flush_chunks()
+        run.rows = sum(writer.counts.values())
+        run.inserted = writer.counts["inserted"]
+        run.updated = writer.counts["updated"]
+        run.unchanged = writer.counts["unchanged"]
+        run.bytes = writer.bytes
+        for stage in RUN_STAGES:
+            setattr(run, f"{stage}_seconds", round(writer.timings[stage], 3))
+    # Per-batch metrics of older runs are dropped; their run totals stay.
+    oldest = (
+        db.session.query(SyncRun.id)
+        .order_by(SyncRun.id.desc())
+        .offset(RUN_CHUNK_HISTORY - 1)
+        .limit(1)
+        .scalar()
+    )
+    if oldest is not None:
+        db.session.query(SyncRunChunk).filter(SyncRunChunk.run_id < oldest).delete(
+            synchronize_session=False
+        )
+
+
 def sync_rgritten(
     profile_name: str = "Historie",
     chunk_size: int = 1000,
     min_ritdatum: str | None = None,
+    workers: int = 1,
+    commit_every: int | None = None,
+    pipeline: bool = False,
+    mode: str = "append",
+    resync_days: int = 0,
+    bulk: str = "auto",
+    progress=None,
+    lease=None,
 ):
     """
-    Append-only sync from SQL Server view rpt.RGRitten into local table rgritten.
-    Uses ritnummer as the incremental cursor.
+    Sync from SQL Server view rpt.RGRitten into local table rgritten.
+    Progress is tracked in sync_checkpoints, committed together with the rows every
+    `commit_every` rows (default: every chunk), so an interrupted run resumes at the last
+    committed (ritdatum, ritnummer). With workers > 1 the pending range is split into date
+    partitions that are fetched concurrently; with pipeline=True a single stream is fetched,
+    converted and written in overlapping stages.
+
+    mode="append" skips rows whose (ritdatum, ritnummer) is already stored; mode="upsert"
+    rewrites them when their row_hash changed. resync_days re-fetches that many days before
+    the checkpoint, so corrections at the source are picked up. Frozen months
+    (rgritten_partitions) are skipped, like in backfill and reconcile: their rows are
+    neither fetched nor rewritten.
+
+    bulk="on" drops the secondary indexes for the load, commits every BULK_COMMIT_EVERY rows
+    and rebuilds the indexes (plus ANALYZE) at the end; "auto" does so for large pending
+    volumes, "off" never.
+
+    progress(rows, (ritdatum, ritnummer), pending) is called after every commit, with the
+    estimated number of pending rows; it may raise SyncCancelled to stop the run there.
+
+    lease is the scheduler's current_lease() token when the scheduler runs the sync. Every
+    commit renews it, and raises LeaseLost once another process has taken it over. The
+    run then stops and leaves the checkpoint to the new holder.
+
+    Every run is recorded in sync_runs, with its time split over RUN_STAGES; per committed
+    batch in sync_run_chunks. In partitioned and pipelined runs "fetch" is the time the
+    writer waited for the fetch threads.
     """
     if chunk_size < 1:
         raise ValueError("chunk_size must be positive")
+    commit_every = commit_every or chunk_size
+    if commit_every < 1:
+        raise ValueError("commit_every must be positive")
+    if workers < 1:
+        raise ValueError("workers must be positive")
+    if pipeline and workers > 1:
+        raise ValueError("pipeline applies to a single stream; use workers=1")
+    if mode not in SYNC_MODES:
+        raise ValueError(f"mode must be one of {', '.join(SYNC_MODES)}")
+    if resync_days < 0:
+        raise ValueError("resync_days cannot be negative")
+    if bulk not in BULK_MODES:
+        raise ValueError(f"bulk must be one of {', '.join(BULK_MODES)}")
 
     profile = (
         db.session.query(ConnectionProfile)
@@ -375,87 +1653,403 @@ def sync_rgritten(
     if not profile:
         raise ValueError(f"ConnectionProfile '{profile_name}' not found")
 
-    last_row = (
-        db.session.query(RGRit.ritdatum, RGRit.ritnummer)
-        .order_by(RGRit.ritdatum.desc(), RGRit.ritnummer.desc())
-        .first()
+    checkpoint = _load_checkpoint(profile)
+    discarded = _discard_beyond(checkpoint) if checkpoint.status != "ok" else 0
+    start = _resync_start(checkpoint, resync_days)
+    checkpoint.profile_id = profile.id
+    checkpoint.status = "running"
+    run = SyncRun(
+        profile_name=profile_name,
+        mode=mode,
+        workers=workers,
+        pipeline=pipeline,
+        status="running",
+        started_at=datetime.utcnow(),
+        from_ritdatum=start[0],
+        from_ritnummer=start[1],
     )
-    last_date = last_row.ritdatum.date().isoformat() if last_row and last_row.ritdatum else None
-    last_ritnummer = last_row.ritnummer if last_row and last_row.ritnummer else 0
-
-    select_sql = _build_select(
-        ALL_COLUMNS,
-        min_ritdatum=min_ritdatum,
-        last_date=last_date,
-        last_ritnummer=last_ritnummer,
-        limit=None,
-    )
-
-    engine = sa.create_engine(profile.build_uri())
-    stmt = sa.text(select_sql)
-
-    inserted = 0
-    max_ritnummer = last_ritnummer
-    max_date = last_date
+    db.session.add(run)
+    db.session.commit()
 
+    partitions = stages = None
+    bulk_load = False
+    indexes = None
+    writer = None
+    engine, numbers_converted = get_engine(profile, pool_size=workers)
     try:
+        pending = None
         with engine.connect() as remote:
-            result = (
-                remote.execution_options(stream_results=True).execute(
-                    stmt,
+            plan = _load_source_plan(remote, profile)
+            plan.skip_months = sorted(frozen_months())
+            if bulk == "auto" or progress is not None:
+                pending = remote.execute(
+                    sa.text(_build_pending_count(min_ritdatum, start[0], plan)),
                     {
-                        "last_ritnummer": last_ritnummer,
-                        "last_date": last_date,
                         "min_ritdatum": min_ritdatum,
+                        "last_date": start[0],
+                        "last_ritnummer": start[1],
                     },
+                ).scalar()
+        bulk_load = _use_bulk(bulk, pending)
+        if bulk_load:
+            _drop_secondary_indexes()
+            commit_every = max(commit_every, BULK_COMMIT_EVERY)
+        else:
+            # Repairs indexes left dropped by an interrupted bulk load.
+            indexes = _ensure_indexes()
+        writer = _ChunkWriter(
+            plan.columns,
+            checkpoint,
+            commit_every,
+            numbers_converted=numbers_converted,
+            upsert=mode == "upsert",
+        )
+        writer.run_id = run.id
+        writer.lease = lease
+        if progress is not None:
+            writer.progress = lambda rows, key: progress(rows, key, pending)
+        args = (writer, engine, plan, start, chunk_size, min_ritdatum)
+        if workers > 1:
+            partitions = _sync_partitioned(*args, workers)
+        elif pipeline:
+            stages = _sync_pipelined(*args)
+        else:
+            _sync_windows(*args)
+    except BaseException as exc:
+        db.session.rollback()
+        fenced = isinstance(exc, LeaseLost)
+        if not fenced:
+            checkpoint.status = "failed"
+        run.bulk = bulk_load
+        _finish_run(
+            run,
+            writer,
+            checkpoint,
+            "cancelled" if isinstance(exc, SyncCancelled) else "failed",
+            error=f"{type(exc).__name__}: {exc}",
+        )
+        db.session.commit()
+        # Past the checkpoint the new lease holder may be writing already.
+        if workers > 1 and not fenced:
+            _discard_beyond(checkpoint)
+        raise
+    finally:
+        if bulk_load:
+            indexes = _ensure_indexes()
+
+    checkpoint.status = "ok"
+    run.bulk = bulk_load
+    run.index_seconds = indexes["seconds"]
+    _finish_run(run, writer, checkpoint, "ok")
+    db.session.commit()
+
+    stats = {
+        "profile": profile_name,
+        "mode": mode,
+        "columns": len(plan.hashed),
+        "bulk": bulk_load,
+        "indexes_rebuilt": indexes["created"],
+        "index_seconds": indexes["seconds"],
+        **writer.counts,
+        "quarantined": writer.quarantined,
+        "discarded": discarded,
+        "frozen_months": list(plan.skip_months),
+        "from_ritdatum": start[0],
+        "from_ritnummer": start[1],
+        "through_ritdatum": checkpoint.last_ritdatum,
+        "through_ritnummer": checkpoint.last_ritnummer,
+        "run_id": run.id,
+        "seconds": run.seconds,
+        "bytes": run.bytes,
+        "timings": {stage: round(writer.timings[stage], 3) for stage in RUN_STAGES},
+    }
+    if partitions is not None:
+        stats["workers"] = workers
+        stats["partitions"] = partitions
+    if stages is not None:
+        stats["stages"] = stages
+        stats["bottleneck"] = max(stages, key=lambda name: stages[name]["busy"])
+    return stats
+
+
+def _local_day_counts(date_from, date_to):
+    day = sa.func.date(RGRit.ritdatum)
+    rows = (
+        db.session.query(day, sa.func.count())
+        .filter(
+            RGRit.ritdatum >= datetime.combine(date_from, datetime.min.time()),
+            RGRit.ritdatum < datetime.combine(date_to, datetime.min.time()),
+        )
+        .group_by(day)
+    )
+    return {_as_date(d): n for d, n in rows}
+
+
+def _gap_ranges(remote_counts, local_counts, pieces=1):
+    """
+    Group days where local has fewer rows than the remote into [start, end) ranges of
+    consecutive days; long ranges are cut so the work splits into about `pieces` parts.
+    """
+    gaps = [
+        (day, n - local_counts.get(day, 0))
+        for day, n in sorted(remote_counts.items())
+        if local_counts.get(day, 0) < n
+    ]
+    target = max(1, sum(missing for _, missing in gaps) // max(1, pieces))
+    ranges = []
+    for day, missing in gaps:
+        last = ranges[-1] if ranges else None
+        if last and last["end"] == day and last["missing"] + missing <= target:
+            last["end"] = day + timedelta(days=1)
+            last["days"] += 1
+            last["missing"] += missing
+        else:
+            ranges.append(
+                {"start": day, "end": day + timedelta(days=1), "days": 1, "missing": missing}
+            )
+    for idx, part in enumerate(ranges):
+        part["index"] = idx
+    return ranges
+
+
+def backfill_rgritten(
+    date_from: str,
+    date_to: str,
+    profile_name: str = "Historie",
+    chunk_size: int = 1000,
+    workers: int = 4,
+    mode: str = "append",
+    bulk: str = "auto",
+):
+    """
+    Patch holes in rgritten between date_from and date_to (inclusive, YYYY-MM-DD), apart
+    from the forward cursor: per-day row counts of the remote view and the local table are
+    compared and only missing or short days are fetched, contiguous days as one range and
+    the ranges in parallel. Present rows are kept (append) or refreshed (upsert) through the
+    unique key; the sync checkpoint is not touched and days of frozen months are skipped.
+    `bulk` works as in sync_rgritten, with the rows missing locally as the pending volume.
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be positive")
+    if workers < 1:
+        raise ValueError("workers must be positive")
+    if mode not in SYNC_MODES:
+        raise ValueError(f"mode must be one of {', '.join(SYNC_MODES)}")
+    if bulk not in BULK_MODES:
+        raise ValueError(f"bulk must be one of {', '.join(BULK_MODES)}")
+    first_day = date.fromisoformat(date_from)
+    end_day = date.fromisoformat(date_to) + timedelta(days=1)
+    if end_day <= first_day:
+        raise ValueError("date_to must not be before date_from")
+
+    profile = (
+        db.session.query(ConnectionProfile)
+        .filter(ConnectionProfile.name == profile_name)
+        .first()
+    )
+    if not profile:
+        raise ValueError(f"ConnectionProfile '{profile_name}' not found")
+
+    engine, numbers_converted = get_engine(profile, pool_size=workers)
+    stop = threading.Event()
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rgritten-backfill")
+    bulk_load = False
+    indexes = None
+    try:
+        with engine.connect() as remote:
+            plan = _load_source_plan(remote, profile)
+            writer = _ChunkWriter(
+                plan.columns,
+                None,
+                chunk_size,
+                numbers_converted=numbers_converted,
+                upsert=mode == "upsert",
+            )
+            remote_counts = {
+                _as_date(r.dag): r.n
+                for r in remote.execute(
+                    sa.text(_build_day_counts(date_from=True, date_to=True, plan=plan)),
+                    {"date_from": first_day.isoformat(), "date_to": end_day.isoformat()},
                 )
+                if r.dag is not None
+            }
+        local_counts = _local_day_counts(first_day, end_day)
+        frozen = frozen_months()
+        frozen_days = {d for d in set(remote_counts) | set(local_counts) if f"{d:%Y-%m}" in frozen}
+        for day in frozen_days:
+            remote_counts.pop(day, None)
+            local_counts.pop(day, None)
+        ranges = _gap_ranges(remote_counts, local_counts, pieces=workers * 2)
+        bulk_load = _use_bulk(bulk, sum(part["missing"] for part in ranges))
+        if bulk_load:
+            _drop_secondary_indexes()
+            writer.commit_every = max(chunk_size, BULK_COMMIT_EVERY)
+        else:
+            indexes = _ensure_indexes()
+
+        out = queue.Queue(maxsize=workers * 2)
+        for part in ranges:
+            pool.submit(
+                _fetch_partition,
+                engine,
+                part,
+                plan.columns,
+                chunk_size,
+                out,
+                stop,
+                None,
+                None,
+                0,
+                plan,
             )
-            columns = result.keys()
-            while True:
-                rows = result.fetchmany(chunk_size)
-                if not rows:
-                    break
-                payload = []
-                for row in rows:
-                    mapping = dict(zip(columns, row))
-                    # SQLite driver doesn't accept Decimal directly; cast numerics to float
-                    for key, val in mapping.items():
-                        if isinstance(val, Decimal):
-                            mapping[key] = float(val)
-                    if mapping.get("ritdatum"):
-                        dval = (
-                            mapping["ritdatum"].date().isoformat()
-                            if hasattr(mapping["ritdatum"], "date")
-                            else mapping["ritdatum"]
-                        )
-                        if dval:
-                            max_date = dval if max_date is None else max(max_date, dval)
-                    if mapping.get("ritnummer") is not None:
-                        max_ritnummer = max(max_ritnummer, mapping["ritnummer"])
-                    payload.append(mapping)
-                if payload:
-                    db.session.bulk_insert_mappings(RGRit, payload)
-                    db.session.commit()
-                    inserted += len(payload)
-    except SQLAlchemyError:
+        done = {}
+        fetched = {part["index"]: 0 for part in ranges}
+        while len(done) < len(ranges):
+            kind, idx, *rest = out.get()
+            if kind == "error":
+                raise rest[0]
+            if kind == "done":
+                done[idx] = rest[0]
+                continue
+            rows = rest[1]
+            writer.insert(rows)
+            fetched[idx] += len(rows)
+            writer.commit(None)
+        writer.commit(None, force=True)
+    except BaseException:
         db.session.rollback()
         raise
+    finally:
+        stop.set()
+        pool.shutdown(wait=True)
+        if bulk_load:
+            indexes = _ensure_indexes()
 
     return {
         "profile": profile_name,
-        "inserted": inserted,
-        "from_ritdatum": last_date,
-        "from_ritnummer": last_ritnummer,
-        "through_ritdatum": max_date,
-        "through_ritnummer": max_ritnummer,
+        "mode": mode,
+        "from": first_day.isoformat(),
+        "to": (end_day - timedelta(days=1)).isoformat(),
+        "days_checked": len(remote_counts),
+        "frozen_days": len(frozen_days),
+        "bulk": bulk_load,
+        "indexes_rebuilt": indexes["created"],
+        "gap_days": sum(part["days"] for part in ranges),
+        "local_surplus_days": sum(
+            1 for day, n in local_counts.items() if n > remote_counts.get(day, 0)
+        ),
+        **writer.counts,
+        "quarantined": writer.quarantined,
+        "ranges": [
+            {
+                "start": part["start"].isoformat(),
+                "end": (part["end"] - timedelta(days=1)).isoformat(),
+                "missing": part["missing"],
+                "fetched": fetched[part["index"]],
+                "seconds": round(done.get(part["index"], 0.0), 3),
+            }
+            for part in ranges
+        ],
     }
 
 
-def locate_offending_columns(profile_name: str = "Historie", block_size: int = 8):
+def _remote_level_expr(level, plan):
+    if level == "month":
+        return f"CONVERT(char(7), {plan.date_expr}, 126)"
+    if level == "day":
+        return f"CONVERT(char(10), {plan.date_expr}, 126)"
+    return f"{plan.rit_expr} % {RECONCILE_BUCKETS}"
+
+
+def _local_level_expr(level):
+    if level == "month":
+        return sa.func.strftime("%Y-%m", RGRit.ritdatum)
+    if level == "day":
+        return sa.func.date(RGRit.ritdatum)
+    return RGRit.ritnummer % RECONCILE_BUCKETS
+
+
+def _build_checksums(level, in_bucket=False, plan=None):
+    """Per-node row count and sum of the upper 32 hash bits; a sum that cannot overflow."""
+    plan = plan or _SourcePlan()
+    node = _remote_level_expr(level, plan)
+    filters = _build_filters(date_from=True, date_to=True, plan=plan)
+    if in_bucket:
+        filters.append(f"{_remote_level_expr('bucket', plan)} = :bucket")
+    return (
+        f"SELECT {node} AS [node], COUNT(*) AS [n], "
+        f"SUM(CAST({_row_hash_expr(plan.hashed, size=4)} AS bigint)) AS [h]\n"
+        "FROM rpt.RGRitten\n"
+        "WHERE " + " AND ".join(filters) + "\n"
+        f"GROUP BY {node}" + plan.options
+    )
+
+
+def _build_bucket_keys(plan=None):
+    plan = plan or _SourcePlan()
+    filters = _build_filters(date_from=True, date_to=True, plan=plan)
+    filters.append(f"{_remote_level_expr('bucket', plan)} = :bucket")
+    return (
+        f"SELECT {plan.rit_expr} AS [ritnummer], {_row_hash_expr(plan.hashed)} AS [row_hash]\n"
+        "FROM rpt.RGRitten\n"
+        "WHERE " + " AND ".join(filters) + plan.options
+    )
+
+
+def _local_range(query, date_from, date_to):
+    return query.filter(
+        RGRit.ritdatum >= datetime.combine(date_from, datetime.min.time()),
+        RGRit.ritdatum < datetime.combine(date_to, datetime.min.time()),
+    )
+
+
+def _local_checksums(level, date_from, date_to, bucket=None):
+    node = _local_level_expr(level)
+    # Rows stored before row_hash existed are left out of the count, so their node mismatches.
+    hash_sum = sa.func.sum(RGRit.row_hash.op(">>")(32))
+    query = _local_range(
+        db.session.query(node, sa.func.count(RGRit.row_hash), hash_sum), date_from, date_to
+    )
+    if bucket is not None:
+        query = query.filter(_local_level_expr("bucket") == bucket)
+    return {key: (n, h or 0) for key, n, h in query.group_by(node)}
+
+
+def _mismatched(remote, local):
+    keys = set(remote) | set(local)
+    return sorted(k for k in keys if remote.get(k, (0, 0)) != local.get(k, (0, 0)))
+
+
+def _next_month(day):
+    return (day.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+def reconcile_rgritten(
+    date_from: str,
+    date_to: str,
+    profile_name: str = "Historie",
+    chunk_size: int = 1000,
+    dry_run: bool = False,
+    lease=None,
+):
     """
-    Quickly find columns that cause 'varchar to float' errors by probing in coarse blocks,
-    then drilling down only inside failing blocks. Returns a list of offending columns.
+    Compare rpt.RGRitten with local rgritten between date_from and date_to (inclusive) via
+    a checksum tree: month, then day, then ritnummer bucket, then single keys. Only nodes
+    whose (count, hash sum) differ are expanded, so a consistent range costs one small query.
+    Differing keys are re-fetched; local rows that are gone or changed at the source are
+    deleted first. With dry_run nothing is written. The sync checkpoint is not touched;
+    differing frozen months (rgritten_partitions) are reported, not repaired.
+
+    lease is the scheduler's current_lease() token, as in sync_rgritten: every repair commit
+    renews it and raises LeaseLost once another process holds it.
     """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be positive")
+    first_day = date.fromisoformat(date_from)
+    end_day = date.fromisoformat(date_to) + timedelta(days=1)
+    if end_day <= first_day:
+        raise ValueError("date_to must not be before date_from")
+
     profile = (
         db.session.query(ConnectionProfile)
         .filter(ConnectionProfile.name == profile_name)
@@ -464,49 +2058,263 @@ def locate_offending_columns(profile_name: str = "Historie", block_size: int = 8
     if not profile:
         raise ValueError(f"ConnectionProfile '{profile_name}' not found")
 
-    engine = sa.create_engine(profile.build_uri())
+    nodes = {"month": 0, "day": 0, "bucket": 0, "key": 0}
+    refetch = {}  # day -> ritnummers to fetch again
+    delete_ids = []
+    diff_days = set()
+    counts = {"missing": 0, "changed": 0, "extra": 0}
+    engine, numbers_converted = get_engine(profile)
+    try:
+        with engine.connect() as remote:
+            plan = _load_source_plan(remote, profile)
+
+            def remote_checksums(level, lo, hi, bucket=None):
+                params = {
+                    "date_from": lo.isoformat(),
+                    "date_to": hi.isoformat(),
+                    "bucket": bucket,
+                }
+                sql = _build_checksums(level, in_bucket=bucket is not None, plan=plan)
+                result = {r.node: (r.n, r.h or 0) for r in remote.execute(sa.text(sql), params)}
+                nodes[level] += len(result)
+                return result
+
+            months = _mismatched(
+                remote_checksums("month", first_day, end_day),
+                _local_checksums("month", first_day, end_day),
+            )
+            frozen = sorted(frozen_months().intersection(months))
+            months = [month for month in months if month not in frozen]
+            for month in months:
+                lo = max(first_day, date.fromisoformat(f"{month}-01"))
+                hi = min(end_day, _next_month(lo))
+                days = _mismatched(
+                    remote_checksums("day", lo, hi), _local_checksums("day", lo, hi)
+                )
+                for day_key in days:
+                    day = date.fromisoformat(str(day_key))
+                    next_day = day + timedelta(days=1)
+                    buckets = _mismatched(
+                        remote_checksums("bucket", day, next_day),
+                        _local_checksums("bucket", day, next_day),
+                    )
+                    for bucket in buckets:
+                        remote_keys = {
+                            r.ritnummer: r.row_hash
+                            for r in remote.execute(
+                                sa.text(_build_bucket_keys(plan)),
+                                {
+                                    "date_from": day.isoformat(),
+                                    "date_to": next_day.isoformat(),
+                                    "bucket": bucket,
+                                },
+                            )
+                        }
+                        nodes["key"] += len(remote_keys)
+                        local_keys = {}
+                        local_rows = _local_range(
+                            db.session.query(RGRit.id, RGRit.ritnummer, RGRit.row_hash),
+                            day,
+                            next_day,
+                        ).filter(_local_level_expr("bucket") == bucket)
+                        for row_id, ritnummer, row_hash in local_rows:
+                            local_keys.setdefault(ritnummer, []).append((row_id, row_hash))
+                        for ritnummer, row_hash in remote_keys.items():
+                            stored = local_keys.get(ritnummer)
+                            if not stored:
+                                counts["missing"] += 1
+                            elif len(stored) > 1 or stored[0][1] != row_hash:
+                                # Also covers a changed ritdatum time: replace, don't add.
+                                counts["changed"] += 1
+                                delete_ids.extend(row_id for row_id, _ in stored)
+                            else:
+                                continue
+                            refetch.setdefault(day, []).append(ritnummer)
+                        for ritnummer, stored in local_keys.items():
+                            if ritnummer not in remote_keys:
+                                counts["extra"] += 1
+                                delete_ids.extend(row_id for row_id, _ in stored)
+                                diff_days.add(day)
+
+            fetched = 0
+            if not dry_run:
+                for start in range(0, len(delete_ids), 500):
+                    db.session.query(RGRit).filter(
+                        RGRit.id.in_(delete_ids[start : start + 500])
+                    ).delete(synchronize_session=False)
+                writer = _ChunkWriter(plan.columns, None, chunk_size, numbers_converted)
+                writer.lease = lease
+                select = sa.text(
+                    _build_select(
+                        plan.columns,
+                        date_from=True,
+                        date_to=True,
+                        extra_filters=[f"{plan.rit_expr} IN :keys"],
+                        plan=plan,
+                    )
+                ).bindparams(sa.bindparam("keys", expanding=True))
+                for day, keys in sorted(refetch.items()):
+                    for start in range(0, len(keys), chunk_size):
+                        rows = remote.execute(
+                            select,
+                            {
+                                "date_from": day.isoformat(),
+                                "date_to": (day + timedelta(days=1)).isoformat(),
+                                "keys": keys[start : start + chunk_size],
+                            },
+                        ).fetchall()
+                        writer.insert(rows)
+                        fetched += len(rows)
+                        writer.commit(None)
+                writer.commit(None, force=True)
+    except BaseException:
+        db.session.rollback()
+        raise
+
+    return {
+        "profile": profile_name,
+        "from": first_day.isoformat(),
+        "to": (end_day - timedelta(days=1)).isoformat(),
+        "dry_run": dry_run,
+        "nodes": nodes,
+        **counts,
+        "deleted": 0 if dry_run else len(delete_ids),
+        "fetched": fetched,
+        "days": sorted(day.isoformat() for day in diff_days | set(refetch)),
+        "frozen_months": frozen,
+    }
+
 
-    def probe(cols, top_only=True):
-        sql = _build_select(cols, limit=1 if top_only else 10)
+def locate_offending_columns(profile_name: str = "Historie", workers: int = 4):
+    """
+    Find columns that cause conversion errors ('varchar to float') by bisection: a failing
+    column set is split in halves that are probed concurrently on `workers` pooled
+    connections, until single columns remain. A healthy view costs one probe; k bad columns
+    about 2*k*log2(n). The probes select the columns the way sync_rgritten does: those of
+    the column profile, converted only where the declared type differs (_load_source_plan).
+    Returns {"offending": [{column, error, seconds}], "probes": [...], "seconds": wall
+    time}. Connection errors are raised instead of blamed on columns.
+    """
+    if workers < 1:
+        raise ValueError("workers must be positive")
+    profile = (
+        db.session.query(ConnectionProfile)
+        .filter(ConnectionProfile.name == profile_name)
+        .first()
+    )
+    if not profile:
+        raise ValueError(f"ConnectionProfile '{profile_name}' not found")
+
+    engine, _ = get_engine(profile, pool_size=workers)
+    with engine.connect() as remote:
+        plan = _load_source_plan(remote, profile)
+
+    def probe(cols, depth):
+        started = time.perf_counter()
+        error = None
         try:
             with engine.connect() as remote:
-                remote.execute(sa.text(sql)).fetchmany(1)
-            return True
-        except SQLAlchemyError:
-            return False
+                remote.execute(sa.text(_build_select(cols, limit=1, plan=plan))).fetchmany(1)
+        except (sa.exc.OperationalError, sa.exc.InterfaceError):
+            raise
+        except SQLAlchemyError as exc:
+            error = str(getattr(exc, "orig", exc))[:300]
+        return {
+            "columns": cols,
+            "depth": depth,
+            "ok": error is None,
+            "error": error,
+            "seconds": round(time.perf_counter() - started, 3),
+        }
 
-    bad = []
+    started = time.perf_counter()
+    probes = []
+    offending = []
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rgritten-locate") as pool:
+        pending = {pool.submit(probe, list(plan.hashed), 0)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                cols = result["columns"]
+                probes.append({**result, "columns": len(cols), "first": cols[0]})
+                if result["ok"]:
+                    continue
+                if len(cols) == 1:
+                    offending.append(
+                        {"column": cols[0], "error": result["error"], "seconds": result["seconds"]}
+                    )
+                    continue
+                mid = len(cols) // 2
+                for half in (cols[:mid], cols[mid:]):
+                    pending.add(pool.submit(probe, half, result["depth"] + 1))
 
-    cols = list(ALL_COLUMNS)
-    # Quick check: if all columns are fine, exit early.
-    if probe(cols):
-        return bad
+    order = {col: i for i, col in enumerate(plan.hashed)}
+    offending.sort(key=lambda item: order[item["column"]])
+    return {
+        "offending": offending,
+        "probes": probes,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
 
-    # Coarse pass: slice into blocks and probe each block.
-    blocks = [cols[i : i + block_size] for i in range(0, len(cols), block_size)]
-    suspect_blocks = []
-    for block in blocks:
-        if not probe(block):
-            suspect_blocks.append(block)
 
-    # Drill down: check each column inside failing blocks.
-    for block in suspect_blocks:
-        for col in block:
-            if not probe([col], top_only=True):
-                bad.append(col)
+def _build_conversion_issues(columns, min_ritdatum=False, ranged=False, plan=None):
+    """
+    One scan for all suspect columns: CROSS APPLY unpivots each row into (column, raw value,
+    lost) and keeps values that are present but do not survive the sync's conversion. Per
+    column the first :top rows by ritnummer are returned, each with the column's total count.
+    """
+    plan = plan or _SourcePlan()
+    rit_expr = plan.rit_expr
+    values = ",\n        ".join(f"(N'{col}', {_lost_value_expr(col, plan)})" for col in columns)
+    filters = [f"{rit_expr} IS NOT NULL", f"{rit_expr} > :cursor"]
+    if min_ritdatum:
+        filters.append(f"{plan.date_expr} >= :min_ritdatum")
+    if ranged:
+        filters += [f"{rit_expr} >= :rit_from", f"{rit_expr} < :rit_to"]
+    filters.append("v.[value] IS NOT NULL")
+    return (
+        "WITH bad AS (\n"
+        f"    SELECT {rit_expr} AS [ritnummer], v.[column], v.[value]\n"
+        "    FROM rpt.RGRitten\n"
+        "    CROSS APPLY (VALUES\n"
+        f"        {values}\n"
+        "    ) AS v([column], [value])\n"
+        "    WHERE " + "\n      AND ".join(filters) + "\n"
+        "), ranked AS (\n"
+        "    SELECT [ritnummer], [column], [value],\n"
+        "           ROW_NUMBER() OVER (PARTITION BY [column] ORDER BY [ritnummer]) AS [rn],\n"
+        "           COUNT(*) OVER (PARTITION BY [column]) AS [n]\n"
+        "    FROM bad\n"
+        ")\n"
+        "SELECT [column], [ritnummer], [value], [n] FROM ranked WHERE [rn] <= :top\n"
+        "ORDER BY [column], [ritnummer]" + plan.options
+    )
 
-    return bad
+
+def _rit_ranges(lo, hi, parts):
+    """Split [lo, hi] into at most `parts` half-open ritnummer ranges of similar width."""
+    if lo is None or hi is None:
+        return []
+    step = max(1, -(-(hi - lo + 1) // parts))
+    return [(start, min(start + step, hi + 1)) for start in range(lo, hi + 1, step)]
 
 
 def find_conversion_issues(
     profile_name: str = "Historie",
     cursor: int = 0,
     min_ritdatum: str | None = None,
+    top: int = 5,
+    workers: int = 1,
 ):
     """
-    Detect rows that fail numeric/date conversion by probing suspect columns with TRY_CONVERT.
-    Returns a list of (column, ritnummer) where data is not convertible.
+    Detect values that the sync's TRY_CONVERT turns into NULL, for all converted columns in
+    one scan of rpt.RGRitten (CROSS APPLY). With workers > 1 the ritnummer range is split
+    over that many connections. Returns per affected column its total count and the first
+    `top` (ritnummer, value) samples.
     """
+    if workers < 1:
+        raise ValueError("workers must be positive")
     profile = (
         db.session.query(ConnectionProfile)
         .filter(ConnectionProfile.name == profile_name)
@@ -515,27 +2323,57 @@ def find_conversion_issues(
     if not profile:
         raise ValueError(f"ConnectionProfile '{profile_name}' not found")
 
-    engine = sa.create_engine(profile.build_uri())
-    problems = []
-    rit_expr = "TRY_CONVERT(bigint, ritnummer)"
+    engine, _ = get_engine(profile, pool_size=workers)
+    params = {"cursor": cursor, "top": top}
+    if min_ritdatum:
+        params["min_ritdatum"] = min_ritdatum
     with engine.connect() as remote:
-        for col in sorted(NUMERIC_COLS.union(DECIMAL_COLS)):
-            sql = sa.text(
-                f"""
-                SELECT TOP 5 ritnummer, {col}
-                FROM rpt.RGRitten
-                WHERE {rit_expr} IS NOT NULL
-                  AND {rit_expr} > :cursor
-                  {"" if not min_ritdatum else "AND TRY_CONVERT(date, ritdatum) >= :min_ritdatum"}
-                  AND {col} IS NOT NULL
-                  AND TRY_CONVERT(float, {col}) IS NULL
-                ORDER BY {rit_expr}
-                """
-            )
-            params = {"cursor": cursor}
+        plan = _load_source_plan(remote, profile)
+        columns = [col for col in ALL_COLUMNS if plan.converts(col)]
+        if not columns:
+            return []
+        ranges = [None]
+        if workers > 1:
+            filters = [f"{plan.rit_expr} IS NOT NULL", f"{plan.rit_expr} > :cursor"]
             if min_ritdatum:
-                params["min_ritdatum"] = min_ritdatum
-            rows = remote.execute(sql, params).fetchall()
-            for row in rows:
-                problems.append({"column": col, "ritnummer": row.ritnummer, "value": row[col]})
-    return problems
+                filters.append(f"{plan.date_expr} >= :min_ritdatum")
+            bounds = remote.execute(
+                sa.text(
+                    f"SELECT MIN({plan.rit_expr}) AS lo, MAX({plan.rit_expr}) AS hi\n"
+                    "FROM rpt.RGRitten\n"
+                    "WHERE " + " AND ".join(filters) + plan.options
+                ),
+                params,
+            ).one()
+            ranges = _rit_ranges(bounds.lo, bounds.hi, workers)
+
+    sql = sa.text(
+        _build_conversion_issues(
+            columns, min_ritdatum=bool(min_ritdatum), ranged=ranges != [None], plan=plan
+        )
+    )
+
+    def scan(rit_range):
+        part = dict(params)
+        if rit_range is not None:
+            part.update(rit_from=rit_range[0], rit_to=rit_range[1])
+        with engine.connect() as remote:
+            return remote.execute(sql, part).fetchall()
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rgritten-diagnose") as pool:
+        results = list(pool.map(scan, ranges))
+
+    issues = {}
+    for rows in results:
+        counted = set()
+        for row in rows:
+            issue = issues.setdefault(row.column, {"column": row.column, "count": 0, "samples": []})
+            if row.column not in counted:
+                # Every row of a part carries the part's total for its column.
+                issue["count"] += row.n
+                counted.add(row.column)
+            issue["samples"].append({"ritnummer": row.ritnummer, "value": row.value})
+    for issue in issues.values():
+        issue["samples"] = sorted(issue["samples"], key=lambda s: s["ritnummer"])[:top]
+    order = {col: i for i, col in enumerate(ALL_COLUMNS)}
+    return sorted(issues.values(), key=lambda issue: order[issue["column"]])
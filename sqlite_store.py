@@ -0,0 +1,79 @@
+"""
+Storage profile for the local SQLite store.
+
+Every connection gets WAL journaling and the pragmas below, so the sync can write while
+reports read. Reports go through a separate query-only engine: in WAL mode readers see the
+last committed state and never wait on the writer. An in-memory database has no WAL and
+cannot be shared between engines; there the reader session falls back to db.session.
+"""
+import sqlalchemy as sa
+from flask import current_app
+from sqlalchemy.orm import scoped_session, sessionmaker
+
+from extensions import db
+
+
+def storage_pragmas(config):
+    """PRAGMA (name, value) pairs of the storage profile, in the order they are applied."""
+    return [
+        ("journal_mode", "WAL"),
+        # With WAL, NORMAL only syncs at checkpoints: a power cut can lose the last
+        # commits, never consistency; the sync checkpoint is committed with its rows.
+        ("synchronous", "NORMAL"),
+        ("cache_size", -1024 * int(config.get("SQLITE_CACHE_MB", 64))),
+        ("mmap_size", 1024 * 1024 * int(config.get("SQLITE_MMAP_MB", 256))),
+        ("temp_store", "MEMORY"),
+        ("busy_timeout", int(config.get("SQLITE_BUSY_TIMEOUT_MS", 10000))),
+        # ANALYZE samples this many rows per index instead of reading the whole table.
+        ("analysis_limit", int(config.get("SQLITE_ANALYSIS_LIMIT", 1000))),
+    ]
+
+
+def apply_profile(engine, config, read_only=False):
+    """Apply the storage profile to every new DBAPI connection of `engine`."""
+    pragmas = storage_pragmas(config)
+    if read_only:
+        pragmas.append(("query_only", "ON"))
+
+    @sa.event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas:
+            cursor.execute(f"PRAGMA {name} = {value}")
+        cursor.close()
+
+
+def _is_file(url):
+    return url.get_backend_name() == "sqlite" and url.database not in (None, "", ":memory:")
+
+
+def init_app(app):
+    state = {"reader": None, "session": None}
+    app.extensions["sqlite_store"] = state
+    with app.app_context():
+        engine = db.engine
+    if engine.url.get_backend_name() != "sqlite":
+        return
+    apply_profile(engine, app.config)
+    if not _is_file(engine.url):
+        return
+
+    reader = sa.create_engine(
+        engine.url,
+        pool_size=int(app.config.get("SQLITE_READERS", 4)),
+        max_overflow=int(app.config.get("SQLITE_READERS", 4)),
+    )
+    apply_profile(reader, app.config, read_only=True)
+    state["reader"] = reader
+    state["session"] = scoped_session(sessionmaker(bind=reader))
+
+    @app.teardown_appcontext
+    def _remove_read_session(exc):
+        state["session"].remove()
+
+
+def read_session():
+    """Session for report queries: query-only and never blocked by the sync writer."""
+    state = current_app.extensions.get("sqlite_store") or {}
+    session = state.get("session")
+    return session() if session is not None else db.session
@@ -0,0 +1,242 @@
+"""
+On-demand sync jobs ("Nu synchroniseren" in Beheer > Data refresh).
+
+A request only inserts a queued row in sync_jobs. The process holding the scheduler lease
+(see refresh_scheduler) claims and runs it in its scheduler thread, so a long sync never
+occupies a web worker and never overlaps a scheduled run. After sync commits, at most every
+PROGRESS_EVERY seconds, the job row gets rows, rate, cursor and ETA through a separate
+connection, leaving the sync's session alone; the admin page streams that row over
+Server-Sent Events. Cancelling sets cancel_requested, which the progress callback turns
+into SyncCancelled right after a commit, so the checkpoint stays consistent.
+
+Saving a column profile queues a job of mode "columns" as well: it rewrites the stored
+rows batch by batch (rgritten_sync.rewrite_column_profile), reporting progress the same way.
+"""
+import time
+from datetime import datetime
+
+import sqlalchemy as sa
+
+from extensions import db
+from models import SyncJob
+
+ACTIVE = ("queued", "running")
+PROGRESS_EVERY = 1.0
+# Seconds an event stream stays open; the browser reconnects, so no web worker is held
+# for the whole run.
+STREAM_SECONDS = 25
+
+
+def active_job():
+    return (
+        db.session.query(SyncJob)
+        .filter(SyncJob.status.in_(ACTIVE))
+        .order_by(SyncJob.id)
+        .first()
+    )
+
+
+def enqueue(profile_id, mode="append", resync_days=0, requested_by=None):
+    """Queue a sync; raises ValueError while another job is queued or running."""
+    if active_job() is not None:
+        raise ValueError("Er staat al een sync-job in de wachtrij of loopt nog")
+    job = SyncJob(
+        profile_id=profile_id,
+        mode=mode,
+        resync_days=max(0, resync_days or 0),
+        requested_by=requested_by,
+    )
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+
+def enqueue_columns(dropped, requested_by=None):
+    """Queue the rewrite of stored rows after a column-profile change; runs after earlier jobs."""
+    job = SyncJob(mode="columns", params={"dropped": list(dropped)}, requested_by=requested_by)
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+
+def request_cancel(job_id):
+    """
+    Cancel a queued job at once ("cancelled"), or ask a running one to stop after its next
+    commit ("requested"). Returns None if the job is no longer active.
+    """
+    table = SyncJob.__table__
+    now = datetime.utcnow()
+    cancelled = db.session.execute(
+        table.update()
+        .where(table.c.id == job_id, table.c.status == "queued")
+        .values(status="cancelled", finished_at=now)
+    ).rowcount
+    if cancelled:
+        db.session.commit()
+        return "cancelled"
+    requested = db.session.execute(
+        table.update()
+        .where(table.c.id == job_id, table.c.status == "running")
+        .values(cancel_requested=True)
+    ).rowcount
+    db.session.commit()
+    return "requested" if requested else None
+
+
+def snapshot(job):
+    """JSON-serialisable progress of a job, as sent to the admin page."""
+    percent = None
+    if job.pending:
+        percent = min(100.0, round(100.0 * job.rows / job.pending, 1))
+    elif job.status == "done":
+        percent = 100.0
+    return {
+        "id": job.id,
+        "status": job.status,
+        "cancel_requested": job.cancel_requested,
+        "rows": job.rows,
+        "pending": job.pending,
+        "percent": percent,
+        "rows_per_second": job.rows_per_second,
+        "eta_seconds": job.eta_seconds,
+        "cursor": (
+            f"{job.cursor_ritdatum} / {job.cursor_ritnummer}" if job.cursor_ritdatum else None
+        ),
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+        "error": job.error,
+    }
+
+
+def _set_job(job_id, **values):
+    table = SyncJob.__table__
+    db.session.execute(table.update().where(table.c.id == job_id).values(**values))
+    db.session.commit()
+
+
+class _Progress:
+    """Progress callback for sync_rgritten that reports to the job row and checks cancels."""
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.started = time.perf_counter()
+        self.reported = 0.0
+
+    def __call__(self, rows, key, pending):
+        now = time.perf_counter()
+        if now - self.reported < PROGRESS_EVERY:
+            return
+        self.reported = now
+        elapsed = now - self.started
+        rate = rows / elapsed if elapsed > 0 else None
+        eta = None
+        if rate and pending is not None:
+            eta = max(0, pending - rows) / rate
+        table = SyncJob.__table__
+        # Own connection: the sync has just committed, so this write does not wait on it.
+        with db.engine.begin() as connection:
+            connection.execute(
+                table.update()
+                .where(table.c.id == self.job_id)
+                .values(
+                    rows=rows,
+                    pending=pending,
+                    rows_per_second=round(rate, 1) if rate else None,
+                    eta_seconds=round(eta, 1) if eta is not None else None,
+                    cursor_ritdatum=key[0] if key else None,
+                    cursor_ritnummer=key[1] if key else None,
+                    heartbeat_at=datetime.utcnow(),
+                )
+            )
+            cancel = connection.execute(
+                sa.select(table.c.cancel_requested).where(table.c.id == self.job_id)
+            ).scalar()
+        if cancel:
+            from rgritten_sync import SyncCancelled
+
+            raise SyncCancelled()
+
+
+def _claim(owner):
+    """Mark the oldest queued job as running for `owner`; returns its id or None."""
+    table = SyncJob.__table__
+    for (job_id,) in db.session.execute(
+        sa.select(table.c.id).where(table.c.status == "queued").order_by(table.c.id)
+    ).all():
+        now = datetime.utcnow()
+        claimed = db.session.execute(
+            table.update()
+            .where(table.c.id == job_id, table.c.status == "queued")
+            .values(status="running", owner=owner, started_at=now, heartbeat_at=now)
+        ).rowcount
+        db.session.commit()
+        if claimed:
+            return job_id
+    db.session.rollback()
+    return None
+
+
+def fail_orphaned(owner):
+    """Close running jobs of processes that no longer hold the lease (they were stopped)."""
+    table = SyncJob.__table__
+    db.session.execute(
+        table.update()
+        .where(table.c.status == "running", table.c.owner != owner)
+        .values(status="failed", finished_at=datetime.utcnow(), error="onderbroken: proces gestopt")
+    )
+    db.session.commit()
+
+
+def run_queued(owner, chunk_size=1000, min_ritdatum=None, logger=None, lease=None):
+    """
+    Run queued jobs one by one; call only while holding the scheduler lease, whose
+    refresh_scheduler.current_lease() token is handed to the syncs and column rewrites as
+    `lease`.
+    """
+    from rgritten_sync import SyncCancelled, rewrite_column_profile, sync_rgritten
+
+    fail_orphaned(owner)
+    ran = 0
+    while (job_id := _claim(owner)) is not None:
+        ran += 1
+        job = db.session.get(SyncJob, job_id)
+        profile_name = job.profile.name if job.profile else None
+        mode, resync_days, params = job.mode, job.resync_days, job.params or {}
+        try:
+            if mode == "columns":
+                rewritten = rewrite_column_profile(
+                    params.get("dropped") or [], progress=_Progress(job_id), lease=lease
+                )
+                stats = {"rewritten": rewritten}
+            elif profile_name is None:
+                raise ValueError("profiel bestaat niet meer")
+            else:
+                stats = sync_rgritten(
+                    profile_name=profile_name,
+                    chunk_size=chunk_size,
+                    min_ritdatum=min_ritdatum,
+                    mode=mode,
+                    resync_days=resync_days,
+                    progress=_Progress(job_id),
+                    lease=lease,
+                )
+        except SyncCancelled:
+            db.session.rollback()
+            _set_job(job_id, status="cancelled", finished_at=datetime.utcnow(), eta_seconds=None)
+        except Exception as exc:
+            db.session.rollback()
+            if logger is not None:
+                logger.exception("Sync job %s failed", job_id)
+            _set_job(job_id, status="failed", finished_at=datetime.utcnow(), error=str(exc)[:2000])
+        else:
+            _set_job(
+                job_id,
+                status="done",
+                finished_at=datetime.utcnow(),
+                rows=sum(stats.get(k) or 0 for k in ("inserted", "updated", "unchanged", "rewritten")),
+                eta_seconds=0,
+                cursor_ritdatum=stats.get("through_ritdatum"),
+                cursor_ritnummer=stats.get("through_ritnummer"),
+                stats={k: v for k, v in stats.items() if k not in ("partitions", "stages")},
+            )
+    return ran
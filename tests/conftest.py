@@ -13,6 +13,7 @@ def _set_env():
     os.environ.setdefault("FLASK_DEBUG", "0")
     os.environ.setdefault("SECRET_KEY", "test-secret")
     os.environ.setdefault("SQLALCHEMY_DATABASE_URI", "sqlite:///:memory:")
+    os.environ.setdefault("DATA_REFRESH_IN_WEB", "0")
     yield
 
 
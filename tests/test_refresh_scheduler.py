@@ -0,0 +1,131 @@
+from datetime import datetime, timedelta
+
+
+def test_lease_has_one_holder_until_it_expires(app):
+    from extensions import db
+    from models import SchedulerLease
+    from refresh_scheduler import acquire_lease, lease_holder, release_lease
+
+    with app.app_context():
+        db.create_all()
+        assert acquire_lease("job", "a", ttl=60)
+        assert not acquire_lease("job", "b", ttl=60)
+        assert acquire_lease("job", "a", ttl=60)
+        assert lease_holder("job").owner == "a"
+
+        lease = db.session.query(SchedulerLease).filter_by(name="job").one()
+        lease.expires_at = datetime.utcnow() - timedelta(seconds=1)
+        db.session.commit()
+        assert lease_holder("job") is None
+        assert acquire_lease("job", "b", ttl=60)
+        assert not acquire_lease("job", "a", ttl=60)
+
+        release_lease("job", "b")
+        assert acquire_lease("job", "a", ttl=60)
+
+
+def test_lease_generation_fences_a_taken_over_run(app):
+    import pytest
+
+    from extensions import db
+    from models import SchedulerLease
+    from refresh_scheduler import LeaseLost, acquire_lease, current_lease, extend_lease
+
+    with app.app_context():
+        db.create_all()
+        assert acquire_lease("job", "a", ttl=60)
+        token = current_lease("job", "a")
+        assert token == ("job", "a", 1) and current_lease("job", "b") is None
+        assert acquire_lease("job", "a", ttl=60)
+        assert current_lease("job", "a") == token
+
+        lease = db.session.query(SchedulerLease).one()
+        lease.expires_at = datetime.utcnow() - timedelta(seconds=1)
+        db.session.commit()
+        # Expired but not taken over: the run's own commit renews it.
+        extend_lease(token)
+        db.session.commit()
+        assert current_lease("job", "a") == token
+
+        lease.expires_at = datetime.utcnow() - timedelta(seconds=1)
+        db.session.commit()
+        assert acquire_lease("job", "b", ttl=60)
+        with pytest.raises(LeaseLost):
+            extend_lease(token)
+        db.session.rollback()
+        assert current_lease("job", "b") == ("job", "b", 2)
+
+
+def test_cron_and_interval_slots():
+    import pytest
+
+    from models import RefreshSchedule
+    from refresh_scheduler import cron_next, next_slot, parse_cron
+
+    at = datetime(2025, 3, 1, 10, 7)  # a Saturday
+    assert cron_next("*/15 * * * *", at) == datetime(2025, 3, 1, 10, 15)
+    assert cron_next("0 2 * * *", at) == datetime(2025, 3, 2, 2, 0)
+    assert cron_next("30 6-22/4 * * 1-5", at) == datetime(2025, 3, 3, 6, 30)
+    assert cron_next("0 0 1 * 0", at) == datetime(2025, 3, 2, 0, 0)  # day 1 or a Sunday
+    with pytest.raises(ValueError):
+        parse_cron("61 * * * *")
+
+    every_25 = RefreshSchedule(interval_minutes=25)
+    assert next_slot(every_25, at) == datetime(2025, 3, 1, 10, 25)
+    assert next_slot(every_25, datetime(2025, 3, 1, 23, 59)) == datetime(2025, 3, 2)
+
+
+def test_schedules_run_once_across_processes_and_catch_up(app, monkeypatch):
+    import rgritten_sync
+    from extensions import db
+    from models import ConnectionProfile, DataRefreshConfig, RefreshSchedule, SchedulerLease
+    from refresh_scheduler import RefreshScheduler
+
+    runs = []
+    monkeypatch.setattr(rgritten_sync, "sync_rgritten", lambda **kw: runs.append(kw) or {})
+    monkeypatch.setattr(
+        rgritten_sync, "reconcile_rgritten", lambda **kw: runs.append(kw) or {"ranges": 0}
+    )
+    with app.app_context():
+        db.create_all()
+        profile = ConnectionProfile(name="Historie", project="Algemeen")
+        db.session.add(profile)
+        db.session.commit()
+        db.session.add(DataRefreshConfig(id=1, enabled=True, profile_id=profile.id))
+        db.session.add(RefreshSchedule(name="Vandaag", interval_minutes=15, mode="upsert", window_days=1))
+        db.session.add(
+            RefreshSchedule(name="Nacht", cron="0 2 * * *", mode="reconcile", window_days=7, catch_up=False)
+        )
+        db.session.commit()
+
+    first, second = RefreshScheduler(app, owner="a"), RefreshScheduler(app, owner="b")
+    at = datetime(2025, 3, 1, 10, 7)
+    assert first.tick(now=at) == {}  # plans 10:15 and 02:00 tomorrow
+    assert first.tick(now=at.replace(minute=15)) == {"Vandaag": {}}
+    assert runs[-1] == {
+        "profile_name": "Historie",
+        "chunk_size": 1000,
+        "min_ritdatum": None,
+        "mode": "upsert",
+        "resync_days": 1,
+        "lease": ("data-refresh", "a", 1),
+    }
+    assert second.tick(now=at.replace(minute=30)) == {}  # lease held by "a"
+
+    with app.app_context():
+        lease = db.session.query(SchedulerLease).one()
+        lease.expires_at = datetime.utcnow() - timedelta(seconds=1)
+        db.session.commit()
+    # Down until 03:00 the next day: the missed interval slots run once, the nightly
+    # reconcile (no catch-up) is skipped.
+    assert second.tick(now=datetime(2025, 3, 2, 3, 0)) == {"Vandaag": {}}
+    assert len(runs) == 2
+    with app.app_context():
+        nightly = db.session.query(RefreshSchedule).filter_by(name="Nacht").one()
+        assert nightly.last_status == "overgeslagen"
+        assert nightly.next_run_at == datetime(2025, 3, 3, 2, 0)
+
+    assert second.tick(now=datetime(2025, 3, 3, 2, 5)) == {"Nacht": {"ranges": 0}, "Vandaag": {}}
+    reconcile = next(kw for kw in runs if "date_from" in kw)
+    assert (reconcile["date_from"], reconcile["date_to"]) == ("2025-02-25", "2025-03-03")
+    assert reconcile["lease"][:2] == ("data-refresh", "b")
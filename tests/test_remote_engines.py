@@ -0,0 +1,49 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+import sqlalchemy as sa
+
+
+def test_registry_reuses_engine_until_profile_changes(tmp_path):
+    import remote_engines
+
+    uri = f"sqlite:///{tmp_path}/remote.db"
+    profile = SimpleNamespace(id=1, name="Historie", updated_at=datetime(2025, 1, 1))
+    profile.build_uri = lambda: uri
+    try:
+        engine, numbers_converted = remote_engines.get_engine(profile)
+        assert numbers_converted is False
+        with engine.connect() as con:
+            con.execute(sa.text("SELECT 1"))
+        assert remote_engines.get_engine(profile)[0] is engine
+
+        bigger, _ = remote_engines.get_engine(profile, pool_size=remote_engines.POOL_SIZE + 3)
+        assert bigger is not engine
+        assert remote_engines.get_engine(profile)[0] is bigger
+
+        profile.updated_at = datetime(2025, 1, 2)
+        edited, _ = remote_engines.get_engine(profile)
+        assert edited is not bigger
+        with edited.connect() as con:
+            con.execute(sa.text("SELECT 1"))
+        with edited.connect() as con:
+            con.execute(sa.text("SELECT 1"))
+
+        [stats] = remote_engines.pool_stats()
+        assert stats["profile"] == "Historie"
+        assert stats["connects"] == 1 and stats["checkouts"] == 2
+        assert stats["checked_out"] == 0 and stats["checked_in"] == 1
+
+        remote_engines.discard(1)
+        assert remote_engines.pool_stats() == []
+    finally:
+        remote_engines.dispose_all()
+
+
+def test_decimal_output_hands_decimals_over_as_floats():
+    from remote_engines import _decimal_output
+
+    assert _decimal_output(None) is None
+    assert _decimal_output(b"12.5000000000") == 12.5
+    assert _decimal_output("-3.0000000000") == -3.0
+    assert type(_decimal_output(b"7.0000000000")) is float
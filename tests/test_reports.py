@@ -0,0 +1,193 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+
+def _rows():
+    from extensions import db
+    from models import RGRit
+
+    for n, (day, hour) in enumerate(((1, 0), (1, 23), (2, 8), (3, 0), (4, 12)), start=1):
+        db.session.add(
+            RGRit(rittype="taxi", ritnummer=n, status="open", owner_id=1, vervoerder="v",
+                  ritdatum=datetime(2025, 1, day, hour))
+        )
+    db.session.commit()
+
+
+def test_date_filters_are_half_open_ranges_on_ritdatum(app):
+    import sqlalchemy as sa
+
+    from blueprints.reports.routes import _apply_filters
+    from extensions import db
+    from models import RGRit
+
+    def matches(filters, args=""):
+        template = SimpleNamespace(filter_fields=filters)
+        with app.test_request_context(f"/?{args}"):
+            query = _apply_filters(db.session.query(RGRit.ritnummer), "rgritten", template)
+            assert "date(" not in str(query.statement.compile()).lower()
+            return sorted(n for (n,) in query)
+
+    def saved(op, value):
+        return matches([{"field": "ritdatum", "op": op, "value": value}])
+
+    with app.app_context():
+        db.create_all()
+        _rows()
+        assert saved("=", "2025-01-01") == [1, 2]
+        assert saved("!=", "2025-01-01") == [3, 4, 5]
+        assert saved("<", "2025-01-02") == [1, 2]
+        assert saved("<=", "2025-01-02") == [1, 2, 3]
+        assert saved(">", "2025-01-02") == [4, 5]
+        assert saved(">=", "2025-01-03") == [4, 5]
+        assert saved("between", "2025-01-02,2025-01-03") == [3, 4]
+        assert saved("<=", "2025-01-02T08:00:00") == [1, 2, 3]
+        assert saved("=", "geen datum") == [1, 2, 3, 4, 5]
+        runtime = matches(["ritdatum"], "rt_from_ritdatum=2025-01-02&rt_to_ritdatum=2025-01-03")
+        assert runtime == [3, 4]
+
+        plan = db.session.execute(
+            sa.text(
+                "EXPLAIN QUERY PLAN SELECT * FROM rgritten WHERE ritdatum >= :a AND ritdatum < :b"
+            ),
+            {"a": "2025-01-02", "b": "2025-01-03"},
+        ).all()
+        assert "USING INDEX uq_rgritten_ritdatum_ritnummer" in " ".join(row[-1] for row in plan)
+
+
+def test_report_rows_load_only_shown_columns_from_the_hot_index(app):
+    import sqlalchemy as sa
+    from sqlalchemy.orm import load_only
+
+    from blueprints.reports.routes import _report_columns
+    from extensions import db
+    from models import RGRit
+
+    columns = _report_columns(["ritdatum", "locatie", "vervoerder", "locatie_naar", "onbekend"])
+    assert [c.key for c in columns] == ["ritdatum", "aankomst", "locatie_van", "locatie_naar", "vervoerder"]
+    assert [c.key for c in _report_columns([])] == ["id"]
+
+    def plan(fields):
+        query = (
+            db.session.query(RGRit)
+            .options(load_only(*_report_columns(fields), raiseload=True))
+            .filter(RGRit.ritdatum >= sa.literal_column("'2025-01-02'"))
+        )
+        sql = str(query.statement.compile(db.engine))
+        return " ".join(row[-1] for row in db.session.execute(sa.text("EXPLAIN QUERY PLAN " + sql)))
+
+    with app.app_context():
+        db.create_all()
+        _rows()
+        assert "COVERING INDEX ix_rgritten_hot" in plan(["ritdatum", "vervoerder", "locatie"])
+        assert "COVERING" not in plan(["ritdatum", "achternaam"])
+
+        row = db.session.query(RGRit).options(load_only(*_report_columns(["vervoerder"]), raiseload=True)).first()
+        assert row.vervoerder == "v"
+        with pytest.raises(sa.exc.InvalidRequestError):
+            row.achternaam
+
+
+def test_indicator_filters_use_the_bitmasks_in_the_hot_index(app):
+    import sqlalchemy as sa
+
+    from blueprints.reports.routes import _apply_filters
+    from extensions import db
+    from models import RGRit
+
+    def query(filters, args=""):
+        template = SimpleNamespace(filter_fields=filters)
+        with app.test_request_context(f"/?{args}"):
+            return _apply_filters(db.session.query(RGRit.ritnummer), "rgritten", template)
+
+    def matches(filters, args=""):
+        return sorted(n for (n,) in query(filters, args))
+
+    with app.app_context():
+        db.create_all()
+        flags = {1: (1, 0, None), 2: (1, 1, 0), 3: (0, None, 1), 4: (None, 0, 0), 5: (1, 0, 1)}
+        for n, (rolstoel, afasie, niet_combineren) in flags.items():
+            db.session.add(
+                RGRit(rittype="taxi", ritnummer=n, status="open", owner_id=1, vervoerder="v",
+                      ritdatum=datetime(2025, 1, n, 8), ind_rolstoel=rolstoel, ind_afasie=afasie,
+                      ind_niet_combineren=niet_combineren)
+            )
+        db.session.commit()
+        assert db.session.get(RGRit, 2).ind_set == 1 | 1 << 52
+
+        saved = [
+            {"field": "ind_rolstoel", "op": "=", "value": "1"},
+            {"field": "ind_afasie", "op": "=", "value": "0"},
+        ]
+        sql = str(query(saved).statement.compile()).lower()
+        assert "ind_set &" in sql and "ind_clear &" in sql and "ind_rolstoel =" not in sql
+        assert matches(saved) == [1, 5]
+        assert matches(saved + ["ind_niet_combineren"], "rt_val_ind_niet_combineren=1") == [5]
+        # NULL is neither set nor clear; other operators keep filtering the column itself.
+        assert matches([{"field": "ind_afasie", "op": "!=", "value": "1"}]) == [1, 4, 5]
+        assert matches([{"field": "ind_niet_combineren", "op": "=", "value": "0"}]) == [2, 4]
+
+        db.session.execute(sa.text("ANALYZE"))
+        sql = str(
+            query(saved + [{"field": "ritdatum", "op": ">=", "value": "2025-01-02"}])
+            .with_entities(sa.func.count())
+            .statement.compile(db.engine, compile_kwargs={"literal_binds": True})
+        )
+        plan = " ".join(row[-1] for row in db.session.execute(sa.text("EXPLAIN QUERY PLAN " + sql)))
+        assert "COVERING INDEX ix_rgritten_hot" in plan
+
+
+def test_encoded_columns_store_codes_and_read_back_text(app):
+    import sqlalchemy as sa
+
+    from blueprints.reports.routes import _apply_filters, _apply_sort
+    from extensions import db
+    from models import RGRit
+
+    def numbers(filters=(), sort=()):
+        template = SimpleNamespace(filter_fields=list(filters), sort_fields=list(sort), group_fields=[])
+        with app.test_request_context("/"):
+            query = _apply_filters(db.session.query(RGRit.ritnummer), "rgritten", template)
+            return [n for (n,) in _apply_sort(query, "rgritten", template)]
+
+    with app.app_context():
+        db.create_all()
+        for n, vervoerder in enumerate(("Zuid", "Noord", "Zuid", "Midden"), start=1):
+            db.session.add(
+                RGRit(rittype="taxi", ritnummer=n, status="open", owner_id=1, vervoerder=vervoerder,
+                      ritdatum=datetime(2025, 1, n, 8), plaats_van="Utrecht" if n % 2 else None)
+            )
+        db.session.commit()
+
+        stored = db.session.execute(sa.text("SELECT vervoerder, plaats_van FROM rgritten ORDER BY id")).all()
+        assert all(isinstance(code, int) for code, _ in stored) and stored[0][0] == stored[2][0]
+        assert stored[1][1] is None
+        strings = db.session.execute(sa.text("SELECT value FROM rgritten_strings ORDER BY code")).scalars()
+        assert sorted(strings) == ["Midden", "Noord", "Utrecht", "Zuid", "open", "taxi"]
+
+        row = db.session.query(RGRit).filter(RGRit.ritnummer == 1).one()
+        assert (row.vervoerder, row.plaats_van, row.rittype) == ("Zuid", "Utrecht", "taxi")
+        totals = dict(
+            db.session.query(RGRit.vervoerder, sa.func.count()).group_by(RGRit.vervoerder).all()
+        )
+        assert totals == {"Zuid": 2, "Noord": 1, "Midden": 1}
+
+        assert numbers([{"field": "vervoerder", "op": "=", "value": "Zuid"}]) == [1, 3]
+        assert numbers([{"field": "vervoerder", "op": "=", "value": "West"}]) == []
+        assert numbers([{"field": "vervoerder", "op": "!=", "value": "West"}]) == [1, 2, 3, 4]
+        assert numbers([{"field": "vervoerder", "op": "like", "value": "id"}]) == [1, 3, 4]
+        assert numbers([{"field": "vervoerder", "op": "<", "value": "O"}]) == [2, 4]
+        assert numbers(sort=[{"field": "vervoerder", "dir": "asc"}])[:2] == [4, 2]
+
+        # Bulk inserts skip the mapper events; their strings are registered explicitly.
+        from models import add_encoded_strings
+
+        payload = [dict(rittype="bus", ritnummer=5, status="open", owner_id=1, vervoerder="West",
+                        ritdatum=datetime(2025, 1, 5, 8))]
+        add_encoded_strings(db.session.connection(), payload)
+        db.session.bulk_insert_mappings(RGRit, payload)
+        db.session.commit()
+        row = db.session.query(RGRit).filter(RGRit.ritnummer == 5).one()
+        assert (row.rittype, row.vervoerder) == ("bus", "West")
@@ -0,0 +1,83 @@
+from datetime import datetime
+
+import pytest
+
+
+def _add(ritnummer, month, day=1):
+    from extensions import db
+    from models import RGRit
+
+    db.session.add(
+        RGRit(rittype="taxi", ritnummer=ritnummer, status="open", owner_id=1, vervoerder="v",
+              ritdatum=datetime(2025, month, day, 8))
+    )
+    db.session.commit()
+
+
+def test_frozen_month_is_read_only_until_thawed_or_dropped(app):
+    import sqlalchemy as sa
+
+    import rgritten_partitions as partitions
+    from extensions import db
+    from models import RGRit, RGRittenQuarantine
+    from rgritten_sync import cluster_rgritten
+
+    with app.app_context():
+        db.create_all()
+        for n, (month, day) in enumerate(((1, 5), (1, 20), (2, 3), (3, 1)), start=1):
+            _add(n, month, day)
+        catalog = partitions.refresh()
+        assert [(p.month, p.rows) for p in catalog] == [("2025-01", 2), ("2025-02", 1), ("2025-03", 1)]
+        assert catalog[0].first_ritdatum == datetime(2025, 1, 5, 8)
+
+        partitions.freeze("2025-01")
+        assert partitions.frozen_months() == {"2025-01"}
+        with pytest.raises(sa.exc.IntegrityError, match="bevroren"):
+            _add(9, 1, 31)
+        db.session.rollback()
+        with pytest.raises(sa.exc.IntegrityError, match="bevroren"):
+            db.session.query(RGRit).filter(RGRit.ritnummer == 1).update({"status": "x"})
+        db.session.rollback()
+        _add(10, 2, 28)  # other months stay writable
+
+        # A rebuild of the table keeps the month frozen.
+        cluster_rgritten()
+        with pytest.raises(sa.exc.IntegrityError, match="bevroren"):
+            db.session.query(RGRit).filter(RGRit.ritnummer == 2).delete()
+        db.session.rollback()
+
+        db.session.add(RGRittenQuarantine(ritdatum=datetime(2025, 1, 5, 8), ritnummer=1, column="afstand"))
+        db.session.commit()
+        assert partitions.drop("2025-01") == 2
+        assert db.session.query(RGRittenQuarantine).count() == 0
+        assert [p.month for p in partitions.refresh()] == ["2025-02", "2025-03"]
+        # Nothing frozen any more: the triggers are gone.
+        triggers = db.session.execute(sa.text("SELECT name FROM sqlite_master WHERE type = 'trigger'")).all()
+        assert triggers == []
+
+        partitions.freeze("2025-03")
+        partitions.thaw("2025-03")
+        _add(11, 3, 2)
+        with pytest.raises(ValueError):
+            partitions.freeze("maart")
+
+
+def test_column_profile_change_leaves_frozen_months_alone(app):
+    import rgritten_partitions as partitions
+    from extensions import db
+    from models import RGRit
+    from rgritten_sync import REQUIRED_COLUMNS, rewrite_column_profile, save_column_profile
+
+    with app.app_context():
+        db.create_all()
+        for n, month in ((1, 1), (2, 2)):
+            _add(n, month)
+        db.session.query(RGRit).update({RGRit.voornaam: "Anna", RGRit.row_hash: 42})
+        db.session.commit()
+        partitions.freeze("2025-01")
+
+        added, dropped = save_column_profile(REQUIRED_COLUMNS)
+        assert "voornaam" in dropped
+        assert rewrite_column_profile(dropped) == 1
+        stored = {r.ritnummer: (r.voornaam, r.row_hash) for r in db.session.query(RGRit)}
+        assert stored == {1: ("Anna", 42), 2: (None, None)}
@@ -0,0 +1,891 @@
+from datetime import date, datetime
+
+
+def test_plan_partitions_balances_rows_and_covers_range():
+    from rgritten_sync import _plan_partitions
+
+    days = [(date(2025, 1, d), n) for d, n in [(1, 10), (2, 10), (3, 40), (4, 10), (5, 30)]]
+    plan = _plan_partitions(days, 3)
+
+    assert [p["rows"] for p in plan] == [60, 40]
+    assert plan[0]["start"] is None
+    assert plan[0]["end"] == date(2025, 1, 4)
+    assert plan[1]["start"] == date(2025, 1, 4)
+    assert plan[-1]["end"] is None
+    assert [p["index"] for p in plan] == [0, 1]
+
+
+def test_plan_partitions_empty_range():
+    from rgritten_sync import _plan_partitions
+
+    assert _plan_partitions([], 4) == []
+
+
+def test_pipeline_convert_hands_on_params_and_end_marker():
+    import queue
+    import threading
+    from types import SimpleNamespace
+
+    from rgritten_sync import _new_stage_clock, _pipeline_convert
+
+    class Writer:
+        def prepare(self, rows):
+            return [tuple(row._mapping.values()) for row in rows], 16, 0.5
+
+    rows = [
+        SimpleNamespace(_mapping={"ritdatum": datetime(2025, 1, 1), "ritnummer": n}) for n in (1, 2)
+    ]
+    inbox, out = queue.Queue(), queue.Queue()
+    inbox.put(("rows", rows))
+    inbox.put(("done",))
+    clock = _new_stage_clock()
+    _pipeline_convert(Writer(), inbox, out, threading.Event(), clock)
+
+    assert out.get_nowait() == (
+        "params",
+        ([(datetime(2025, 1, 1), 1), (datetime(2025, 1, 1), 2)], 16, 0.5),
+        ("2025-01-01", 2),
+    )
+    assert out.get_nowait() == ("done",)
+    assert clock["busy"] >= 0 and clock["wait_output"] >= 0
+
+
+def test_chunk_writer_upsert_skips_unchanged_rows(app):
+    from types import SimpleNamespace
+
+    from extensions import db
+    from models import RGRit
+    from rgritten_sync import _ChunkWriter
+
+    columns = ["rittype", "ritnummer", "status", "owner_id", "vervoerder", "ritdatum", "row_hash"]
+
+    def row(ritnummer, status, row_hash):
+        return ("taxi", ritnummer, status, 1, "v", datetime(2025, 1, 1, 8), row_hash)
+
+    with app.app_context():
+        db.create_all()
+        checkpoint = SimpleNamespace(last_ritdatum=None, last_ritnummer=0)
+        writer = _ChunkWriter(columns, checkpoint, 10, upsert=True)
+        writer.insert([row(1, "open", 11), row(2, "open", 22)])
+        writer.insert([row(1, "open", 11), row(2, "gewijzigd", 23), row(3, "open", 33)])
+        writer.commit(("2025-01-01", 3), force=True)
+
+        assert writer.counts == {"inserted": 3, "updated": 1, "unchanged": 1}
+        assert checkpoint.last_ritnummer == 3
+        stored = {r.ritnummer: r.status for r in db.session.query(RGRit)}
+        assert stored == {1: "open", 2: "gewijzigd", 3: "open"}
+
+
+def test_chunk_writer_registers_encoded_strings(app):
+    from types import SimpleNamespace
+
+    import sqlalchemy as sa
+
+    from extensions import db
+    from models import RGRit
+    from rgritten_sync import _ChunkWriter
+
+    columns = ["rittype", "ritnummer", "status", "owner_id", "vervoerder", "ritdatum", "row_hash"]
+
+    def row(ritnummer, status, row_hash):
+        return ("taxi", ritnummer, status, 1, "v", datetime(2025, 1, 1, 8), row_hash)
+
+    def codes():
+        return dict(db.session.execute(sa.text("SELECT value, code FROM rgritten_strings")).all())
+
+    with app.app_context():
+        db.create_all()
+        checkpoint = SimpleNamespace(last_ritdatum=None, last_ritnummer=0)
+        writer = _ChunkWriter(columns, checkpoint, 10, upsert=True)
+        writer.insert([row(1, "open", 11), row(2, "open", 22)])
+        writer.commit(("2025-01-01", 2), force=True)
+        first = codes()
+        assert set(first) == {"taxi", "open", "v"}
+
+        # An update to a new value adds only that value; given codes never change.
+        writer.insert([row(2, "gewijzigd", 23)])
+        writer.commit(("2025-01-01", 2), force=True)
+        second = codes()
+        assert set(second) - set(first) == {"gewijzigd"}
+        assert {value: second[value] for value in first} == first
+        raw = dict(db.session.execute(sa.text("SELECT ritnummer, status FROM rgritten")).all())
+        assert raw == {1: second["open"], 2: second["gewijzigd"]}
+        assert {r.ritnummer: r.status for r in db.session.query(RGRit)} == {1: "open", 2: "gewijzigd"}
+
+
+def test_gap_ranges_merges_consecutive_short_days():
+    from rgritten_sync import _gap_ranges
+
+    remote = {date(2025, 1, d): 10 for d in range(1, 8)}
+    local = {date(2025, 1, 1): 10, date(2025, 1, 2): 4, date(2025, 1, 5): 10, date(2025, 1, 6): 12}
+    ranges = _gap_ranges(remote, local)
+
+    assert [(r["start"], r["end"], r["days"], r["missing"]) for r in ranges] == [
+        (date(2025, 1, 2), date(2025, 1, 5), 3, 26),
+        (date(2025, 1, 7), date(2025, 1, 8), 1, 10),
+    ]
+    assert len(_gap_ranges(remote, local, pieces=4)) > len(ranges)
+
+
+def test_local_checksums_match_upper_hash_bits(app):
+    from extensions import db
+    from models import RGRit
+    from rgritten_sync import _local_checksums, _mismatched
+
+    hashes = [(5 << 32) + 7, -(3 << 32) + 1, None]
+    with app.app_context():
+        db.create_all()
+        for n, row_hash in enumerate(hashes, start=1):
+            db.session.add(
+                RGRit(
+                    rittype="taxi",
+                    ritnummer=n,
+                    status="open",
+                    owner_id=1,
+                    vervoerder="v",
+                    ritdatum=datetime(2025, 1, 2, 8),
+                    row_hash=row_hash,
+                )
+            )
+        db.session.commit()
+
+        local = _local_checksums("day", date(2025, 1, 1), date(2025, 2, 1))
+        # The row without a hash is not counted, so its day cannot match the remote.
+        assert local == {"2025-01-02": (2, 5 - 3)}
+        assert _mismatched({"2025-01-02": (3, 2)}, local) == ["2025-01-02"]
+        assert _mismatched({"2025-01-02": (2, 2)}, local) == []
+
+
+def test_source_plan_converts_only_mismatched_columns():
+    from rgritten_sync import _build_select, _SourcePlan
+
+    plan = _SourcePlan(
+        {"ritnummer": "int", "ritdatum": "datetime2", "afstand": "int", "instap": "varchar"},
+        maxdop=2,
+    )
+    sql = _build_select(["ritnummer", "afstand", "instap"], last_date="2025-01-01", plan=plan)
+
+    assert "[ritnummer] AS [ritnummer]" in sql
+    assert "[afstand] AS [afstand]" in sql
+    assert "TRY_CONVERT(time, [instap]) AS [instap]" in sql
+    assert "CAST([ritdatum] AS date) > :last_date" in sql
+    assert "TRY_CONVERT(bigint" not in sql
+    assert sql.endswith("OPTION (MAXDOP 2)")
+
+    masks = _SourcePlan(columns=["ritnummer", "ind_rolstoel", "ind_afasie"])
+    assert masks.columns[3:6] == ["row_hash", "ind_set", "ind_clear"]
+    sql = _build_select(masks.columns, plan=masks)
+    assert "THEN CAST(4503599627370496 AS bigint) ELSE 0 END) AS [ind_clear]" in sql
+    assert _SourcePlan(columns=["ritnummer"]).columns == ["ritnummer", "row_hash"]
+
+    legacy = _build_select(["ritnummer", "afstand"], last_date="2025-01-01")
+    assert "TRY_CONVERT(decimal(38, 10), [afstand])" in legacy
+    assert "TRY_CONVERT(date, [ritdatum]) > :last_date" in legacy
+
+
+def test_column_profile_follows_report_templates(app):
+    from extensions import db
+    from models import ReportTemplate, RGRit
+    from rgritten_sync import (
+        ALL_COLUMNS,
+        REQUIRED_COLUMNS,
+        rewrite_column_profile,
+        save_column_profile,
+        suggest_sync_columns,
+        sync_columns,
+    )
+
+    with app.app_context():
+        db.create_all()
+        db.session.add(
+            ReportTemplate(
+                name="reistijden",
+                include_fields=["reistijd_calc", "vervoerder"],
+                filter_fields=[{"field": "afstand", "op": "gt", "value": "5"}],
+                sort_fields=[{"field": "ritdatum", "dir": "asc"}],
+            )
+        )
+        db.session.add(
+            RGRit(
+                rittype="taxi",
+                ritnummer=1,
+                status="open",
+                owner_id=1,
+                vervoerder="v",
+                ritdatum=datetime(2025, 1, 2, 8),
+                afstand=3,
+                voornaam="Anna",
+                ind_rolstoel=1,
+                ind_lifo=0,
+                row_hash=42,
+            )
+        )
+        db.session.commit()
+        assert sync_columns() == ALL_COLUMNS
+
+        suggested = suggest_sync_columns()
+        assert set(REQUIRED_COLUMNS) <= set(suggested)
+        assert {"afstand", "instapgerealiseerd", "uitstapgerealiseerd"} <= set(suggested)
+        assert "voornaam" not in suggested
+
+        added, dropped = save_column_profile(suggested)
+        assert added == [] and "voornaam" in dropped
+        assert sync_columns() == suggested
+        # The stored rows only change once the queued rewrite has run.
+        assert db.session.query(RGRit).one().voornaam == "Anna"
+        assert rewrite_column_profile(dropped) == 1
+        stored = db.session.query(RGRit).one()
+        assert (stored.voornaam, stored.afstand, stored.row_hash) == (None, 3, None)
+        assert (stored.ind_set, stored.ind_clear) == (0, 0)
+
+        assert save_column_profile(None)[0] == dropped
+        assert sync_columns() == ALL_COLUMNS
+
+
+def test_locate_offending_columns_bisects_to_bad_columns(app, monkeypatch, tmp_path):
+    import sqlalchemy as sa
+
+    import rgritten_sync
+    from extensions import db
+    from models import ConnectionProfile
+
+    bad = {"afstand", "geboortedatum"}
+    engine = sa.create_engine(f"sqlite:///{tmp_path}/remote.db")
+    plans = []
+
+    def select(cols, limit=None, plan=None):
+        plans.append(plan)
+        return "SELECT :no_such_value" if bad & set(cols) else "SELECT 1"
+
+    monkeypatch.setattr(rgritten_sync, "get_engine", lambda profile, pool_size=None: (engine, False))
+    monkeypatch.setattr(rgritten_sync, "_build_select", select)
+    monkeypatch.setattr(rgritten_sync, "COLUMN_TYPES_SQL", "SELECT 'afstand' AS name, 'decimal' AS data_type")
+    rgritten_sync._column_types.clear()
+    with app.app_context():
+        db.create_all()
+        db.session.add(ConnectionProfile(name="Historie", project="Algemeen"))
+        db.session.commit()
+        result = rgritten_sync.locate_offending_columns("Historie", workers=3)
+
+        assert [item["column"] for item in result["offending"]] == ["geboortedatum", "afstand"]
+        assert all("no_such_value" in item["error"] for item in result["offending"])
+        n = len(rgritten_sync.ALL_COLUMNS)
+        assert len(result["probes"]) <= 1 + 2 * len(bad) * n.bit_length()
+        assert result["probes"][0]["columns"] == n and not result["probes"][0]["ok"]
+        # Probes convert like the sync: by the declared types, over the column profile.
+        assert all(plan is plans[0] for plan in plans)
+        assert plans[0].types == {"afstand": "decimal"} and not plans[0].converts("afstand")
+
+        rgritten_sync.save_column_profile(rgritten_sync.REQUIRED_COLUMNS + ["geboortedatum"])
+        result = rgritten_sync.locate_offending_columns("Historie", workers=3)
+        assert [item["column"] for item in result["offending"]] == ["geboortedatum"]
+        assert result["probes"][0]["columns"] == len(rgritten_sync.REQUIRED_COLUMNS) + 1
+
+
+def test_conversion_issues_scan_all_columns_once():
+    from rgritten_sync import _build_conversion_issues, _rit_ranges, _SourcePlan
+
+    plan = _SourcePlan({"ritnummer": "int", "afstand": "decimal", "instap": "varchar"})
+    columns = [c for c in ("ritnummer", "afstand", "instap", "tp_id", "voornaam") if plan.converts(c)]
+    assert columns == ["instap", "tp_id"]
+
+    sql = _build_conversion_issues(columns, ranged=True, plan=plan)
+    assert sql.count("FROM rpt.RGRitten") == 1
+    assert "CROSS APPLY (VALUES" in sql
+    assert (
+        "(N'instap', CASE WHEN TRY_CONVERT(time, [instap]) IS NULL "
+        "THEN NULLIF(LTRIM(RTRIM(CAST([instap] AS nvarchar(4000)))), N'') END)"
+    ) in sql
+    assert "[ritnummer] >= :rit_from" in sql and "[rn] <= :top" in sql
+
+    assert _rit_ranges(1, 10, 3) == [(1, 5), (5, 9), (9, 11)]
+    assert _rit_ranges(None, None, 3) == []
+
+
+def test_chunk_writer_quarantines_lost_values(app):
+    from extensions import db
+    from models import RGRittenQuarantine
+    from rgritten_sync import LOST_PREFIX, _ChunkWriter
+
+    columns = ["rittype", "ritnummer", "status", "owner_id", "vervoerder", "ritdatum", "afstand"]
+    columns += ["row_hash", LOST_PREFIX + "afstand"]
+
+    def row(ritnummer, afstand, row_hash, lost):
+        return ("taxi", ritnummer, "open", 1, "v", datetime(2025, 1, 1, 8), afstand, row_hash, lost)
+
+    with app.app_context():
+        db.create_all()
+        writer = _ChunkWriter(columns, None, 10, upsert=True)
+        writer.insert([row(1, None, 11, "12,5 km"), row(2, 3.5, 22, None)])
+        assert writer.quarantined == {"afstand": 1}
+        stored = db.session.query(RGRittenQuarantine).one()
+        assert (stored.ritnummer, stored.column, stored.raw_value) == (1, "afstand", "12,5 km")
+
+        # Fixed at the source: the update clears the entry; an unchanged row keeps its own.
+        writer.insert([row(1, 12.5, 12, None), row(2, 3.5, 22, None)])
+        writer.commit(None, force=True)
+        assert db.session.query(RGRittenQuarantine).count() == 0
+        assert writer.counts == {"inserted": 2, "updated": 1, "unchanged": 1}
+
+
+def test_bulk_load_drops_and_restores_secondary_indexes(app, monkeypatch):
+    import sqlalchemy as sa
+
+    import rgritten_sync
+    from extensions import db
+
+    def indexes():
+        return {i["name"] for i in sa.inspect(db.session.connection()).get_indexes("rgritten")}
+
+    with app.app_context():
+        db.create_all()
+        monkeypatch.setattr(rgritten_sync, "BULK_MIN_ROWS", 10)
+        assert rgritten_sync._use_bulk("auto", 10) and not rgritten_sync._use_bulk("auto", 9)
+        assert rgritten_sync._use_bulk("on", 0) and not rgritten_sync._use_bulk("off", 10**9)
+
+        before = indexes()
+        dropped = rgritten_sync._drop_secondary_indexes()
+        assert sorted(dropped) == ["ix_rgritten_hot", "ix_rgritten_owner_id", "ix_rgritten_ritnummer"]
+        assert indexes() == {"uq_rgritten_ritdatum_ritnummer"}
+
+        assert rgritten_sync._ensure_indexes()["created"] == sorted(dropped)
+        assert indexes() == before
+        assert rgritten_sync._ensure_indexes()["created"] == []
+
+
+def test_chunk_writer_records_batch_metrics(app):
+    from types import SimpleNamespace
+
+    from extensions import db
+    from models import SyncRun, SyncRunChunk
+    from rgritten_sync import RUN_STAGES, _ChunkWriter, _finish_run, _estimate_bytes
+
+    columns = ["rittype", "ritnummer", "status", "owner_id", "vervoerder", "ritdatum"]
+
+    def row(ritnummer):
+        return ("taxi", ritnummer, "open", 1, "v", datetime(2025, 1, 1, 8))
+
+    assert _estimate_bytes([row(1)] * 20) == 20 * (4 + 8 + 4 + 8 + 1 + 8)
+    with app.app_context():
+        db.create_all()
+        run = SyncRun(profile_name="Historie", started_at=datetime.utcnow())
+        db.session.add(run)
+        db.session.commit()
+        writer = _ChunkWriter(columns, None, 2)
+        writer.run_id = run.id
+        for n in (1, 3):
+            writer.add_time("fetch", 0.5)
+            writer.insert([row(n), row(n + 1)])
+            writer.commit(("2025-01-01", n + 1))
+        writer.commit(("2025-01-01", 4), force=True)  # nothing new: no empty batch
+        _finish_run(run, writer, SimpleNamespace(last_ritdatum="2025-01-01", last_ritnummer=4), "ok")
+        db.session.commit()
+
+        chunks = db.session.query(SyncRunChunk).order_by(SyncRunChunk.seq).all()
+        assert [(c.seq, c.rows, c.through_ritnummer, c.fetch_seconds) for c in chunks] == [
+            (1, 2, 2, 0.5),
+            (2, 2, 4, 0.5),
+        ]
+        run = db.session.get(SyncRun, run.id)
+        assert (run.status, run.rows, run.inserted, run.fetch_seconds) == ("ok", 4, 4, 1.0)
+        assert run.through_ritnummer == 4 and run.bytes > 0
+        assert all(getattr(run, f"{stage}_seconds") >= 0 for stage in RUN_STAGES)
+
+
+def test_cluster_rgritten_rewrites_rows_in_key_order(app):
+    import sqlalchemy as sa
+
+    from extensions import db
+    from models import RGRit
+    from rgritten_sync import cluster_rgritten
+
+    def indexes():
+        return {i["name"] for i in sa.inspect(db.session.connection()).get_indexes("rgritten")}
+
+    with app.app_context():
+        db.create_all()
+        before = indexes()
+        # A backfilled day lands behind the newer rows.
+        for day, ritnummer in ((2, 20), (3, 30), (1, 10), (1, 11)):
+            db.session.add(
+                RGRit(rittype="taxi", ritnummer=ritnummer, status="open", owner_id=1, vervoerder="v",
+                      ritdatum=datetime(2025, 1, day, 8))
+            )
+        db.session.commit()
+
+        check = cluster_rgritten(dry_run=True)
+        assert (check["rows"], check["out_of_order"], check["clustered"]) == (4, 1, False)
+        stats = cluster_rgritten()
+        assert stats["clustered"] and stats["out_of_order"] == 1
+        rows = db.session.query(RGRit.id, RGRit.ritnummer).order_by(RGRit.id).all()
+        assert [r.ritnummer for r in rows] == [10, 11, 20, 30]
+        assert indexes() == before
+        assert cluster_rgritten()["clustered"] is False
+
+
+def _try_convert(kind, value):
+    try:
+        return float(value) if kind == "decimal" and value is not None else None
+    except ValueError:
+        return None
+
+
+def _fake_remote(monkeypatch, tmp_path, rows, extra=None):
+    """
+    Stand in for rpt.RGRitten with a SQLite table holding REQUIRED_COLUMNS plus `extra`
+    ({column: declared type}), one row per (ritnummer, ritdatum, status). The T-SQL the sync
+    builds is narrowed to what SQLite understands; TOP (n) WITH TIES becomes a RANK() filter,
+    so window ties behave as on SQL Server. Returns the sqlite3 connection and
+    add(ritnummer, ritdatum, status, **extra values), for changes at the "source".
+    """
+    import re
+    import sqlite3
+
+    import sqlalchemy as sa
+
+    import rgritten_sync
+
+    extra = extra or {}
+    columns = rgritten_sync.REQUIRED_COLUMNS + list(extra)
+    source = sqlite3.connect(tmp_path / "rpt.db")
+    source.execute(
+        "CREATE TABLE RGRitten ("
+        + ", ".join(f"[{c}]" + (" TIMESTAMP" if c == "ritdatum" else "") for c in columns)
+        + ")"
+    )
+
+    def add(ritnummer, ritdatum, status="open", **more):
+        values = {"rittype": "taxi", "owner_id": 1, "vervoerder": "v", "status": status}
+        values.update(dict.fromkeys(extra), **more)
+        values.update(ritnummer=ritnummer, ritdatum=f"{ritdatum:%Y-%m-%d %H:%M:%S}")
+        source.execute(
+            f"INSERT INTO RGRitten VALUES ({', '.join('?' * len(columns))})",
+            [values[c] for c in columns],
+        )
+        source.commit()
+
+    for row in rows:
+        add(*row)
+
+    engine = sa.create_engine(
+        f"sqlite:///{tmp_path}/remote.db", connect_args={"detect_types": sqlite3.PARSE_DECLTYPES}
+    )
+
+    @sa.event.listens_for(engine, "connect")
+    def connect(dbapi, record):
+        dbapi.execute(f"ATTACH DATABASE '{tmp_path}/rpt.db' AS rpt")
+        # TRY_CONVERT(decimal(38, 10), x) parses as two function calls in SQLite.
+        dbapi.create_function("decimal", 2, lambda precision, scale: "decimal")
+        dbapi.create_function("TRY_CONVERT", 2, _try_convert)
+
+    build_select = rgritten_sync._build_select
+
+    def select(*args, **kwargs):
+        sql = build_select(*args, **kwargs)
+        top = re.match(r"SELECT TOP \((\d+)\) WITH TIES (.*)\nFROM (.*)\nORDER BY (.*)$", sql, re.S)
+        if top is None:
+            return sql
+        limit, parts, rest, order = top.groups()
+        names = ", ".join(re.findall(r"AS (\[\w+\])", parts))
+        return (
+            f"SELECT {names} FROM (SELECT {parts}, RANK() OVER (ORDER BY {order}) AS tie_rank\n"
+            f"FROM {rest}) WHERE tie_rank <= {limit} ORDER BY tie_rank"
+        )
+
+    monkeypatch.setattr(rgritten_sync, "get_engine", lambda profile, pool_size=None: (engine, False))
+    monkeypatch.setattr(rgritten_sync, "_build_select", select)
+    monkeypatch.setattr(rgritten_sync, "DATE_EXPR", "date([ritdatum])")
+    monkeypatch.setattr(rgritten_sync, "DATETIME_COLS", [])
+    types = {"ritnummer": "int", "owner_id": "int", **extra}
+    monkeypatch.setattr(
+        rgritten_sync,
+        "COLUMN_TYPES_SQL",
+        " UNION ALL ".join(f"SELECT '{name}' AS name, '{kind}' AS data_type" for name, kind in types.items()),
+    )
+    monkeypatch.setattr(rgritten_sync, "_row_hash_expr", lambda columns, size=8: "length([status])")
+    rgritten_sync._column_types.clear()
+    return source, add
+
+
+def _sync_setup(columns):
+    from extensions import db
+    from models import ConnectionProfile
+    from rgritten_sync import save_column_profile
+
+    db.create_all()
+    db.session.add(ConnectionProfile(name="Historie", project="Algemeen"))
+    db.session.commit()
+    save_column_profile(columns)
+
+
+def test_sync_skips_frozen_months(app, monkeypatch, tmp_path):
+    import rgritten_partitions as partitions
+    import rgritten_sync
+    from extensions import db
+    from models import RGRit
+
+    rows = [
+        (n, datetime(2025, month, 10 + n % 3, 8))
+        for month in (1, 2, 3)
+        for n in range(month * 10, month * 10 + 3)
+    ]
+    source, add = _fake_remote(monkeypatch, tmp_path, rows)
+    with app.app_context():
+        _sync_setup(rgritten_sync.REQUIRED_COLUMNS)
+        assert rgritten_sync.sync_rgritten(chunk_size=2, bulk="off")["inserted"] == 9
+
+        partitions.freeze("2025-02")
+        source.execute("UPDATE RGRitten SET status = 'gewijzigd'")
+        source.commit()
+        add(25, datetime(2025, 2, 20, 8))
+        add(35, datetime(2025, 3, 20, 8))
+        # Re-fetching across the frozen month neither aborts on its triggers nor changes it.
+        stats = rgritten_sync.sync_rgritten(chunk_size=2, mode="upsert", resync_days=90, bulk="off")
+        assert stats["frozen_months"] == ["2025-02"]
+        assert (stats["inserted"], stats["updated"]) == (1, 6)
+        stored = {r.ritnummer: r.status for r in db.session.query(RGRit)}
+        assert {n: stored[n] for n in (20, 21, 22)} == {20: "open", 21: "open", 22: "open"}
+        assert 25 not in stored and (stored[10], stored[35]) == ("gewijzigd", "open")
+
+        partitions.thaw("2025-02")
+        stats = rgritten_sync.sync_rgritten(chunk_size=2, mode="upsert", resync_days=90, bulk="off")
+        assert (stats["frozen_months"], stats["inserted"], stats["updated"]) == ([], 1, 3)
+
+
+def test_indicator_masks_skip_non_numeric_flags(app, monkeypatch, tmp_path):
+    import rgritten_sync
+    from extensions import db
+    from models import RGRIT_INDICATOR_COLUMNS, RGRit
+
+    extra = {"ind_rolstoel": "int", "ind_niet_combineren": "varchar"}
+    _, add = _fake_remote(monkeypatch, tmp_path, [], extra)
+    for n, flag in enumerate(("1", "J", "0", None, " 1"), start=1):
+        add(n, datetime(2025, 1, 1, 8), ind_rolstoel=1, ind_niet_combineren=flag)
+    with app.app_context():
+        _sync_setup(rgritten_sync.REQUIRED_COLUMNS + list(extra))
+        plan = rgritten_sync._SourcePlan({"ind_rolstoel": "int"}, columns=rgritten_sync.sync_columns())
+        sql = rgritten_sync._indicator_mask_expr(1, plan)
+        assert "CASE WHEN TRY_CONVERT(decimal(38, 10), [ind_niet_combineren]) = 1" in sql
+        assert "CASE WHEN [ind_rolstoel] = 1" in sql
+
+        assert rgritten_sync.sync_rgritten(bulk="off")["inserted"] == 5
+        rolstoel = 1 << RGRIT_INDICATOR_COLUMNS.index("ind_rolstoel")
+        niet = 1 << RGRIT_INDICATOR_COLUMNS.index("ind_niet_combineren")
+        masks = {r.ritnummer: (r.ind_set, r.ind_clear) for r in db.session.query(RGRit)}
+        assert masks == {
+            1: (rolstoel | niet, 0),
+            2: (rolstoel, 0),
+            3: (rolstoel, niet),
+            4: (rolstoel, 0),
+            5: (rolstoel | niet, 0),
+        }
+
+
+def test_checkpoint_helpers_seed_advance_and_discard(app):
+    from types import SimpleNamespace
+
+    from extensions import db
+    from models import ConnectionProfile, RGRit
+    from rgritten_sync import _discard_beyond, _load_checkpoint, _resync_start, _set_checkpoint
+
+    with app.app_context():
+        db.create_all()
+        profile = ConnectionProfile(name="Historie", project="Algemeen")
+        db.session.add(profile)
+        for day, ritnummer in ((1, 1), (2, 5), (2, 7), (3, 2)):
+            db.session.add(
+                RGRit(rittype="taxi", ritnummer=ritnummer, status="open", owner_id=1, vervoerder="v",
+                      ritdatum=datetime(2025, 1, day, 8))
+            )
+        db.session.commit()
+
+        # Seeded once from the newest stored row, then loaded as it is.
+        checkpoint = _load_checkpoint(profile)
+        assert (checkpoint.last_ritdatum, checkpoint.last_ritnummer) == ("2025-01-03", 2)
+        checkpoint.last_ritdatum, checkpoint.last_ritnummer = "2025-01-02", 5
+        db.session.commit()
+        assert _load_checkpoint(profile).last_ritnummer == 5
+
+        _set_checkpoint(checkpoint, ("2025-01-01", 9))
+        _set_checkpoint(checkpoint, (None, None))
+        assert (checkpoint.last_ritdatum, checkpoint.last_ritnummer) == ("2025-01-02", 5)
+
+        assert _discard_beyond(checkpoint) == 2
+        assert sorted(n for (n,) in db.session.query(RGRit.ritnummer)) == [1, 5]
+        _set_checkpoint(checkpoint, ("2025-01-02", 6))
+        assert checkpoint.last_ritnummer == 6
+
+        assert _resync_start(checkpoint, 0) == ("2025-01-02", 6)
+        assert _resync_start(checkpoint, 1) == ("2024-12-31", 2**63 - 1)
+        assert _resync_start(SimpleNamespace(last_ritdatum=None, last_ritnummer=None), 3) == (None, 0)
+
+
+def test_interrupted_sync_resumes_at_committed_checkpoint(app, monkeypatch, tmp_path):
+    import pytest
+
+    import rgritten_sync
+    from extensions import db
+    from models import RGRit, SyncCheckpoint
+
+    rows = [(n, datetime(2025, 1, 1 + n // 4, 8)) for n in range(1, 11)]
+    _fake_remote(monkeypatch, tmp_path, rows)
+    insert = rgritten_sync._ChunkWriter.insert
+    calls = []
+
+    def failing_insert(self, chunk):
+        calls.append(len(chunk))
+        if len(calls) == 3:
+            raise RuntimeError("verbinding verbroken")
+        return insert(self, chunk)
+
+    with app.app_context():
+        _sync_setup(rgritten_sync.REQUIRED_COLUMNS)
+        monkeypatch.setattr(rgritten_sync._ChunkWriter, "insert", failing_insert)
+        with pytest.raises(RuntimeError):
+            rgritten_sync.sync_rgritten(chunk_size=3, bulk="off")
+        checkpoint = db.session.query(SyncCheckpoint).one()
+        assert (checkpoint.status, checkpoint.last_ritdatum, checkpoint.last_ritnummer) == (
+            "failed",
+            "2025-01-02",
+            6,
+        )
+        assert db.session.query(RGRit).count() == 6
+
+        monkeypatch.setattr(rgritten_sync._ChunkWriter, "insert", insert)
+        stats = rgritten_sync.sync_rgritten(chunk_size=3, bulk="off")
+        assert (stats["from_ritdatum"], stats["from_ritnummer"]) == ("2025-01-02", 6)
+        assert (stats["inserted"], stats["through_ritnummer"]) == (4, 10)
+        assert sorted(n for (n,) in db.session.query(RGRit.ritnummer)) == list(range(1, 11))
+        assert db.session.query(SyncCheckpoint).one().status == "ok"
+
+
+def test_windows_keep_ties_on_the_last_key_together(app, monkeypatch, tmp_path):
+    import sqlalchemy as sa
+
+    import rgritten_sync
+    from extensions import db
+    from models import ConnectionProfile, RGRit
+
+    # Ride 3 appears twice on the same day: both rows share the cursor key (2025-01-01, 3).
+    rows = [(1, datetime(2025, 1, 1, 7)), (2, datetime(2025, 1, 1, 8)), (3, datetime(2025, 1, 1, 9))]
+    rows += [(3, datetime(2025, 1, 1, 17)), (4, datetime(2025, 1, 1, 6)), (1, datetime(2025, 1, 2, 8))]
+    _fake_remote(monkeypatch, tmp_path, rows)
+    with app.app_context():
+        _sync_setup(rgritten_sync.REQUIRED_COLUMNS)
+        profile = db.session.query(ConnectionProfile).one()
+        engine, _ = rgritten_sync.get_engine(profile)
+        with engine.connect() as remote:
+            plan = rgritten_sync._load_source_plan(remote, profile)
+            windows = list(rgritten_sync._iter_windows(remote, plan.columns, 3, plan=plan))
+        # The first window runs over its size so the next can start strictly after (day, 3).
+        assert [[(r.ritnummer, r.ritdatum.hour) for r in w] for _, w in windows] == [
+            [(1, 7), (2, 8), (3, 9), (3, 17)],
+            [(4, 6), (1, 8)],
+        ]
+
+        assert rgritten_sync.sync_rgritten(chunk_size=3, bulk="off")["inserted"] == 6
+        stored = db.session.query(RGRit.ritnummer, sa.func.count()).group_by(RGRit.ritnummer).all()
+        assert dict(stored) == {1: 2, 2: 1, 3: 2, 4: 1}
+
+
+def test_chunk_writer_binds_numbers_dates_and_times(app):
+    from datetime import time
+    from decimal import Decimal
+
+    from extensions import db
+    from models import RGRit
+    from remote_engines import _decimal_output
+    from rgritten_sync import _ChunkWriter
+
+    columns = ["rittype", "ritnummer", "status", "owner_id", "vervoerder", "ritdatum", "afstand"]
+    columns += ["instap", "geboortedatum"]
+
+    with app.app_context():
+        db.create_all()
+        # With driver converters numbers are left alone; only dates and times are bound.
+        converted = _ChunkWriter(columns, None, 10)
+        assert [idx for idx, _ in converted.processors] == [6, 8, 9]
+        row = ("taxi", 1, "open", _decimal_output(b"1.0000000000"), "v", datetime(2025, 1, 1, 8, 30),
+               _decimal_output(b"12.5000000000"), time(8, 5), date(1990, 5, 1))
+        [params], size, _ = converted.prepare([row])
+        assert size > 0 and converted.bytes == 0
+        assert params[4] == 1.0 and params[7] == 12.5
+        assert params[6] == "2025-01-01 08:30:00.000000"
+        assert (params[8], params[9]) == ("08:05:00.000000", "1990-05-01 00:00:00.000000")
+        converted.write([params])
+
+        # Without them Decimals come through, for Integer columns too.
+        unconverted = _ChunkWriter(columns, None, 10, numbers_converted=False)
+        row = ("taxi", 2, "open", Decimal("1.0000000000"), "v", datetime(2025, 1, 1, 9), Decimal("3.25"),
+               None, None)
+        [params], _, _ = unconverted.prepare([row])
+        assert (params[4], params[7]) == (1.0, 3.25)
+        unconverted.write([params])
+        db.session.commit()
+
+        stored = {r.ritnummer: r for r in db.session.query(RGRit)}
+        assert stored[1].instap == time(8, 5) and stored[1].geboortedatum == datetime(1990, 5, 1)
+        assert (stored[1].owner_id, float(stored[1].afstand)) == (1, 12.5)
+        assert (stored[2].owner_id, float(stored[2].afstand), stored[2].instap) == (1, 3.25, None)
+        owner_type = db.session.execute(db.text("SELECT typeof(owner_id) FROM rgritten")).scalars().all()
+        assert owner_type == ["integer", "integer"]
+
+
+def test_chunk_writer_append_skips_conflicts_and_commits_per_batch(app):
+    from types import SimpleNamespace
+
+    from extensions import db
+    from models import RGRit
+    from rgritten_sync import _ChunkWriter
+
+    columns = ["rittype", "ritnummer", "status", "owner_id", "vervoerder", "ritdatum", "row_hash"]
+
+    def row(ritnummer, status="open"):
+        return ("taxi", ritnummer, status, 1, "v", datetime(2025, 1, 1, 8), len(status))
+
+    with app.app_context():
+        db.create_all()
+        checkpoint = SimpleNamespace(last_ritdatum=None, last_ritnummer=0)
+        writer = _ChunkWriter(columns, checkpoint, 2)
+        writer.insert([row(1)])
+        assert writer.commit(("2025-01-01", 1)) is False
+        assert checkpoint.last_ritdatum is None
+        writer.insert([row(2)])
+        assert writer.commit(("2025-01-01", 2)) is True
+        assert (checkpoint.last_ritdatum, checkpoint.last_ritnummer) == ("2025-01-01", 2)
+
+        # Append mode keeps the stored row of a conflicting key.
+        assert writer.insert([row(1, "gewijzigd"), row(3)]) == 1
+        assert writer.commit(("2025-01-01", 3)) is True
+        assert writer.counts == {"inserted": 3, "updated": 0, "unchanged": 1}
+
+        # Rows after the last commit are not covered by the checkpoint and roll back with it.
+        writer.insert([row(4)])
+        assert writer.commit(("2025-01-01", 4)) is False
+        db.session.rollback()
+        assert checkpoint.last_ritnummer == 3
+        stored = {r.ritnummer: r.status for r in db.session.query(RGRit)}
+        assert stored == {1: "open", 2: "open", 3: "open"}
+
+
+def test_sync_stops_when_its_lease_is_taken_over(app, monkeypatch, tmp_path):
+    from datetime import timedelta
+
+    import pytest
+
+    import rgritten_sync
+    from extensions import db
+    from models import RGRit, SchedulerLease, SyncCheckpoint, SyncRun
+    from refresh_scheduler import LeaseLost, acquire_lease, current_lease
+
+    _fake_remote(monkeypatch, tmp_path, [(n, datetime(2025, 1, 1, 8)) for n in range(1, 10)])
+    insert = rgritten_sync._ChunkWriter.insert
+    calls = []
+
+    def take_over(self, chunk):
+        calls.append(len(chunk))
+        if len(calls) == 2:
+            # The heartbeat of this process stalled; another one takes the expired lease.
+            db.session.query(SchedulerLease).update(
+                {SchedulerLease.expires_at: datetime.utcnow() - timedelta(seconds=1)}
+            )
+            assert acquire_lease("data-refresh", "b")
+        return insert(self, chunk)
+
+    with app.app_context():
+        _sync_setup(rgritten_sync.REQUIRED_COLUMNS)
+        assert acquire_lease("data-refresh", "a")
+        monkeypatch.setattr(rgritten_sync._ChunkWriter, "insert", take_over)
+        with pytest.raises(LeaseLost):
+            rgritten_sync.sync_rgritten(chunk_size=3, bulk="off", lease=current_lease("data-refresh", "a"))
+
+        checkpoint = db.session.query(SyncCheckpoint).one()
+        assert (checkpoint.status, checkpoint.last_ritnummer) == ("running", 3)
+        assert db.session.query(RGRit).count() == 3
+        assert db.session.query(SyncRun).one().status == "failed"
+
+
+def test_chunk_writer_append_quarantines_only_inserted_rows(app):
+    from extensions import db
+    from models import RGRittenQuarantine
+    from rgritten_sync import LOST_PREFIX, _ChunkWriter
+
+    columns = ["rittype", "ritnummer", "status", "owner_id", "vervoerder", "ritdatum", "afstand"]
+    columns += ["row_hash", LOST_PREFIX + "afstand"]
+
+    def row(ritnummer, lost, hour=8):
+        return ("taxi", ritnummer, "open", 1, "v", datetime(2025, 1, 1, hour), None, 1, lost)
+
+    with app.app_context():
+        db.create_all()
+        writer = _ChunkWriter(columns, None, 10)
+        writer.insert([row(1, None)])
+        # Ride 1 is stored already and ride 2 comes twice: only the first 2 is inserted.
+        assert writer.insert([row(1, "1,5 km"), row(2, "2,5 km"), row(2, "9 km"), row(3, None, 9)]) == 2
+        writer.commit(None, force=True)
+
+        stored = db.session.query(RGRittenQuarantine.ritnummer, RGRittenQuarantine.raw_value).all()
+        assert stored == [(2, "2,5 km")]
+        assert writer.quarantined == {"afstand": 1}
+        assert writer.counts == {"inserted": 3, "updated": 0, "unchanged": 2}
+
+
+def test_pipelined_sync_books_bytes_on_the_batch_that_commits_them(app, monkeypatch, tmp_path):
+    import rgritten_sync
+    from extensions import db
+    from models import ConnectionProfile, SyncRun, SyncRunChunk
+
+    # Every window of 3 rides has its own status length, so each batch has a distinct size.
+    rows = [(n, datetime(2025, 1, 1 + n // 3, 8), "x" * (1 + 5 * (n // 3))) for n in range(12)]
+    _fake_remote(monkeypatch, tmp_path, rows)
+    with app.app_context():
+        _sync_setup(rgritten_sync.REQUIRED_COLUMNS)
+        profile = db.session.query(ConnectionProfile).one()
+        engine, _ = rgritten_sync.get_engine(profile)
+        with engine.connect() as remote:
+            plan = rgritten_sync._load_source_plan(remote, profile)
+            windows = [w for _, w in rgritten_sync._iter_windows(remote, plan.columns, 3, plan=plan)]
+
+        assert rgritten_sync.sync_rgritten(chunk_size=3, pipeline=True, bulk="off")["inserted"] == 12
+        run = db.session.query(SyncRun).one()
+        chunks = db.session.query(SyncRunChunk).filter_by(run_id=run.id).order_by(SyncRunChunk.seq).all()
+        assert [(c.rows, c.through_ritnummer, c.bytes) for c in chunks] == [
+            (len(w), w[-1].ritnummer, rgritten_sync._estimate_bytes(w)) for w in windows
+        ]
+        assert sum(c.bytes for c in chunks) == run.bytes
+        assert all(c.convert_seconds >= 0 for c in chunks)
+
+
+def test_chunk_writer_without_checkpoint_is_fenced_by_its_lease(app):
+    from datetime import timedelta
+
+    import pytest
+
+    from extensions import db
+    from models import RGRit, SchedulerLease
+    from refresh_scheduler import LeaseLost, acquire_lease, current_lease
+    from rgritten_sync import _ChunkWriter
+
+    columns = ["rittype", "ritnummer", "status", "owner_id", "vervoerder", "ritdatum"]
+
+    def row(ritnummer):
+        return ("taxi", ritnummer, "open", 1, "v", datetime(2025, 1, 1, 8))
+
+    with app.app_context():
+        db.create_all()
+        assert acquire_lease("data-refresh", "a")
+        # Reconcile repairs write without a checkpoint; the lease alone fences them.
+        writer = _ChunkWriter(columns, None, 1)
+        writer.lease = current_lease("data-refresh", "a")
+        writer.insert([row(1)])
+        assert writer.commit(None)
+
+        db.session.query(SchedulerLease).update(
+            {SchedulerLease.expires_at: datetime.utcnow() - timedelta(seconds=1)}
+        )
+        assert acquire_lease("data-refresh", "b")
+        writer.insert([row(2)])
+        with pytest.raises(LeaseLost):
+            writer.commit(None)
+        db.session.rollback()
+        assert [n for (n,) in db.session.query(RGRit.ritnummer)] == [1]
@@ -0,0 +1,87 @@
+import pytest
+import sqlalchemy as sa
+
+
+def test_reader_is_query_only_and_not_blocked_by_writer(tmp_path):
+    from flask import Flask
+
+    import sqlite_store
+    from extensions import db
+
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{tmp_path}/store.db"
+    db.init_app(app)
+    sqlite_store.init_app(app)
+    with app.app_context():
+        db.session.execute(sa.text("CREATE TABLE t (x INTEGER)"))
+        db.session.execute(sa.text("INSERT INTO t VALUES (1)"))
+        db.session.commit()
+        assert db.session.execute(sa.text("PRAGMA journal_mode")).scalar() == "wal"
+        assert db.session.execute(sa.text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+
+        reader = sqlite_store.read_session()
+        assert reader is not db.session
+        assert reader.execute(sa.text("PRAGMA query_only")).scalar() == 1
+        with pytest.raises(sa.exc.OperationalError):
+            reader.execute(sa.text("INSERT INTO t VALUES (2)"))
+        reader.rollback()
+
+        # An open write transaction does not block the reader; it sees the committed state.
+        db.session.execute(sa.text("INSERT INTO t VALUES (3)"))
+        assert reader.execute(sa.text("SELECT COUNT(*) FROM t")).scalar() == 1
+        db.session.commit()
+        reader.rollback()
+        assert reader.execute(sa.text("SELECT COUNT(*) FROM t")).scalar() == 2
+
+
+def test_in_memory_database_reads_through_main_session(app):
+    import sqlite_store
+    from extensions import db
+
+    with app.app_context():
+        assert sqlite_store.read_session() is db.session
+
+
+def test_reader_decodes_strings_on_its_own_connection(tmp_path):
+    from datetime import datetime
+
+    from flask import Flask
+
+    import sqlite_store
+    from extensions import db
+    from models import RGRit, RGRittenString
+
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{tmp_path}/store.db"
+    db.init_app(app)
+    sqlite_store.init_app(app)
+
+    def ride(n, vervoerder):
+        return RGRit(rittype="taxi", ritnummer=n, status="open", owner_id=1, vervoerder=vervoerder,
+                     ritdatum=datetime(2025, 1, n, 8))
+
+    with app.app_context():
+        db.create_all()
+        db.session.add(ride(1, "Zuid"))
+        db.session.commit()
+        lookups = []
+        sa.event.listen(
+            app.extensions["sqlite_store"]["reader"],
+            "before_cursor_execute",
+            lambda conn, cursor, statement, params, context, many: "rgritten_strings" in statement
+            and lookups.append(params),
+        )
+
+        reader = sqlite_store.read_session()
+        assert [r.vervoerder for r in reader.query(RGRit)] == ["Zuid"]
+        assert not db.session().in_transaction()
+        reader.rollback()
+
+        db.session.add(ride(2, "Noord"))
+        db.session.commit()
+        known = db.session.query(sa.func.max(RGRittenString.code)).scalar() - 1
+        db.session.rollback()
+        assert [r.vervoerder for r in reader.query(RGRit).order_by(RGRit.ritnummer)] == ["Zuid", "Noord"]
+        assert not db.session().in_transaction()
+        # The first query loads the dictionary; later ones only the codes added since.
+        assert lookups == [(), (known,)]
@@ -0,0 +1,150 @@
+def _profile():
+    from extensions import db
+    from models import ConnectionProfile
+
+    db.session.add(ConnectionProfile(name="Historie", project="Algemeen"))
+    db.session.commit()
+    return db.session.query(ConnectionProfile).one().id
+
+
+def test_job_reports_progress_and_finishes(app, monkeypatch):
+    import pytest
+
+    import rgritten_sync
+    import sync_jobs
+    from extensions import db
+    from models import SyncJob
+
+    seen = []
+
+    def fake_sync(progress, **kw):
+        progress(500, ("2025-01-01", 10), 2000)
+        db.session.expire_all()
+        seen.append(sync_jobs.snapshot(db.session.get(SyncJob, job_id)))
+        return {"inserted": 1500, "updated": 0, "unchanged": 500, "through_ritdatum": "2025-01-03",
+                "through_ritnummer": 99, "partitions": []}
+
+    monkeypatch.setattr(rgritten_sync, "sync_rgritten", fake_sync)
+    monkeypatch.setattr(sync_jobs, "PROGRESS_EVERY", 0)
+    with app.app_context():
+        db.create_all()
+        job_id = sync_jobs.enqueue(_profile(), mode="upsert", resync_days=1, requested_by="beheer").id
+        with pytest.raises(ValueError):
+            sync_jobs.enqueue(job_id)
+        assert sync_jobs.run_queued("me") == 1
+
+        progress = seen[0]
+        assert progress["status"] == "running"
+        assert (progress["rows"], progress["pending"], progress["percent"]) == (500, 2000, 25.0)
+        assert progress["cursor"] == "2025-01-01 / 10" and progress["eta_seconds"] is not None
+
+        done = sync_jobs.snapshot(db.session.get(SyncJob, job_id))
+        assert (done["status"], done["rows"], done["percent"]) == ("done", 2000, 100.0)
+        assert "partitions" not in db.session.get(SyncJob, job_id).stats
+        assert sync_jobs.active_job() is None
+
+
+def test_cancel_queued_and_running_jobs(app, monkeypatch):
+    import rgritten_sync
+    import sync_jobs
+    from extensions import db
+    from models import SyncJob
+
+    def fake_sync(progress, **kw):
+        assert sync_jobs.request_cancel(running_id) == "requested"
+        progress(100, ("2025-01-01", 1), None)
+        raise AssertionError("not cancelled")
+
+    monkeypatch.setattr(rgritten_sync, "sync_rgritten", fake_sync)
+    monkeypatch.setattr(sync_jobs, "PROGRESS_EVERY", 0)
+    with app.app_context():
+        db.create_all()
+        profile_id = _profile()
+        queued_id = sync_jobs.enqueue(profile_id).id
+        assert sync_jobs.request_cancel(queued_id) == "cancelled"
+        assert db.session.get(SyncJob, queued_id).status == "cancelled"
+        assert not sync_jobs.request_cancel(queued_id)
+
+        running_id = sync_jobs.enqueue(profile_id).id
+        db.session.add(SyncJob(profile_id=profile_id, status="running", owner="dead"))
+        db.session.commit()
+        sync_jobs.run_queued("me")
+
+        statuses = {j.owner: (j.status, j.rows) for j in db.session.query(SyncJob).filter(SyncJob.owner.isnot(None))}
+        assert statuses == {"me": ("cancelled", 100), "dead": ("failed", 0)}
+
+
+def test_column_profile_rewrite_runs_as_batched_job(app, monkeypatch):
+    from datetime import datetime
+
+    import rgritten_sync
+    import sync_jobs
+    from extensions import db
+    from models import RGRit, SyncJob
+
+    reported = []
+    progress = sync_jobs._Progress.__call__
+
+    def record(self, rows, key, pending):
+        reported.append((rows, pending))
+        progress(self, rows, key, pending)
+
+    monkeypatch.setattr(sync_jobs._Progress, "__call__", record)
+    monkeypatch.setattr(rgritten_sync, "COLUMN_REWRITE_BATCH", 2)
+    with app.app_context():
+        db.create_all()
+        for n in range(1, 6):
+            db.session.add(
+                RGRit(rittype="taxi", ritnummer=n, status="open", owner_id=1, vervoerder="v",
+                      ritdatum=datetime(2025, 1, n, 8), voornaam="Anna", row_hash=n)
+            )
+        db.session.commit()
+        added, dropped = rgritten_sync.save_column_profile(rgritten_sync.REQUIRED_COLUMNS)
+        job_id = sync_jobs.enqueue_columns(dropped, requested_by="beheer").id
+        assert sync_jobs.active_job().id == job_id
+        assert sync_jobs.run_queued("me") == 1
+
+        job = db.session.get(SyncJob, job_id)
+        assert (job.status, job.rows, job.profile_id) == ("done", 5, None)
+        assert reported == [(2, 5), (4, 5), (5, 5)]
+        assert {(r.voornaam, r.row_hash) for r in db.session.query(RGRit)} == {(None, None)}
+
+
+def test_column_profile_rewrite_stops_when_its_lease_is_taken_over(app, monkeypatch):
+    from datetime import datetime, timedelta
+
+    import rgritten_sync
+    import sync_jobs
+    from extensions import db
+    from models import RGRit, SchedulerLease, SyncJob
+    from refresh_scheduler import acquire_lease, current_lease
+
+    progress = sync_jobs._Progress.__call__
+
+    def take_over(self, rows, key, pending):
+        progress(self, rows, key, pending)
+        # The heartbeat of this process stalled; another one takes the expired lease.
+        db.session.query(SchedulerLease).update(
+            {SchedulerLease.expires_at: datetime.utcnow() - timedelta(seconds=1)}
+        )
+        assert acquire_lease("data-refresh", "b")
+
+    monkeypatch.setattr(sync_jobs._Progress, "__call__", take_over)
+    monkeypatch.setattr(rgritten_sync, "COLUMN_REWRITE_BATCH", 2)
+    with app.app_context():
+        db.create_all()
+        for n in range(1, 6):
+            db.session.add(
+                RGRit(rittype="taxi", ritnummer=n, status="open", owner_id=1, vervoerder="v",
+                      ritdatum=datetime(2025, 1, n, 8), voornaam="Anna", row_hash=n)
+            )
+        db.session.commit()
+        _, dropped = rgritten_sync.save_column_profile(rgritten_sync.REQUIRED_COLUMNS)
+        job_id = sync_jobs.enqueue_columns(dropped, requested_by="beheer").id
+        assert acquire_lease("data-refresh", "me")
+        assert sync_jobs.run_queued("me", lease=current_lease("data-refresh", "me")) == 1
+
+        job = db.session.get(SyncJob, job_id)
+        assert job.status == "failed" and "niet meer van me" in job.error
+        # Only the batch committed under the lease was rewritten.
+        assert sorted(r.ritnummer for r in db.session.query(RGRit).filter(RGRit.voornaam.is_(None))) == [1, 2]